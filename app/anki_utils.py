@@ -1,6 +1,382 @@
 import os
 import csv
-from typing import List, Tuple
+import re
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from instrumentation import span
+
+
+_NON_WORD_RE = re.compile(r'[\W_]+', re.UNICODE)
+
+# Names accepted by Anki's "#separator:" file header
+_SEPARATOR_NAMES = {
+    'tab': '\t',
+    'comma': ',',
+    'semicolon': ';',
+    'space': ' ',
+    'pipe': '|',
+    'colon': ':',
+}
+
+# Characters read per block by the text file reader
+_READ_BLOCK_SIZE = 1 << 20
+# Longest record with quoted newlines carried between blocks; a quote still open
+# after this many characters is taken to be a stray quote
+_MAX_QUOTED_RECORD = 4 * _READ_BLOCK_SIZE
+
+
+class AnkiNote(NamedTuple):
+    """A card read from an Anki text file, with the optional extra columns."""
+    question: str
+    answer: str
+    tags: Tuple[str, ...] = ()
+    deck: Optional[str] = None
+    notetype: Optional[str] = None
+
+
+class ParseIssue(NamedTuple):
+    """A line of a card file that could not be turned into a card."""
+    line_number: int
+    message: str
+    line: str
+
+
+class _TextFileFormat(NamedTuple):
+    """Layout of a text card file, as described by its headers."""
+    separator: str
+    tags_column: Optional[int]
+    deck_column: Optional[int]
+    notetype_column: Optional[int]
+    tags: Tuple[str, ...]
+    deck: Optional[str]
+    notetype: Optional[str]
+
+
+def _parse_text_file_header(line: str, options: Dict[str, str]) -> None:
+    """
+    Parse one of Anki's "#key:value" file headers into options.
+    
+    Lines that are not a known header are ignored as comments.
+    
+    Args:
+        line: Line without its line ending
+        options: Header values parsed so far, updated in place
+    """
+    key, sep, value = line[1:].partition(':')
+    key = key.strip().lower()
+    if sep and key in ('separator', 'html', 'tags', 'deck', 'notetype', 'columns',
+                       'tags column', 'deck column', 'notetype column', 'guid column'):
+        # A literal space separator must not be stripped away
+        options[key] = value if key == 'separator' else value.strip()
+
+
+def _column_index(value: Optional[str]) -> Optional[int]:
+    """Convert a 1-based column header value into a 0-based index."""
+    if not value:
+        return None
+    try:
+        index = int(value) - 1
+    except ValueError:
+        return None
+    return index if index >= 0 else None
+
+
+def _text_file_format(options: Dict[str, str], separator: Optional[str]) -> _TextFileFormat:
+    """Build the file layout from the parsed headers and an optional separator override."""
+    header_sep = options.get('separator')
+    if header_sep is not None:
+        header_sep = _SEPARATOR_NAMES.get(header_sep.strip().lower(), header_sep)
+    
+    return _TextFileFormat(
+        separator=separator or header_sep or '\t',
+        tags_column=_column_index(options.get('tags column')),
+        deck_column=_column_index(options.get('deck column')),
+        notetype_column=_column_index(options.get('notetype column')),
+        tags=tuple(options.get('tags', '').split()),
+        deck=options.get('deck') or None,
+        notetype=options.get('notetype') or None,
+    )
+
+
+def _report_issue(issue: ParseIssue, errors: Optional[List[ParseIssue]]) -> None:
+    """Collect a parse issue in errors, or print it if no list was given."""
+    if errors is not None:
+        errors.append(issue)
+    else:
+        print(f"Skipping line {issue.line_number}: {issue.message}")
+
+
+def _ends_in_quoted_field(line: str, separator: str, in_quotes: bool = False) -> bool:
+    """
+    Tell whether a line ends inside a quoted field, so its record continues on the next line.
+    
+    Fields are quoted as in the csv module: a quote opens a quoted field only
+    at the start of a field, and doubled quotes inside it stand for one quote.
+    
+    Args:
+        line: Line without the newline
+        separator: Field separator
+        in_quotes: Whether the line starts inside a quoted field of the previous line
+        
+    Returns:
+        True if a quoted field is still open at the end of the line
+    """
+    if '"' not in line:
+        return in_quotes
+    field_start = not in_quotes
+    index = 0
+    while index < len(line):
+        char = line[index]
+        if in_quotes:
+            if char == '"':
+                if line[index + 1:index + 2] == '"':
+                    index += 1
+                else:
+                    in_quotes = False
+        elif char == '"' and field_start:
+            in_quotes = True
+        field_start = not in_quotes and char == separator
+        index += 1
+    return in_quotes
+
+
+def _join_quoted_lines(lines: List[str], first_line_number: int, separator: str) -> Tuple[List[str], List[int], int]:
+    """
+    Join the lines of records whose quoted fields contain newlines.
+    
+    Args:
+        lines: Lines of a block, without the newline
+        first_line_number: 1-based line number of lines[0]
+        separator: Field separator
+        
+    Returns:
+        Tuple of (records, line number of each record, number of lines at the
+        end that belong to a record still open when the block ends)
+    """
+    records = []
+    line_numbers = []
+    open_from = None
+    for offset, line in enumerate(lines):
+        if open_from is None:
+            if _ends_in_quoted_field(line, separator):
+                open_from = offset
+            else:
+                records.append(line)
+                line_numbers.append(first_line_number + offset)
+        elif not _ends_in_quoted_field(line, separator, in_quotes=True):
+            records.append('\n'.join(lines[open_from:offset + 1]))
+            line_numbers.append(first_line_number + open_from)
+            open_from = None
+    return records, line_numbers, 0 if open_from is None else len(lines) - open_from
+
+
+def _split_rows(
+    lines: List[str],
+    line_numbers: Sequence[int],
+    separator: str,
+    quoted: bool,
+    errors: Optional[List[ParseIssue]]
+) -> List[List[str]]:
+    """
+    Split a block of lines into fields, keeping only rows that form a card.
+    
+    Args:
+        lines: Lines of the block, without the newline
+        line_numbers: 1-based line number of each line
+        separator: Field separator
+        quoted: Whether the block contains quote characters
+        errors: Optional list collecting skipped lines
+        
+    Returns:
+        Field lists of the valid rows, in file order
+    """
+    if quoted:
+        # Quoted fields may contain the separator, let the csv module split those lines
+        rows = [next(csv.reader([line], delimiter=separator)) if '"' in line else line.split(separator)
+                for line in lines]
+    else:
+        rows = [line.split(separator) for line in lines]
+    
+    valid = [fields for fields in rows if len(fields) > 1 and fields[0][:1] != '#' and fields[0].strip()]
+    if len(valid) == len(rows):
+        return valid
+    
+    # Second pass only for blocks with skipped lines, to tell blank lines and
+    # comments apart from malformed ones
+    for offset, fields in enumerate(rows):
+        if len(fields) > 1 and fields[0][:1] != '#' and fields[0].strip():
+            continue
+        line = lines[offset].rstrip('\r')
+        if not line.strip() or line[0] == '#':
+            continue
+        message = (f"expected at least 2 fields, found {len(fields)}" if len(fields) < 2
+                   else "empty question")
+        _report_issue(ParseIssue(line_numbers[offset], message, line), errors)
+    
+    return valid
+
+
+def _iter_text_file_rows(
+    file_path: str,
+    separator: Optional[str] = None,
+    errors: Optional[List[ParseIssue]] = None
+) -> Iterator[Tuple[_TextFileFormat, List[List[str]]]]:
+    """
+    Read a text card file in large blocks and yield the valid rows of each block.
+    
+    Splitting whole blocks with list comprehensions keeps the per-line
+    Python overhead low, while memory stays bounded by the block size.
+    Quoted fields may span lines; such records are joined before splitting.
+    
+    Args:
+        file_path: Path to the text file
+        separator: Field separator, overrides the file header
+        errors: Optional list collecting skipped lines
+        
+    Yields:
+        Tuples of (file format, field lists of the block's valid rows)
+    """
+    options: Dict[str, str] = {}
+    file_format = None
+    line_number = 1
+    carry = ''
+    
+    with open(file_path, 'r', encoding='utf-8', newline='') as file:
+        while True:
+            text = file.read(_READ_BLOCK_SIZE)
+            if not text and not carry:
+                break
+            
+            block = carry + text
+            lines = block.split('\n')
+            # The last line may continue in the next block
+            carry = lines.pop() if text else ''
+            
+            start = 0
+            if file_format is None:
+                # Headers and comments at the top of the file describe its format
+                while start < len(lines) and (not lines[start].strip() or lines[start][0] == '#'):
+                    if lines[start][:1] == '#':
+                        _parse_text_file_header(lines[start].rstrip('\r'), options)
+                    start += 1
+                if start == len(lines):
+                    line_number += len(lines)
+                    continue
+                file_format = _text_file_format(options, separator)
+            
+            body = lines[start:]
+            first_line_number = line_number + start
+            line_numbers = range(first_line_number, first_line_number + len(body))
+            if '"' in block:
+                body, line_numbers, open_lines = _join_quoted_lines(body, first_line_number, file_format.separator)
+                if open_lines:
+                    open_record = lines[len(lines) - open_lines:]
+                    open_number = first_line_number + len(lines) - start - open_lines
+                    if text and len(carry) + sum(map(len, open_record)) <= _MAX_QUOTED_RECORD:
+                        # The record continues in the next block
+                        carry = '\n'.join(open_record + [carry])
+                        lines = lines[:len(lines) - open_lines]
+                    elif text:
+                        # A quote that is never closed, read its lines one by one
+                        body.extend(open_record)
+                        line_numbers.extend(range(open_number, open_number + open_lines))
+                    else:
+                        # A quote left open at the end of the file, the rest is one record
+                        body.append('\n'.join(open_record))
+                        line_numbers.append(open_number)
+            rows = _split_rows(body, line_numbers, file_format.separator, '"' in block, errors)
+            line_number += len(lines)
+            yield file_format, rows
+
+
+def text_file_separator(file_path: str, separator: Optional[str] = None) -> str:
+    """
+    Return the field separator of a text card file, from its "#separator:" header.
+    
+    Args:
+        file_path: Path to the text file
+        separator: Separator overriding the header
+        
+    Returns:
+        The separator, tab if the file does not name one
+    """
+    options: Dict[str, str] = {}
+    if separator is None:
+        with open(file_path, 'r', encoding='utf-8', errors='replace', newline='') as file:
+            for line in file:
+                if line[:1] != '#' and line.strip():
+                    break
+                if line[:1] == '#':
+                    _parse_text_file_header(line.rstrip('\r\n'), options)
+    return _text_file_format(options, separator).separator
+
+
+def iter_notes_from_text_file(
+    file_path: str,
+    separator: Optional[str] = None,
+    errors: Optional[List[ParseIssue]] = None
+) -> Iterator[AnkiNote]:
+    """
+    Lazily read notes from a delimited Anki text file.
+    
+    Anki's file headers at the top of the file are honoured: "#separator:"
+    selects the field separator, "#tags:", "#deck:" and "#notetype:" set
+    defaults for every note, and "#tags column:", "#deck column:" and
+    "#notetype column:" name the (1-based) columns holding those values.
+    Other lines starting with '#' are comments. Lines with extra fields are
+    accepted; lines that cannot be parsed are reported and skipped instead
+    of aborting the import.
+    
+    Args:
+        file_path: Path to the text file
+        separator: Field separator, overrides the file header (default: header or tab)
+        errors: Optional list collecting a ParseIssue per skipped line; if
+            omitted, skipped lines are printed
+        
+    Yields:
+        AnkiNote for every valid line
+    """
+    for file_format, rows in _iter_text_file_rows(file_path, separator, errors):
+        tags_col = file_format.tags_column
+        deck_col = file_format.deck_column
+        notetype_col = file_format.notetype_column
+        
+        for fields in rows:
+            tags = file_format.tags
+            if tags_col is not None and tags_col < len(fields):
+                tags = tags + tuple(fields[tags_col].split())
+            deck = file_format.deck
+            if deck_col is not None and deck_col < len(fields):
+                deck = fields[deck_col].strip()
+            notetype = file_format.notetype
+            if notetype_col is not None and notetype_col < len(fields):
+                notetype = fields[notetype_col].strip()
+            
+            yield AnkiNote(fields[0].strip(), fields[1].strip(), tags, deck, notetype)
+
+
+def iter_cards_from_text_file(
+    file_path: str,
+    separator: Optional[str] = None,
+    errors: Optional[List[ParseIssue]] = None
+) -> Iterator[Tuple[str, str]]:
+    """
+    Lazily read Anki cards from a tab-separated text file.
+    
+    The file is read in blocks, so memory use does not grow with the file
+    size. See iter_notes_from_text_file for the supported headers and how
+    malformed lines are handled.
+    
+    Args:
+        file_path: Path to the tab-separated text file
+        separator: Field separator, overrides the file header (default: header or tab)
+        errors: Optional list collecting a ParseIssue per skipped line
+        
+    Yields:
+        (question, answer) tuples
+    """
+    for _, rows in _iter_text_file_rows(file_path, separator, errors):
+        yield from [(fields[0].strip(), fields[1].strip()) for fields in rows]
 
 
 def create_anki_cards_from_text_file(file_path: str) -> List[Tuple[str, str]]:
@@ -13,37 +389,44 @@ def create_anki_cards_from_text_file(file_path: str) -> List[Tuple[str, str]]:
     Returns:
         List of (question, answer) tuples
     """
-    with open(file_path, 'r', encoding='utf-8') as file:
-        lines = file.readlines()
-    
-    cards = []
-    for line in lines:
-        if '\t' in line:
-            question, answer = line.strip().split('\t')
-            cards.append((question, answer))
-    
+    with span("read_text_file") as attributes:
+        cards = list(iter_cards_from_text_file(file_path))
+        attributes["cards"] = len(cards)
     return cards
 
 
-def create_anki_cards_from_csv_file(file_path: str, delimiter: str = ',') -> List[Tuple[str, str]]:
+def iter_cards_from_csv_file(file_path: str, delimiter: str = ',') -> Iterator[Tuple[str, str]]:
     """
-    Create Anki cards from a CSV file with specified delimiter.
+    Lazily read Anki cards from a CSV file with specified delimiter.
     
     Args:
         file_path: Path to the CSV file
         delimiter: CSV delimiter character (default: ',')
         
-    Returns:
-        List of (question, answer) tuples
+    Yields:
+        (question, answer) tuples
     """
-    cards = []
-    with open(file_path, 'r', encoding='utf-8') as file:
+    with open(file_path, 'r', encoding='utf-8', newline='') as file:
         reader = csv.reader(file, delimiter=delimiter)
         for row in reader:
             if len(row) >= 2:
-                question, answer = row[0], row[1]
-                cards.append((question, answer))
+                yield row[0], row[1]
+
+
+def create_anki_cards_from_csv_file(file_path: str, delimiter: str = ',') -> List[Tuple[str, str]]:
+    """
+    Create Anki cards from a CSV file with specified delimiter.
     
+    Args:
+        file_path: Path to the CSV file
+        delimiter: CSV delimiter character (default: ',')
+        
+    Returns:
+        List of (question, answer) tuples
+    """
+    with span("read_csv_file") as attributes:
+        cards = list(iter_cards_from_csv_file(file_path, delimiter))
+        attributes["cards"] = len(cards)
     return cards
 
 
@@ -66,18 +449,65 @@ def create_folder_for_anki_cards(folder_path: str) -> str:
     return folder_path
 
 
-def save_cards_to_csv(cards: List[Tuple[str, str]], file_path: str, delimiter: str = ';') -> None:
+def save_cards_to_csv(cards: Iterable[Tuple[str, str]], file_path: str, delimiter: str = ';') -> int:
     """
     Save cards to a CSV file with specified delimiter.
     
+    Cards are written as they are consumed, so a generator such as
+    iter_cards_from_text_file can be streamed straight to disk.
+    
     Args:
-        cards: List of (question, answer) tuples
+        cards: Iterable of (question, answer) tuples
         file_path: Path to save the CSV file
         delimiter: CSV delimiter character (default: ';')
+        
+    Returns:
+        Number of cards written
     """
-    with open(file_path, 'w', encoding='utf-8', newline='') as file:
+    count = 0
+    with span("save_cards_to_csv") as attributes, open(file_path, 'w', encoding='utf-8', newline='') as file:
         writer = csv.writer(file, delimiter=delimiter)
         for card in cards:
             writer.writerow(card)
+            count += 1
+        attributes["cards"] = count
+    
+    print(f"Saved {count} cards to {file_path}")
+    return count
+
+
+def normalize_question(question: str) -> str:
+    """
+    Normalize a question for duplicate detection.
+    
+    Case, punctuation and whitespace differences are ignored, so
+    "Who led the uprising?" and "who led the  uprising" compare equal.
+    
+    Args:
+        question: Question text
+        
+    Returns:
+        Normalized question text
+    """
+    return _NON_WORD_RE.sub(' ', question.casefold()).strip()
+
+
+def dedupe_cards(cards: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """
+    Remove cards whose normalized question has already been seen.
+    
+    Args:
+        cards: List of (question, answer) tuples
+        
+    Returns:
+        List of (question, answer) tuples, keeping the first occurrence of each question
+    """
+    seen = set()
+    unique_cards = []
+    for card in cards:
+        key = normalize_question(card[0])
+        if key and key not in seen:
+            seen.add(key)
+            unique_cards.append(card)
     
-    print(f"Saved {len(cards)} cards to {file_path}")
\ No newline at end of file
+    return unique_cards
@@ -0,0 +1,366 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+import zipfile
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from anki_utils import iter_cards_from_csv_file
+
+
+# Separator between the fields of a note in the notes.flds column
+FIELD_SEPARATOR = '\x1f'
+
+# Name of the note type written to every package, shared across exports so
+# that Anki maps re-imported notes onto the same note type
+MODEL_NAME = "AI Anki Card Generator Basic"
+
+# Ids stay below 2**52 so they are exact in Anki's JavaScript and JSON handling
+_ID_RANGE = 1 << 52
+
+_HTML_TAG_RE = re.compile(r'<[^>]+>')
+
+# Characters used by Anki for note GUIDs
+_BASE91_CHARS = (
+    "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+    "!#$%&()*+,-./:;<=>?@[]^_`{|}~"
+)
+
+# Anki collection schema version 11, understood by every Anki 2.1 release
+_SCHEMA = """
+CREATE TABLE col (
+    id integer primary key, crt integer not null, mod integer not null,
+    scm integer not null, ver integer not null, dty integer not null,
+    usn integer not null, ls integer not null, conf text not null,
+    models text not null, decks text not null, dconf text not null,
+    tags text not null
+);
+CREATE TABLE notes (
+    id integer primary key, guid text not null, mid integer not null,
+    mod integer not null, usn integer not null, tags text not null,
+    flds text not null, sfld integer not null, csum integer not null,
+    flags integer not null, data text not null
+);
+CREATE TABLE cards (
+    id integer primary key, nid integer not null, did integer not null,
+    ord integer not null, mod integer not null, usn integer not null,
+    type integer not null, queue integer not null, due integer not null,
+    ivl integer not null, factor integer not null, reps integer not null,
+    lapses integer not null, left integer not null, odue integer not null,
+    odid integer not null, flags integer not null, data text not null
+);
+CREATE TABLE revlog (
+    id integer primary key, cid integer not null, usn integer not null,
+    ease integer not null, ivl integer not null, lastIvl integer not null,
+    factor integer not null, time integer not null, type integer not null
+);
+CREATE TABLE graves (
+    usn integer not null, oid integer not null, type integer not null
+);
+"""
+
+# Created after the bulk insert, which is much faster than updating them per row
+_INDEXES = """
+CREATE INDEX ix_notes_usn on notes (usn);
+CREATE INDEX ix_cards_usn on cards (usn);
+CREATE INDEX ix_revlog_usn on revlog (usn);
+CREATE INDEX ix_cards_nid on cards (nid);
+CREATE INDEX ix_cards_sched on cards (did, queue, due);
+CREATE INDEX ix_revlog_cid on revlog (cid);
+CREATE INDEX ix_notes_csum on notes (csum);
+"""
+
+_DECK_CONFIG = {
+    "id": 1, "name": "Default", "mod": 0, "usn": 0, "maxTaken": 60,
+    "autoplay": True, "timer": 0, "replayq": True, "dyn": False,
+    "new": {
+        "bury": True, "delays": [1, 10], "initialFactor": 2500,
+        "ints": [1, 4, 7], "order": 1, "perDay": 20, "separate": True,
+    },
+    "rev": {
+        "bury": True, "ease4": 1.3, "fuzz": 0.05, "ivlFct": 1,
+        "maxIvl": 36500, "minSpace": 1, "perDay": 100,
+    },
+    "lapse": {
+        "delays": [10], "leechAction": 0, "leechFails": 8,
+        "minInt": 1, "mult": 0,
+    },
+}
+
+_COLLECTION_CONFIG = {
+    "activeDecks": [1], "curDeck": 1, "newSpread": 0, "collapseTime": 1200,
+    "timeLim": 0, "estTimes": True, "dueCounts": True, "curModel": None,
+    "nextPos": 1, "sortType": "noteFld", "sortBackwards": False, "addToCur": True,
+}
+
+
+def _hash_int(*parts: str) -> int:
+    """Return a stable 64-bit integer derived from the given strings."""
+    digest = hashlib.sha256(FIELD_SEPARATOR.join(parts).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+
+def _stable_id(*parts: str) -> int:
+    """Return a stable positive id in the range of Anki's millisecond ids."""
+    return _hash_int(*parts) % _ID_RANGE + 1
+
+
+def note_guid(deck_name: str, question: str) -> str:
+    """
+    Return the GUID of a note, derived from its deck and question.
+
+    Exporting the same card again yields the same GUID, so Anki updates the
+    existing note on import instead of adding a duplicate.
+
+    Args:
+        deck_name: Full name of the deck the note belongs to
+        question: Question (front) of the note
+
+    Returns:
+        Base91 encoded GUID, as used by Anki
+    """
+    return _base91(_hash_int(deck_name, question))
+
+
+def _base91(value: int) -> str:
+    """Encode a non-negative integer with Anki's GUID alphabet."""
+    chars = []
+    while value:
+        value, index = divmod(value, len(_BASE91_CHARS))
+        chars.append(_BASE91_CHARS[index])
+    return ''.join(reversed(chars)) or _BASE91_CHARS[0]
+
+
+def _field_checksum(text: str) -> int:
+    """Checksum Anki stores for the sort field, used for duplicate detection."""
+    stripped = _HTML_TAG_RE.sub('', text).strip()
+    return int(hashlib.sha1(stripped.encode('utf-8')).hexdigest()[:8], 16)
+
+
+def _model(model_id: int, deck_id: int, now: int) -> dict:
+    """Build the Basic note type with Front and Back fields."""
+    fields = [
+        {"name": name, "ord": ord_, "sticky": False, "rtl": False,
+         "font": "Arial", "size": 20, "media": []}
+        for ord_, name in enumerate(("Front", "Back"))
+    ]
+    template = {
+        "name": "Card 1", "ord": 0, "qfmt": "{{Front}}",
+        "afmt": "{{FrontSide}}\n\n<hr id=answer>\n\n{{Back}}",
+        "did": None, "bqfmt": "", "bafmt": "",
+    }
+    return {
+        "id": model_id, "name": MODEL_NAME, "type": 0, "mod": now, "usn": -1,
+        "sortf": 0, "did": deck_id, "tmpls": [template], "flds": fields,
+        "css": ".card {\n font-family: arial;\n font-size: 20px;\n text-align: center;\n"
+               " color: black;\n background-color: white;\n}\n",
+        "latexPre": "\\documentclass[12pt]{article}\n\\special{papersize=3in,5in}\n"
+                    "\\usepackage[utf8]{inputenc}\n\\usepackage{amssymb,amsmath}\n"
+                    "\\pagestyle{empty}\n\\setlength{\\parindent}{0in}\n\\begin{document}\n",
+        "latexPost": "\\end{document}", "tags": [], "vers": [],
+        "req": [[0, "any", [0]]],
+    }
+
+
+def _deck(deck_id: int, name: str, now: int) -> dict:
+    """Build the JSON description of a deck."""
+    return {
+        "id": deck_id, "name": name, "mod": now, "usn": -1, "desc": "",
+        "dyn": 0, "conf": 1, "collapsed": False, "extendNew": 10, "extendRev": 50,
+        "newToday": [0, 0], "revToday": [0, 0], "lrnToday": [0, 0], "timeToday": [0, 0],
+    }
+
+
+def _iter_rows(
+    cards: Iterable,
+    deck_name: str,
+    tags: Sequence[str],
+    model_id: int,
+    deck_ids: Dict[str, int],
+    now: int,
+    stats: Dict[str, int]
+) -> Iterator[Tuple[tuple, tuple]]:
+    """
+    Turn cards into (note row, card row) pairs for executemany.
+
+    Cards may be (question, answer) tuples or anki_utils.AnkiNote, whose
+    deck and tags take precedence over the defaults. Repeated questions
+    within a deck share a GUID, so only the first one is kept.
+    """
+    seen_guids = set()
+    used_ids = set()
+
+    for card in cards:
+        question, answer = card[0], card[1]
+        note_deck = getattr(card, 'deck', None) or deck_name
+        note_tags = getattr(card, 'tags', None) or tags
+
+        value = _hash_int(note_deck, question)
+        guid = _base91(value)
+        if guid in seen_guids:
+            stats['duplicates'] += 1
+            continue
+        seen_guids.add(guid)
+
+        if note_deck not in deck_ids:
+            deck_ids[note_deck] = _stable_id('deck', note_deck)
+        deck_id = deck_ids[note_deck]
+
+        # Ids are derived from the GUID hash; probe on the (very unlikely) collision
+        note_id = value % _ID_RANGE + 1
+        while note_id in used_ids:
+            note_id += 1
+        used_ids.add(note_id)
+        card_id = (value >> 12) % _ID_RANGE + 1
+        while card_id in used_ids:
+            card_id += 1
+        used_ids.add(card_id)
+
+        stats['notes'] += 1
+        tag_text = f" {' '.join(tag.replace(' ', '_') for tag in note_tags)} " if note_tags else ""
+        note_row = (
+            note_id, guid, model_id, now, -1, tag_text,
+            question + FIELD_SEPARATOR + answer, question, _field_checksum(question), 0, ""
+        )
+        # New card (type 0, queue 0), due in the order the cards were given
+        card_row = (card_id, note_id, deck_id, 0, now, -1, 0, 0, stats['notes'], 0, 0, 0, 0, 0, 0, 0, 0, "")
+        yield note_row, card_row
+
+
+def _write_collection(
+    db_path: str,
+    cards: Iterable,
+    deck_name: str,
+    tags: Sequence[str]
+) -> Dict[str, int]:
+    """
+    Write an Anki collection database in a single transaction.
+
+    Args:
+        db_path: Path of the collection file to create
+        cards: Cards or AnkiNotes to write
+        deck_name: Deck used for cards without a deck of their own
+        tags: Tags used for cards without tags of their own
+
+    Returns:
+        Dict with the number of 'notes' written and 'duplicates' skipped
+    """
+    now = int(time.time())
+    model_id = _stable_id('model', MODEL_NAME)
+    deck_ids: Dict[str, int] = {}
+    stats = {'notes': 0, 'duplicates': 0}
+
+    connection = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        # The file is thrown away on failure, so durability is not needed
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.executescript(_SCHEMA)
+        connection.execute("BEGIN")
+
+        rows = _iter_rows(cards, deck_name, tags, model_id, deck_ids, now, stats)
+        note_insert = "INSERT INTO notes VALUES (?,?,?,?,?,?,?,?,?,?,?)"
+        card_insert = "INSERT INTO cards VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)"
+        while True:
+            # Bounded batches keep memory flat for arbitrarily large inputs
+            batch = [row for _, row in zip(range(10000), rows)]
+            if not batch:
+                break
+            connection.executemany(note_insert, [note for note, _ in batch])
+            connection.executemany(card_insert, [card for _, card in batch])
+
+        if not deck_ids:
+            deck_ids[deck_name] = _stable_id('deck', deck_name)
+        first_deck = next(iter(deck_ids.values()))
+
+        decks = {"1": _deck(1, "Default", now)}
+        for name, deck_id in deck_ids.items():
+            decks[str(deck_id)] = _deck(deck_id, name, now)
+
+        connection.execute(
+            "INSERT INTO col VALUES (1,?,?,?,11,0,0,0,?,?,?,?,?)",
+            (
+                now, now * 1000, now * 1000,
+                json.dumps(_COLLECTION_CONFIG),
+                json.dumps({str(model_id): _model(model_id, first_deck, now)}),
+                json.dumps(decks),
+                json.dumps({"1": _DECK_CONFIG}),
+                json.dumps({}),
+            )
+        )
+        for statement in _INDEXES.strip().splitlines():
+            connection.execute(statement)
+        connection.execute("COMMIT")
+    finally:
+        connection.close()
+
+    return stats
+
+
+def export_cards_to_apkg(
+    cards: Iterable,
+    file_path: str,
+    deck_name: str,
+    tags: Sequence[str] = ()
+) -> int:
+    """
+    Export cards to an Anki package (.apkg) that Anki imports directly.
+
+    The collection is written in one transaction with batched inserts, so
+    large decks export in seconds. Note GUIDs are derived from the deck name
+    and question, so importing a re-exported deck updates the existing notes
+    instead of duplicating them. Use '::' in deck_name for subdecks.
+
+    Args:
+        cards: Iterable of (question, answer) tuples or AnkiNotes
+        file_path: Path of the .apkg file to create
+        deck_name: Deck for cards that do not name their own
+        tags: Tags for cards that do not have their own (default: none)
+
+    Returns:
+        Number of notes written
+    """
+    folder = os.path.dirname(os.path.abspath(file_path))
+    with tempfile.TemporaryDirectory(dir=folder) as temp_dir:
+        db_path = os.path.join(temp_dir, "collection.anki2")
+        stats = _write_collection(db_path, cards, deck_name, tags)
+
+        temp_package = os.path.join(temp_dir, "package.apkg")
+        with zipfile.ZipFile(temp_package, 'w', zipfile.ZIP_DEFLATED) as package:
+            package.write(db_path, "collection.anki2")
+            # No media files, but Anki expects the media map
+            package.writestr("media", "{}")
+        os.replace(temp_package, file_path)
+
+    if stats['duplicates']:
+        print(f"Skipped {stats['duplicates']} cards with a repeated question")
+    print(f"Exported {stats['notes']} cards to {file_path}")
+    return stats['notes']
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point, returns the process exit code."""
+    parser = argparse.ArgumentParser(description="Export a CSV card file to an Anki package.")
+    parser.add_argument("csv_file", help="CSV file with question and answer columns")
+    parser.add_argument("output", help="path of the .apkg file to create")
+    parser.add_argument("--deck", help="deck name, '::' separates subdecks (default: file name)")
+    parser.add_argument("--delimiter", default=';', help="CSV delimiter (default: ';')")
+    parser.add_argument("--tag", action="append", default=[], help="tag added to every card")
+    args = parser.parse_args(argv)
+
+    deck_name = args.deck or os.path.splitext(os.path.basename(args.csv_file))[0]
+    try:
+        export_cards_to_apkg(iter_cards_from_csv_file(args.csv_file, args.delimiter), args.output, deck_name, args.tag)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Error exporting {args.csv_file}: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
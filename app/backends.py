@@ -0,0 +1,634 @@
+import asyncio
+import contextvars
+import itertools
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+from card_parser import CARD_LIST_SCHEMA
+from http_pool import DEFAULT_CONNECT_TIMEOUT, DEFAULT_POOL_SIZE, DEFAULT_READ_TIMEOUT, create_transport
+from instrumentation import record_tokens
+
+
+MODEL_NAME = 'gemini-1.5-pro'
+
+# Environment variable selecting the backend used by default: "sdk" (the
+# default), "rest" for the Gemini REST API, "mock" for the in-process mock,
+# or the base URL of a REST endpoint such as a running mock_server.py
+BACKEND_ENV = "ANKI_BACKEND"
+# Environment variable selecting the HTTP transport of REST backends, see
+# http_pool.create_transport
+TRANSPORT_ENV = "ANKI_HTTP_TRANSPORT"
+
+GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta"
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+
+_TOPIC_RE = re.compile(r'^\s*Topic: (.*)$', re.MULTILINE)
+_NUM_CARDS_RE = re.compile(r'generate (\d+) high-quality')
+_PART_RE = re.compile(r'This is part (\d+) of (\d+)')
+# Seconds between checks of an async SDK request waiting to switch the API key
+_KEY_SWITCH_POLL_SECONDS = 0.05
+
+# The Google Generative AI client library, imported on first use by
+# require_genai: it takes hundreds of milliseconds to import and commands that
+# never call the API should neither pay for it nor need it installed
+_genai = None
+_genai_lock = threading.Lock()
+
+
+def require_genai():
+    """
+    Import the Google Generative AI client library on first use.
+
+    Returns:
+        The google.generativeai module
+
+    Raises:
+        ImportError: If google-generativeai is not installed
+    """
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                try:
+                    import google.generativeai
+                except ImportError as e:
+                    raise ImportError(
+                        "Google Generative AI library not found. Please install it with: "
+                        "pip install google-generativeai"
+                    ) from e
+                _genai = google.generativeai
+    return _genai
+
+
+class GenerationBackend:
+    """
+    Interface between GeminiCardGenerator and the model it sends prompts to.
+
+    A backend only turns a prompt into response text. Prompt building,
+    caching, rate limiting, retries and parsing stay in the generator, so
+    every backend gets them for free and can be swapped without changing
+    results. Errors should carry an HTTP status in a `code` attribute, as the
+    SDK and HTTP transport errors do, so the scheduler can tell throttling and
+    transient failures apart. Backends report the token usage of each
+    response with instrumentation.record_tokens when the model returns it.
+    Backends must be safe to share between threads.
+    """
+
+    model_name = MODEL_NAME
+    # Output token limit when the backend knows it, None for the model's documented limit
+    max_output_tokens: Optional[int] = None
+
+    def generate_text(self, prompt: str, structured_output: bool = False) -> str:
+        """
+        Send a prompt and return the complete response text.
+
+        Args:
+            prompt: The prompt text
+            structured_output: Request JSON matching CARD_LIST_SCHEMA
+
+        Returns:
+            The response text
+        """
+        raise NotImplementedError
+
+    def open_stream(self, prompt: str, structured_output: bool = False) -> Iterator[str]:
+        """
+        Send a prompt and return an iterator over the response text as it arrives.
+
+        The request is made before returning, so errors opening the stream are
+        raised here and can be retried. Token usage may be recorded only once
+        the iterator is exhausted. The default implementation waits for the
+        complete response and returns it as a single chunk.
+
+        Args:
+            prompt: The prompt text
+            structured_output: Request JSON matching CARD_LIST_SCHEMA
+
+        Returns:
+            Iterator over chunks of response text
+        """
+        return iter([self.generate_text(prompt, structured_output)])
+
+    async def agenerate_text(self, prompt: str, structured_output: bool = False) -> str:
+        """
+        Asynchronous counterpart of generate_text.
+
+        The default implementation runs generate_text in the event loop's
+        default thread pool, in a copy of the caller's context so recorded
+        token usage reaches the caller's instrumentation.capture_tokens block.
+
+        Args:
+            prompt: The prompt text
+            structured_output: Request JSON matching CARD_LIST_SCHEMA
+
+        Returns:
+            The response text
+        """
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(None, context.run, self.generate_text, prompt, structured_output)
+
+
+class SdkBackend(GenerationBackend):
+    """
+    Backend calling Gemini through the official google.generativeai client.
+
+    google.generativeai keeps its configuration, including the API key,
+    process-wide. The client is configured for a backend's key when it makes
+    a request, and a backend with another key reconfigures it once the
+    requests in flight with the current key have finished; models built
+    before the key changed are rebuilt, so every request uses its backend's
+    key. Use the rest backend to call with several keys concurrently.
+    """
+
+    # Guards the process-wide configuration and is notified when a request ends
+    _configure_lock = threading.Condition()
+    _configured_key: Optional[str] = None
+    # Bumped whenever the client is reconfigured, so models built earlier are rebuilt
+    _configuration = 0
+    # Requests running with the configured key
+    _in_flight = 0
+
+    def __init__(self, api_key: str, model_name: str = MODEL_NAME):
+        """
+        Create a backend for an API key and model.
+
+        Args:
+            api_key: Google API key with Gemini access
+            model_name: Name of the Gemini model to use (default: 'gemini-1.5-pro')
+        """
+        if not api_key:
+            raise ValueError("API key is required for Gemini API access")
+
+        self.api_key = api_key
+        self.model_name = model_name
+        self._model = None
+        self._model_configuration = -1
+
+    def _try_acquire_model(self):
+        """
+        Start a request if the client can be used with this backend's key.
+
+        The client is reconfigured when it has another key and no request
+        with that key is in flight. The caller holds _configure_lock and
+        calls _release_model when the request has been sent.
+
+        Returns:
+            The model to call, or None if requests with another key are in flight
+        """
+        if SdkBackend._configured_key != self.api_key:
+            if SdkBackend._in_flight:
+                return None
+            require_genai().configure(api_key=self.api_key)
+            SdkBackend._configured_key = self.api_key
+            SdkBackend._configuration += 1
+        if self._model_configuration != SdkBackend._configuration:
+            self._model = require_genai().GenerativeModel(self.model_name)
+            self._model_configuration = SdkBackend._configuration
+        SdkBackend._in_flight += 1
+        return self._model
+
+    def _acquire_model(self):
+        """Start a request, waiting while requests with another key are in flight."""
+        with SdkBackend._configure_lock:
+            while True:
+                model = self._try_acquire_model()
+                if model is not None:
+                    return model
+                SdkBackend._configure_lock.wait()
+
+    async def _aacquire_model(self):
+        """Asynchronous variant of _acquire_model that waits without blocking the event loop."""
+        while True:
+            with SdkBackend._configure_lock:
+                model = self._try_acquire_model()
+            if model is not None:
+                return model
+            await asyncio.sleep(_KEY_SWITCH_POLL_SECONDS)
+
+    @staticmethod
+    def _release_model() -> None:
+        """End a request started with _acquire_model or _aacquire_model."""
+        with SdkBackend._configure_lock:
+            SdkBackend._in_flight -= 1
+            SdkBackend._configure_lock.notify_all()
+
+    def generate_text(self, prompt: str, structured_output: bool = False) -> str:
+        model = self._acquire_model()
+        try:
+            response = model.generate_content(prompt, generation_config=_generation_config(structured_output))
+        finally:
+            self._release_model()
+        _record_sdk_usage(response)
+        return response.text
+
+    def open_stream(self, prompt: str, structured_output: bool = False) -> Iterator[str]:
+        # The opened stream keeps its connection, so only opening it counts as in flight
+        model = self._acquire_model()
+        try:
+            response = model.generate_content(
+                prompt, stream=True, generation_config=_generation_config(structured_output)
+            )
+        finally:
+            self._release_model()
+        return _sdk_stream_text(response)
+
+    async def agenerate_text(self, prompt: str, structured_output: bool = False) -> str:
+        model = await self._aacquire_model()
+        try:
+            response = await model.generate_content_async(
+                prompt, generation_config=_generation_config(structured_output)
+            )
+        finally:
+            self._release_model()
+        _record_sdk_usage(response)
+        return response.text
+
+
+class RestBackend(GenerationBackend):
+    """
+    Backend calling the Gemini REST API, or a server speaking the same protocol.
+
+    Requests go through a pooled keep-alive transport from http_pool, so a
+    batch reuses its connections and TLS sessions instead of opening one per
+    call. Responses are requested gzip-compressed. Non-2xx responses raise
+    http_pool.HttpStatusError, whose code the scheduler uses to retry and back
+    off; connection failures raise ConnectionError and timeouts TimeoutError.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        model_name: str = MODEL_NAME,
+        base_url: str = GEMINI_API_URL,
+        transport: Optional[str] = None,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+        pool_size: int = DEFAULT_POOL_SIZE
+    ):
+        """
+        Create a backend for an API key, model and endpoint.
+
+        Args:
+            api_key: Google API key with Gemini access, sent as x-goog-api-key
+            model_name: Name of the Gemini model to use (default: 'gemini-1.5-pro')
+            base_url: API root URL, without the /models part (default: the public v1beta API)
+            transport: "auto", "httpx", "pool" or "urllib" (default: ANKI_HTTP_TRANSPORT, or "auto")
+            connect_timeout: Seconds to wait for a connection (default: 10)
+            read_timeout: Seconds to wait for a response (default: 120)
+            pool_size: Connections kept open per host (default: 8)
+        """
+        self.api_key = api_key
+        self.model_name = model_name
+        self.base_url = base_url.rstrip('/')
+        self.transport = create_transport(
+            transport or os.environ.get(TRANSPORT_ENV, "auto"), connect_timeout, read_timeout, pool_size
+        )
+
+    def _payload(self, prompt: str, structured_output: bool) -> Dict[str, Any]:
+        """Build the generateContent request body."""
+        payload: Dict[str, Any] = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+        if structured_output:
+            payload["generationConfig"] = {
+                "responseMimeType": "application/json",
+                "responseSchema": _rest_schema(CARD_LIST_SCHEMA),
+            }
+        return payload
+
+    def generate_text(self, prompt: str, structured_output: bool = False) -> str:
+        result = self.transport.post_json(
+            f"{self.base_url}/models/{self.model_name}:generateContent",
+            self._payload(prompt, structured_output),
+            {"x-goog-api-key": self.api_key or ""}
+        )
+        usage = result.get("usageMetadata") or {}
+        if usage:
+            candidates = result.get("candidates") or [{}]
+            record_tokens(
+                usage.get("promptTokenCount", 0), usage.get("candidatesTokenCount", 0),
+                candidates[0].get("finishReason") == "MAX_TOKENS"
+            )
+        return response_text(result)
+
+    def close(self) -> None:
+        """Close the pooled connections."""
+        self.transport.close()
+
+
+class MockApiError(Exception):
+    """Error injected by MockBackend, with an HTTP status code like real client errors."""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+class MockBackend(GenerationBackend):
+    """
+    Offline stand-in for the model, for tests, demos and benchmarks.
+
+    Answers every prompt with synthetic cards for the requested topic and
+    card count, as JSON or as Q:/A: prose, or cycles through canned response
+    texts. Latency follows a fixed, uniform or lognormal distribution and can
+    grow with the number of cards, like real output generation does.
+    Throttling (429) and server (500) errors are injected at the given rates.
+    With max_output_tokens set, longer responses are cut off at about four
+    characters per token and reported as truncated, like the real model.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        distribution: str = "fixed",
+        jitter: float = 0.0,
+        latency_per_card: float = 0.0,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        response_format: str = "json",
+        canned_responses: Optional[Sequence[str]] = None,
+        seed: Optional[int] = None,
+        model_name: str = "mock",
+        max_output_tokens: Optional[int] = None
+    ):
+        """
+        Create a mock backend.
+
+        Args:
+            latency: Median seconds per response (default: 0)
+            distribution: "fixed", "uniform" (latency +- jitter) or "lognormal"
+                (sigma jitter) (default: "fixed")
+            jitter: Spread of the latency distribution (default: 0)
+            latency_per_card: Extra seconds per requested card (default: 0)
+            error_rate: Fraction of requests failing with 500 (default: 0)
+            throttle_rate: Fraction of requests failing with 429 (default: 0)
+            response_format: "json" or "prose" for synthetic responses (default: "json")
+            canned_responses: Response texts returned in turn instead of synthetic cards
+            seed: Seed for reproducible latencies and errors (default: random)
+            model_name: Name used in cache keys (default: "mock")
+            max_output_tokens: Output token limit of the simulated model (default: none)
+        """
+        if distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"distribution must be one of {', '.join(LATENCY_DISTRIBUTIONS)}")
+        if response_format not in ("json", "prose"):
+            raise ValueError("response_format must be 'json' or 'prose'")
+
+        self.latency = latency
+        self.distribution = distribution
+        self.jitter = jitter
+        self.latency_per_card = latency_per_card
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.response_format = response_format
+        self.model_name = model_name
+        self.max_output_tokens = max_output_tokens
+        self._canned = itertools.cycle(canned_responses) if canned_responses else None
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def plan(self, prompt: str) -> float:
+        """
+        Decide the outcome of a request before it is answered.
+
+        Args:
+            prompt: The prompt text
+
+        Returns:
+            Seconds the response takes
+
+        Raises:
+            MockApiError: If an error is injected for this request
+        """
+        num_cards = _prompt_num_cards(prompt)
+        with self._lock:
+            roll = self._random.random()
+            if self.distribution == "uniform":
+                delay = self._random.uniform(self.latency - self.jitter, self.latency + self.jitter)
+            elif self.distribution == "lognormal":
+                delay = self.latency * math.exp(self._random.gauss(0.0, self.jitter))
+            else:
+                delay = self.latency
+
+        if roll < self.throttle_rate:
+            raise MockApiError(429, "Resource has been exhausted (e.g. check quota).")
+        if roll < self.throttle_rate + self.error_rate:
+            raise MockApiError(500, "An internal error has occurred.")
+        return max(0.0, delay) + self.latency_per_card * num_cards
+
+    def respond(self, prompt: str, structured_output: bool = False) -> str:
+        """
+        Build the response text for a prompt, without any delay.
+
+        Args:
+            prompt: The prompt text
+            structured_output: Answer with JSON whatever the response format, as the API does
+
+        Returns:
+            The response text
+        """
+        if self._canned:
+            with self._lock:
+                return next(self._canned)
+        return synthetic_response(prompt, "json" if structured_output else self.response_format)
+
+    def limit_output(self, text: str) -> Tuple[str, bool]:
+        """
+        Cut a response off at the output token limit.
+
+        Args:
+            text: Complete response text
+
+        Returns:
+            Tuple of (response text, whether it was truncated)
+        """
+        if self.max_output_tokens is None or len(text) <= self.max_output_tokens * 4:
+            return text, False
+        return text[:self.max_output_tokens * 4], True
+
+    def _answer(self, prompt: str, structured_output: bool) -> str:
+        """Build the response text and record its estimated token usage."""
+        text, truncated = self.limit_output(self.respond(prompt, structured_output))
+        record_tokens(len(prompt) // 4, len(text) // 4, truncated)
+        return text
+
+    def generate_text(self, prompt: str, structured_output: bool = False) -> str:
+        time.sleep(self.plan(prompt))
+        return self._answer(prompt, structured_output)
+
+    def open_stream(self, prompt: str, structured_output: bool = False) -> Iterator[str]:
+        delay = self.plan(prompt)
+        return _stream_chunks(self._answer(prompt, structured_output), delay)
+
+    async def agenerate_text(self, prompt: str, structured_output: bool = False) -> str:
+        await asyncio.sleep(self.plan(prompt))
+        return self._answer(prompt, structured_output)
+
+
+def _record_sdk_usage(response) -> None:
+    """Record the token usage of an SDK response, if it reports any."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    try:
+        finish_reason = response.candidates[0].finish_reason
+    except (AttributeError, IndexError):
+        finish_reason = None
+    record_tokens(
+        usage.prompt_token_count or 0, usage.candidates_token_count or 0,
+        getattr(finish_reason, "name", finish_reason) == "MAX_TOKENS"
+    )
+
+
+def _sdk_stream_text(response) -> Iterator[str]:
+    """Yield the text of a streamed SDK response, recording its usage from the final chunk."""
+    chunk = None
+    for chunk in response:
+        yield chunk.text
+    if chunk is not None:
+        _record_sdk_usage(chunk)
+
+
+def _stream_chunks(text: str, delay: float, chunks: int = 8) -> Iterator[str]:
+    """Yield text in pieces spread over delay seconds."""
+    size = max(1, math.ceil(len(text) / chunks))
+    for start in range(0, len(text), size):
+        time.sleep(delay / chunks)
+        yield text[start:start + size]
+
+
+def _prompt_num_cards(prompt: str) -> int:
+    """Read the requested card count from a generation prompt."""
+    match = _NUM_CARDS_RE.search(prompt)
+    return int(match.group(1)) if match else 10
+
+
+def synthetic_response(prompt: str, response_format: str = "json") -> str:
+    """
+    Invent a plausible model response for a card generation prompt.
+
+    The topic, card count and chunk part are read from the prompt, so chunked
+    requests get distinct questions and card counts come out right. Part i
+    of k is numbered i, i + k, i + 2k and so on: chunks differ in size by at
+    most one card, larger ones first, so the parts together are numbered
+    1 to the total card count without overlapping.
+
+    Args:
+        prompt: The prompt text
+        response_format: "json" for a JSON array, "prose" for Q:/A: lines (default: "json")
+
+    Returns:
+        The response text
+    """
+    topic_match = _TOPIC_RE.search(prompt)
+    topic = topic_match.group(1).strip() if topic_match else "the topic"
+    num_cards = _prompt_num_cards(prompt)
+    part_match = _PART_RE.search(prompt)
+    first, step = (int(part_match.group(1)), int(part_match.group(2))) if part_match else (1, 1)
+
+    cards = [
+        (f"What is key fact number {number} about {topic}?",
+         f"Key fact {number} about {topic}, explained in one or two short sentences for review.")
+        for number in range(first, first + num_cards * step, step)
+    ]
+    if response_format == "prose":
+        return "Here are your flashcards:\n\n" + "\n\n".join(f"Q: {q}\nA: {a}" for q, a in cards)
+    return json.dumps([{"question": q, "answer": a} for q, a in cards], ensure_ascii=False, indent=1)
+
+
+def response_text(result: Dict[str, Any]) -> str:
+    """
+    Extract the text of a decoded generateContent response.
+
+    Args:
+        result: Decoded JSON response body
+
+    Returns:
+        The concatenated text parts of the first candidate
+
+    Raises:
+        ValueError: If the response has no text, for example because it was blocked
+    """
+    try:
+        parts = result["candidates"][0]["content"]["parts"]
+    except (KeyError, IndexError, TypeError):
+        raise ValueError(f"Response contains no text: {json.dumps(result)[:200]}")
+    return "".join(part.get("text", "") for part in parts)
+
+
+def _rest_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a JSON schema to the REST API's form, which spells types in upper case."""
+    converted = {}
+    for key, value in schema.items():
+        if key == "type":
+            converted[key] = value.upper()
+        elif key == "items":
+            converted[key] = _rest_schema(value)
+        elif key == "properties":
+            converted[key] = {name: _rest_schema(prop) for name, prop in value.items()}
+        else:
+            converted[key] = value
+    return converted
+
+
+def _generation_config(structured_output: bool):
+    """
+    Build the SDK generation config for a request.
+
+    Args:
+        structured_output: Whether to request schema-constrained JSON output
+
+    Returns:
+        A GenerationConfig asking for JSON matching CARD_LIST_SCHEMA, or None
+    """
+    if not structured_output:
+        return None
+    return require_genai().GenerationConfig(
+        response_mime_type="application/json",
+        response_schema=CARD_LIST_SCHEMA
+    )
+
+
+def create_backend(spec: str, api_key: Optional[str] = None, model_name: str = MODEL_NAME) -> GenerationBackend:
+    """
+    Create a backend from a short specification.
+
+    Args:
+        spec: "sdk", "rest" for the Gemini REST API, "mock", or the base URL of a REST endpoint
+        api_key: Google API key, required by the sdk backend
+        model_name: Name of the Gemini model to use (default: 'gemini-1.5-pro')
+
+    Returns:
+        The backend
+
+    Raises:
+        ValueError: If spec names no known backend
+    """
+    if spec in ("", "sdk"):
+        return SdkBackend(api_key, model_name)
+    if spec == "rest":
+        return RestBackend(api_key, model_name)
+    if spec == "mock":
+        return MockBackend()
+    if spec.startswith(("http://", "https://")):
+        return RestBackend(api_key, model_name, spec)
+    raise ValueError(f"Unknown backend '{spec}', expected sdk, rest, mock or a URL")
+
+
+def default_backend(api_key: Optional[str] = None, model_name: str = MODEL_NAME) -> GenerationBackend:
+    """
+    Create the backend selected by the ANKI_BACKEND environment variable.
+
+    Args:
+        api_key: Google API key, required by the sdk backend
+        model_name: Name of the Gemini model to use (default: 'gemini-1.5-pro')
+
+    Returns:
+        The backend, SdkBackend unless ANKI_BACKEND says otherwise
+    """
+    return create_backend(os.environ.get(BACKEND_ENV, "sdk"), api_key, model_name)
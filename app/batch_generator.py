@@ -0,0 +1,279 @@
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from anki_utils import create_folder_for_anki_cards, dedupe_cards, iter_cards_from_csv_file, save_cards_to_csv
+from batch_journal import DONE, FAILED, BatchJournal, default_journal_path
+from card_store import CardStore
+
+
+DEFAULT_MAX_WORKERS = 4
+
+
+@dataclass
+class TopicResult:
+    """Outcome of generating the cards for a single batch topic."""
+    topic: str
+    csv_path: str
+    cards: List[Tuple[str, str]]
+    latency: float
+    error: Optional[str] = None
+    existing: int = 0
+
+
+def _generate_topic(
+    api_key: str,
+    topic: str,
+    num_cards: int,
+    refresh_cache: bool = False,
+    structured_output: bool = False,
+    exclude_questions: Optional[Sequence[str]] = None
+) -> Tuple[List[Tuple[str, str]], float, Optional[str]]:
+    """
+    Generate the cards for one topic and measure how long it took.
+
+    Args:
+        api_key: Google API key with Gemini access
+        topic: The topic to generate cards for
+        num_cards: Number of cards to generate
+        refresh_cache: Ignore cached responses but store the new ones (default: False)
+        structured_output: Request schema-constrained JSON output (default: False)
+        exclude_questions: Questions the topic already has (default: none)
+
+    Returns:
+        Tuple of (cards, latency in seconds, error message or None)
+    """
+    # Imported here so importing this module does not load the Gemini client
+    from gemini_generator import generate_anki_cards_with_gemini
+
+    start = time.perf_counter()
+    try:
+        cards = generate_anki_cards_with_gemini(
+            api_key, topic, num_cards, refresh_cache=refresh_cache, structured_output=structured_output,
+            exclude_questions=exclude_questions
+        )
+        error = None
+    except Exception as e:
+        cards = []
+        error = str(e)
+    return cards, time.perf_counter() - start, error
+
+
+def _read_existing_cards(csv_path: str, delimiter: str) -> List[Tuple[str, str]]:
+    """
+    Read the unique cards of a topic's existing CSV file.
+
+    Args:
+        csv_path: Path of the topic's CSV file
+        delimiter: CSV delimiter character
+
+    Returns:
+        List of (question, answer) tuples, empty if the file does not exist
+    """
+    if not os.path.exists(csv_path):
+        return []
+    try:
+        return dedupe_cards(list(iter_cards_from_csv_file(csv_path, delimiter)))
+    except (OSError, UnicodeDecodeError, csv.Error) as e:
+        print(f"Could not read {csv_path} ({e}), generating the full deck")
+        return []
+
+
+def generate_batch(
+    api_key: str,
+    topics: List[str],
+    base_dir: str,
+    cards_per_folder: int = 50,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    delimiter: str = ';',
+    refresh_cache: bool = False,
+    structured_output: bool = False,
+    store: Optional[CardStore] = None,
+    incremental: bool = False,
+    journal: Optional[BatchJournal] = None
+) -> List[TopicResult]:
+    """
+    Generate cards for many topics concurrently, one folder per topic.
+
+    Each topic is generated on a bounded thread pool and its CSV file is
+    written as soon as that topic finishes, so a slow topic never holds
+    back the others. Topics already in the response cache are served from
+    it unless refresh_cache is set. Rate limiting and retries are handled by
+    the shared GeminiCardGenerator; a topic that still fails is reported and
+    its CSV file is left untouched. If a card store is given, the cards of
+    every topic are also upserted into it, with the name of base_dir as deck.
+
+    With incremental=True, the existing CSV file of each topic is read first
+    and only the cards missing to reach cards_per_folder are requested, with
+    the existing questions excluded; the new cards are appended to the old
+    ones. Topics that are already complete are skipped without an API call.
+
+    Progress is checkpointed in a journal (by default a new one in
+    base_dir), so an interrupted batch can be continued with resume_batch.
+
+    Args:
+        api_key: Google API key with Gemini access
+        topics: Topic names, also used as folder names
+        base_dir: Directory in which the topic folders are created
+        cards_per_folder: Number of cards to generate per topic (default: 50)
+        max_workers: Maximum number of concurrent Gemini requests (default: 4)
+        delimiter: CSV delimiter character (default: ';')
+        refresh_cache: Ignore cached responses but store the new ones (default: False)
+        structured_output: Request schema-constrained JSON output (default: False)
+        store: Card store that receives the generated cards (default: none)
+        incremental: Only generate the cards missing from existing CSV files (default: False)
+        journal: Journal to record progress in (default: a new journal in base_dir)
+
+    Returns:
+        List of TopicResult in completion order
+    """
+    if max_workers < 1:
+        raise ValueError("max_workers must be at least 1")
+
+    # Folders are created up front so failures show up before any API call
+    csv_paths = {}
+    for topic in topics:
+        folder_path = create_folder_for_anki_cards(os.path.join(base_dir, topic))
+        csv_paths[topic] = os.path.join(folder_path, f"{topic}_cards.csv")
+
+    if journal is None:
+        journal = BatchJournal.create(default_journal_path(base_dir), {
+            "topics": list(topics),
+            "base_dir": os.path.abspath(base_dir),
+            "cards_per_folder": cards_per_folder,
+            "delimiter": delimiter,
+            "structured_output": structured_output,
+            "incremental": incremental,
+        })
+
+    deck = os.path.basename(os.path.normpath(os.path.abspath(base_dir)))
+    results = []
+    batch_start = time.perf_counter()
+
+    existing: Dict[str, List[Tuple[str, str]]] = {}
+    pending = list(topics)
+    if incremental:
+        existing = {topic: _read_existing_cards(csv_paths[topic], delimiter) for topic in topics}
+        pending = [topic for topic in topics if len(existing[topic]) < cards_per_folder]
+        for topic in topics:
+            if topic not in pending:
+                print(f"'{topic}' already has {len(existing[topic])} cards, skipping")
+                journal.record(topic, DONE, csv_path=csv_paths[topic], cards=len(existing[topic]))
+                results.append(TopicResult(topic, csv_paths[topic], existing[topic], 0.0, existing=len(existing[topic])))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for topic in pending:
+            old_cards = existing.get(topic, [])
+            exclude_questions = [question for question, _ in old_cards]
+            future = executor.submit(
+                _generate_topic, api_key, topic, cards_per_folder - len(old_cards),
+                refresh_cache, structured_output, exclude_questions
+            )
+            futures[future] = topic
+        print(f"\nGenerating cards for {len(pending)} topics ({max_workers} concurrent requests)...")
+
+        try:
+            for future in as_completed(futures):
+                topic = futures[future]
+                cards, latency, error = future.result()
+                old_cards = existing.get(topic, [])
+
+                if error:
+                    # Keep whatever is on disk rather than replacing it with an empty deck
+                    print(f"Error generating cards for '{topic}': {error}")
+                    print(f"Left {csv_paths[topic]} unchanged")
+                    journal.record(topic, FAILED, csv_path=csv_paths[topic], error=error)
+                else:
+                    if old_cards:
+                        print(f"Generated {len(cards)} new cards for '{topic}' in {latency:.2f}s "
+                              f"({len(old_cards)} already existed)")
+                        cards = dedupe_cards(old_cards + cards)
+                    else:
+                        print(f"Generated {len(cards)} cards for '{topic}' in {latency:.2f}s")
+                    # Write the CSV as soon as the topic is done
+                    save_cards_to_csv(cards, csv_paths[topic], delimiter=delimiter)
+                    if store is not None:
+                        inserted, updated = store.upsert_cards(deck, topic, cards)
+                        print(f"Stored '{topic}': {inserted} new, {updated} updated cards")
+                    journal.record(topic, DONE, csv_path=csv_paths[topic], cards=len(cards))
+
+                results.append(TopicResult(topic, csv_paths[topic], cards, latency, error, len(old_cards)))
+        except KeyboardInterrupt:
+            # Finished topics are in the journal; queued ones must not start
+            for future in futures:
+                future.cancel()
+            print(f"\nInterrupted, resume the remaining topics from {journal.path}")
+            raise
+
+    _print_batch_summary(results, time.perf_counter() - batch_start)
+    return results
+
+
+def resume_batch(
+    api_key: str,
+    journal_path: str,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    refresh_cache: bool = False,
+    store: Optional[CardStore] = None
+) -> List[TopicResult]:
+    """
+    Continue an interrupted batch from its journal.
+
+    Finished topics are skipped; failed and unfinished ones are generated
+    again with the parameters of the original job. Topics whose request had
+    already completed are served from the response cache.
+
+    Args:
+        api_key: Google API key with Gemini access
+        journal_path: Path of the batch journal
+        max_workers: Maximum number of concurrent Gemini requests (default: 4)
+        refresh_cache: Ignore cached responses but store the new ones (default: False)
+        store: Card store that receives the generated cards (default: none)
+
+    Returns:
+        List of TopicResult of the topics run now, in completion order
+    """
+    journal = BatchJournal.load(journal_path)
+    journal.print_status()
+    topics = journal.pending_topics()
+    if not topics:
+        print("All topics are done, nothing to resume")
+        return []
+
+    params = journal.params
+    return generate_batch(
+        api_key, topics, params["base_dir"], params["cards_per_folder"], max_workers,
+        params.get("delimiter", ';'), refresh_cache, params.get("structured_output", False),
+        store, params.get("incremental", False), journal
+    )
+
+
+def _print_batch_summary(results: List[TopicResult], wall_time: float) -> None:
+    """
+    Print per-topic latency and the total wall-clock time of a batch.
+
+    Args:
+        results: Results of the finished batch
+        wall_time: Total elapsed time of the batch in seconds
+    """
+    print("\nBatch summary:")
+    for result in sorted(results, key=lambda r: r.latency, reverse=True):
+        status = "FAILED" if result.error else f"{len(result.cards)} cards"
+        if result.existing and not result.error:
+            status += f", {len(result.cards) - result.existing} new"
+        print(f"  {result.topic}: {result.latency:.2f}s ({status})")
+
+    total_latency = sum(result.latency for result in results)
+    print(f"Total wall-clock time: {wall_time:.2f}s "
+          f"(sequential would have been ~{total_latency:.2f}s)")
+
+
+if __name__ == "__main__":
+    from cli import main
+
+    sys.exit(main(["batch"] + sys.argv[1:]))
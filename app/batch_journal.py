@@ -0,0 +1,134 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+
+# File name of the journal kept in a batch's base directory
+JOURNAL_NAME = ".batch_journal.jsonl"
+
+# Topic states recorded in the journal, topics without a record have not finished
+DONE = "done"
+FAILED = "failed"
+
+
+def default_journal_path(base_dir: str) -> str:
+    """Return the journal path of a batch writing into base_dir."""
+    return os.path.join(base_dir, JOURNAL_NAME)
+
+
+class BatchJournal:
+    """
+    Append-only JSONL checkpoint journal of a batch job.
+
+    The first record holds the job parameters; every later record holds the
+    new state of one topic. Records are flushed and synced as they are
+    written, so after a crash or Ctrl-C the journal tells exactly which
+    topics are finished. A partly written last line is ignored on load.
+    The journal is safe to write from several threads.
+    """
+
+    def __init__(self, path: str, params: Dict[str, Any], states: Optional[Dict[str, Dict[str, Any]]] = None):
+        """
+        Wrap an existing journal file; use create or load to get one.
+
+        Args:
+            path: Path of the journal file
+            params: Job parameters from the first record
+            states: Latest record of every topic
+        """
+        self.path = path
+        self.params = params
+        self.states = states or {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, path: str, params: Dict[str, Any]) -> 'BatchJournal':
+        """
+        Start a new journal, replacing any earlier one at path.
+
+        Args:
+            path: Path of the journal file
+            params: JSON-serialisable job parameters, including 'topics'
+
+        Returns:
+            The new journal
+        """
+        journal = cls(path, dict(params))
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(json.dumps({"type": "job", "created_at": time.time(), **params}, ensure_ascii=False) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        return journal
+
+    @classmethod
+    def load(cls, path: str) -> 'BatchJournal':
+        """
+        Read a journal written by an earlier run.
+
+        Args:
+            path: Path of the journal file
+
+        Returns:
+            The journal with the job parameters and the latest state of every topic
+
+        Raises:
+            ValueError: If the file does not start with a job record
+        """
+        params = None
+        states = {}
+        with open(path, 'r', encoding='utf-8') as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Interrupted while writing the last record
+                    continue
+                if record.get("type") == "job":
+                    params = {key: value for key, value in record.items() if key not in ("type", "created_at")}
+                elif record.get("type") == "topic":
+                    states[record["topic"]] = record
+
+        if params is None:
+            raise ValueError(f"Not a batch journal: {path}")
+        return cls(path, params, states)
+
+    def record(self, topic: str, state: str, **fields: Any) -> None:
+        """
+        Append the new state of a topic.
+
+        Args:
+            topic: Topic name
+            state: DONE or FAILED
+            **fields: Further JSON-serialisable details, such as csv_path or error
+        """
+        entry = {"type": "topic", "topic": topic, "state": state, "time": time.time(), **fields}
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as file:
+                file.write(line)
+                file.flush()
+                os.fsync(file.fileno())
+            self.states[topic] = entry
+
+    def pending_topics(self) -> List[str]:
+        """
+        Return the topics that still have to run, in job order.
+
+        Topics that failed or had not finished when the job stopped are
+        included; finished topics are not.
+
+        Returns:
+            List of topic names
+        """
+        return [topic for topic in self.params.get("topics", [])
+                if self.states.get(topic, {}).get("state") != DONE]
+
+    def print_status(self) -> None:
+        """Print how many topics are done, failed and not yet run."""
+        topics = self.params.get("topics", [])
+        done = sum(1 for topic in topics if self.states.get(topic, {}).get("state") == DONE)
+        failed = sum(1 for topic in topics if self.states.get(topic, {}).get("state") == FAILED)
+        print(f"Batch journal {self.path}: {done} of {len(topics)} topics done, "
+              f"{failed} failed, {len(topics) - done - failed} not finished")
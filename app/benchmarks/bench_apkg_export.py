@@ -0,0 +1,35 @@
+"""
+Benchmark exporting a large deck to an Anki package.
+
+Run from the app directory:
+    python benchmarks/bench_apkg_export.py [--cards 100000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from apkg_exporter import export_cards_to_apkg  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cards", type=int, default=100000, help="cards in the deck (default: 100000)")
+    args = parser.parse_args()
+
+    cards = [(f"Ko je bio vođa Topličkog ustanka? {i}", f"Kosta Vojinović ({i})") for i in range(args.cards)]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "deck.apkg")
+        for run in ("first export", "re-export"):
+            start = time.perf_counter()
+            export_cards_to_apkg(cards, path, "Istorija::Srbija::20. vek")
+            elapsed = time.perf_counter() - start
+            print(f"{run:<14} {args.cards / elapsed:>10.0f} cards/s {elapsed:>7.2f}s "
+                  f"{os.path.getsize(path) / 1e6:>7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+End-to-end generation benchmark against the offline mock Gemini server.
+
+Starts mock_server in-process and points the app at it through the
+ANKI_BACKEND environment variable, so the full path (prompt building, rate
+limiting, HTTP, parsing, batch bookkeeping and CSV writing) is measured
+without an API key. Reports cards/s, p50/p95 latency per call and peak RSS
+for single, batch and chunked generation. Results can be saved as JSON and
+compared against an earlier run; a drop in cards/s or a rise in p95 latency
+beyond the tolerance is reported as a regression.
+
+Run from the app directory:
+    python benchmarks/bench_generation.py [--latency 0.05] [--save results.json] [--baseline old.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backends import BACKEND_ENV, LATENCY_DISTRIBUTIONS, TRANSPORT_ENV, MockBackend  # noqa: E402
+from http_pool import TRANSPORTS  # noqa: E402
+from mock_server import start_mock_server  # noqa: E402
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Relative change in cards/s or p95 latency reported as a regression
+DEFAULT_TOLERANCE = 0.10
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Return the nearest-rank percentile of values."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Return the peak resident set size of this process in MB, if the platform reports it."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def measure(name: str, calls: List[Callable[[], List[Tuple[int, float]]]]) -> Dict[str, object]:
+    """
+    Run calls one after another and summarise them.
+
+    Args:
+        name: Scenario name
+        calls: Functions returning a list of (cards, latency in seconds), one entry per timed call
+
+    Returns:
+        Scenario results
+    """
+    latencies = []
+    cards = 0
+    errors = 0
+    start = time.perf_counter()
+    for call in calls:
+        for count, latency in call():
+            cards += count
+            errors += count == 0
+            latencies.append(latency)
+    elapsed = time.perf_counter() - start
+
+    result = {
+        "calls": len(latencies),
+        "cards": cards,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "cards_per_sec": round(cards / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    print(f"{name:<8} {result['calls']:>6} {cards:>7} {result['cards_per_sec']:>9.0f} "
+          f"{result['p50_ms']:>8.0f} {result['p95_ms']:>8.0f} {errors:>6} "
+          f"{result['peak_rss_mb'] or 0:>8.1f}")
+    return result
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> bool:
+    """
+    Print the change of every scenario against a baseline.
+
+    Args:
+        results: Scenario results of this run
+        baseline: Scenario results of an earlier run
+        tolerance: Relative change reported as a regression
+
+    Returns:
+        True if any scenario regressed
+    """
+    regressed = False
+    print(f"\nAgainst baseline (tolerance {tolerance:.0%}):")
+    for name, result in results.items():
+        old = baseline.get(name)
+        if not old:
+            print(f"  {name}: not in baseline")
+            continue
+        speed = result["cards_per_sec"] / old["cards_per_sec"] - 1
+        p95 = result["p95_ms"] / old["p95_ms"] - 1 if old["p95_ms"] else 0.0
+        worse = speed < -tolerance or p95 > tolerance
+        regressed |= worse
+        print(f"  {name}: cards/s {speed:+.1%}, p95 {p95:+.1%}" + ("  REGRESSION" if worse else ""))
+    return regressed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.05, help="median mock latency in seconds (default: 0.05)")
+    parser.add_argument("--distribution", choices=LATENCY_DISTRIBUTIONS, default="fixed",
+                        help="mock latency distribution (default: fixed)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="spread of the latency distribution (default: 0)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 500 responses (default: 0)")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of 429 responses (default: 0)")
+    parser.add_argument("--format", choices=("json", "prose"), default="json", help="mock response format")
+    parser.add_argument("--transport", choices=TRANSPORTS, default="auto",
+                        help="HTTP transport of the REST backend (default: auto)")
+    parser.add_argument("--requests", type=int, default=20, help="calls or topics per scenario (default: 20)")
+    parser.add_argument("--cards", type=int, default=10, help="cards per single call and batch topic (default: 10)")
+    parser.add_argument("--chunked-cards", type=int, default=200, help="cards per chunked call (default: 200)")
+    parser.add_argument("--workers", type=int, default=4, help="batch workers (default: 4)")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against results saved by an earlier run")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help=f"relative change reported as a regression (default: {DEFAULT_TOLERANCE})")
+    args = parser.parse_args()
+
+    backend = MockBackend(
+        args.latency, args.distribution, args.jitter, error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate, response_format=args.format, seed=1
+    )
+    server, url = start_mock_server(backend)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Set before the generator modules are imported, they read these at import or first use
+        os.environ[BACKEND_ENV] = url
+        os.environ[TRANSPORT_ENV] = args.transport
+        os.environ["ANKI_CARD_CACHE"] = os.path.join(temp_dir, "cache.sqlite3")
+        os.environ["ANKI_TOKEN_STATS"] = os.path.join(temp_dir, "token_stats.json")
+        from batch_generator import generate_batch
+        from gemini_generator import GeminiGenerationError, generate_anki_cards_with_gemini
+
+        def single(key: str, topic: str, num_cards: int, **options) -> Callable[[], List[Tuple[int, float]]]:
+            def call():
+                start = time.perf_counter()
+                try:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        count = len(generate_anki_cards_with_gemini(key, topic, num_cards, use_cache=False, **options))
+                except GeminiGenerationError:
+                    count = 0
+                return [(count, time.perf_counter() - start)]
+            return call
+
+        def batch() -> List[Tuple[int, float]]:
+            topics = [f"Topic {i}" for i in range(args.requests)]
+            with contextlib.redirect_stdout(io.StringIO()):
+                results = generate_batch(
+                    "bench-batch", topics, os.path.join(temp_dir, "batch"), args.cards, args.workers,
+                    refresh_cache=True
+                )
+            return [(len(result.cards), result.latency) for result in results]
+
+        print(f"Mock server at {url}, latency {args.latency * 1000:.0f}ms ({args.distribution})")
+        print(f"{'scenario':<8} {'calls':>6} {'cards':>7} {'cards/s':>9} {'p50 ms':>8} {'p95 ms':>8} "
+              f"{'errors':>6} {'RSS MB':>8}")
+        # Each scenario uses its own API key, so its own rate limiter and concurrency state
+        results = {
+            "single": measure("single", [
+                single("bench-single", f"Single {i}", args.cards) for i in range(args.requests)
+            ]),
+            "batch": measure("batch", [batch]),
+            "chunked": measure("chunked", [
+                single("bench-chunked", f"Chunked {i}", args.chunked_cards) for i in range(max(1, args.requests // 4))
+            ]),
+        }
+    server.shutdown()
+
+    if args.save:
+        report = {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "settings": {key: value for key, value in vars(args).items() if key not in ("save", "baseline")},
+            "scenarios": results,
+        }
+        with open(args.save, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+        print(f"Saved results to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)["scenarios"]
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
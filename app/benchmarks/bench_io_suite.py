@@ -0,0 +1,269 @@
+"""
+Micro-benchmarks for the card parsers and file I/O, with peak memory.
+
+Measures _try_parse_json, _extract_cards_from_text,
+create_anki_cards_from_text_file, create_anki_cards_from_csv_file and
+save_cards_to_csv on synthetic decks of mixed Cyrillic and Latin-extended
+Serbian text. Every case runs in its own process, so the reported peak RSS
+belongs to that case alone. Results can be saved as JSON and compared
+against an earlier run; a drop in throughput or a rise in peak RSS beyond
+the tolerance is reported as a regression.
+
+Corpora are written to a temporary directory first. At 10M cards the
+card files take about 1 GB each, and the in-memory parsers need several
+times that in RAM, so pick the cases accordingly.
+
+Run from the app directory:
+    python benchmarks/bench_io_suite.py [--sizes 1000 10000 100000] [--cases read_csv save_csv]
+                                        [--save results.json] [--baseline old.json]
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+CASES = ("parse_json", "extract_text", "read_text", "read_csv", "save_csv")
+DEFAULT_SIZES = [1000, 10000, 100000]
+# Relative drop in cards/s or rise in peak RSS reported as a regression
+DEFAULT_TOLERANCE = 0.10
+
+_QUESTIONS = [
+    "Ко је предводио Топлички устанак {i}. године?",
+    "Koja je bila uloga Nikole Pašića u Krfskoj deklaraciji ({i})?",
+    "Када је потписан Букурешки мир? [{i}]",
+    "Šta je bila Đerdapska klisura za Rimljane, pitanje {i}?",
+]
+_ANSWERS = [
+    "Коста Војиновић и Коста Миловановић Пећанац, уз подршку народа ({i})",
+    "Predsednik vlade; pregovarao je sa Jugoslovenskim odborom, \"Krf\" 1917 ({i})",
+    "Десетог августа 1913. године, после Другог балканског рата ({i})",
+    "Važan prelaz na Dunavu; Trajanov most i Tabula Traiana, ćirilica: Ђердап ({i})",
+]
+
+
+def iter_cards(num_cards: int) -> Iterator[Tuple[str, str]]:
+    """Yield num_cards distinct cards alternating between Cyrillic and Latin-extended text."""
+    count = len(_QUESTIONS)
+    for i in range(num_cards):
+        yield _QUESTIONS[i % count].format(i=i), _ANSWERS[i % count].format(i=i)
+
+
+def write_corpora(folder: str, num_cards: int) -> Dict[str, str]:
+    """
+    Write every corpus for one deck size.
+
+    Args:
+        folder: Directory for the corpus files
+        num_cards: Cards per corpus
+
+    Returns:
+        Corpus name -> file path
+    """
+    paths = {name: os.path.join(folder, f"{name}-{num_cards}.{ext}")
+             for name, ext in (("json", "json"), ("prose", "txt"), ("tsv", "txt"), ("csv", "csv"))}
+    with open(paths["json"], 'w', encoding='utf-8') as file:
+        file.write("Evo kartica koje ste tražili:\n```json\n[\n")
+        file.writelines(
+            ("" if i == 0 else ",\n") + json.dumps({"question": q, "answer": a}, ensure_ascii=False)
+            for i, (q, a) in enumerate(iter_cards(num_cards))
+        )
+        file.write("\n]\n```\n")
+    with open(paths["prose"], 'w', encoding='utf-8') as file:
+        file.writelines(f"Q: {q}\nA: {a}\n\n" for q, a in iter_cards(num_cards))
+    with open(paths["tsv"], 'w', encoding='utf-8') as file:
+        file.write("#separator:tab\n#html:false\n")
+        file.writelines(f"{q}\t{a}\n" for q, a in iter_cards(num_cards))
+    with open(paths["csv"], 'w', encoding='utf-8', newline='') as file:
+        csv.writer(file, delimiter=';').writerows(iter_cards(num_cards))
+    return paths
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Return the peak resident set size of this process in MB, if the platform reports it."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def _read_text(path: str) -> str:
+    """Read a whole corpus file into memory."""
+    with open(path, 'r', encoding='utf-8') as file:
+        return file.read()
+
+
+def _prepare(case: str, paths: Dict[str, str], output: str) -> Tuple[Callable[[], int], int]:
+    """
+    Load what a case needs before it is timed.
+
+    Args:
+        case: Name from CASES
+        paths: Corpus files of one deck size
+        output: Scratch file for cases that write
+
+    Returns:
+        Tuple of (function running the case once and returning the card count, bytes processed)
+    """
+    from anki_utils import create_anki_cards_from_csv_file, create_anki_cards_from_text_file, save_cards_to_csv
+    from gemini_generator import _extract_cards_from_text, _try_parse_json
+
+    if case == "parse_json":
+        text = _read_text(paths["json"])
+        return lambda: len(_try_parse_json(text) or []), os.path.getsize(paths["json"])
+    if case == "extract_text":
+        text = _read_text(paths["prose"])
+        return lambda: len(_extract_cards_from_text(text)), os.path.getsize(paths["prose"])
+    if case == "read_text":
+        return lambda: len(create_anki_cards_from_text_file(paths["tsv"])), os.path.getsize(paths["tsv"])
+    if case == "read_csv":
+        return lambda: len(create_anki_cards_from_csv_file(paths["csv"], ';')), os.path.getsize(paths["csv"])
+    if case == "save_csv":
+        cards = create_anki_cards_from_csv_file(paths["csv"], ';')
+        return lambda: save_cards_to_csv(cards, output, ';'), os.path.getsize(paths["csv"])
+    raise ValueError(f"Unknown case {case}")
+
+
+def _run_case(case: str, paths: Dict[str, str], output: str, repeat: int, connection) -> None:
+    """Child process: time one case and send back the best run and the peak RSS."""
+    try:
+        run, size = _prepare(case, paths, output)
+        best = float("inf")
+        cards = 0
+        for _ in range(repeat):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                cards = run()
+            best = min(best, time.perf_counter() - start)
+        connection.send({"cards": cards, "seconds": best, "bytes": size, "peak_rss_mb": _peak_rss_mb()})
+    except BaseException as e:
+        connection.send({"error": f"{type(e).__name__}: {e}"})
+    finally:
+        connection.close()
+
+
+def measure(case: str, paths: Dict[str, str], output: str, repeat: int) -> Dict[str, object]:
+    """
+    Run one case in a fresh process.
+
+    Args:
+        case: Name from CASES
+        paths: Corpus files of one deck size
+        output: Scratch file for cases that write
+        repeat: Runs per measurement, the fastest is reported
+
+    Returns:
+        Measurement with cards, seconds, cards_per_sec, mb_per_sec and peak_rss_mb, or error
+    """
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_run_case, args=(case, paths, output, repeat, sender))
+    process.start()
+    sender.close()
+    try:
+        result = receiver.recv()
+    except EOFError:
+        result = {"error": "worker died, probably out of memory"}
+    process.join()
+
+    if "error" not in result:
+        seconds = result["seconds"]
+        result["cards_per_sec"] = round(result["cards"] / seconds, 1)
+        result["mb_per_sec"] = round(result.pop("bytes") / 1e6 / seconds, 2)
+        result["seconds"] = round(seconds, 4)
+    return result
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> bool:
+    """
+    Print the change of every measurement against a baseline.
+
+    Args:
+        results: Measurements of this run, keyed by "case/size"
+        baseline: Measurements of an earlier run
+        tolerance: Relative change reported as a regression
+
+    Returns:
+        True if any measurement regressed
+    """
+    regressed = False
+    print(f"\nAgainst baseline (tolerance {tolerance:.0%}):")
+    for key, result in results.items():
+        old = baseline.get(key)
+        if not old or "error" in old or "error" in result:
+            print(f"  {key}: not comparable")
+            continue
+        speed = result["cards_per_sec"] / old["cards_per_sec"] - 1
+        memory = (result["peak_rss_mb"] / old["peak_rss_mb"] - 1) if old.get("peak_rss_mb") else 0.0
+        worse = speed < -tolerance or memory > tolerance
+        regressed |= worse
+        print(f"  {key}: cards/s {speed:+.1%}, peak RSS {memory:+.1%}" + ("  REGRESSION" if worse else ""))
+    return regressed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="deck sizes, up to 10000000 (default: 1000 10000 100000)")
+    parser.add_argument("--cases", nargs="+", choices=CASES, default=list(CASES), help="cases to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement, best is reported (default: 3)")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against results saved by an earlier run")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help=f"relative change reported as a regression (default: {DEFAULT_TOLERANCE})")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'case':<13} {'cards':>9} {'seconds':>9} {'cards/s':>11} {'MB/s':>8} {'peak RSS':>10}")
+    with tempfile.TemporaryDirectory() as folder:
+        output = os.path.join(folder, "out.csv")
+        for num_cards in args.sizes:
+            paths = write_corpora(folder, num_cards)
+            for case in args.cases:
+                result = measure(case, paths, output, args.repeat)
+                results[f"{case}/{num_cards}"] = result
+                if "error" in result:
+                    print(f"{case:<13} {num_cards:>9} failed: {result['error']}")
+                else:
+                    print(f"{case:<13} {result['cards']:>9} {result['seconds']:>9.3f} "
+                          f"{result['cards_per_sec']:>11.0f} {result['mb_per_sec']:>8.1f} "
+                          f"{result['peak_rss_mb'] or 0:>8.1f}MB")
+            for path in paths.values():
+                os.remove(path)
+
+    if args.save:
+        report = {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": results,
+        }
+        with open(args.save, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+        print(f"Saved results to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)["results"]
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""
+Benchmark the mmap/process-pool bulk importer against the streaming text reader.
+
+Run from the app directory:
+    python benchmarks/bench_mmap_reader.py [--lines 2000000] [--workers 4]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anki_utils import iter_cards_from_text_file  # noqa: E402
+from mmap_reader import iter_records_mmap  # noqa: E402
+
+
+def write_corpus(path: str, num_lines: int) -> None:
+    """Write an Anki-export-like file: question, answer, then GUID, note type, deck and tags columns."""
+    extra = "\tBasic\tIstorija::Srbija::20. vek\t" + " ".join(f"tag{n}" for n in range(12))
+    with open(path, 'w', encoding='utf-8') as file:
+        for i in range(num_lines):
+            file.write(f"Ko je bio vođa Topličkog ustanka? {i}\tKosta Vojinović ({i})\tg{i:012x}{extra}\n")
+
+
+def measure(label: str, func, path: str) -> None:
+    size_mb = os.path.getsize(path) / 1e6
+    start = time.perf_counter()
+    count = sum(1 for _ in func(path))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<24} {count:>9} cards {elapsed:>7.2f}s {size_mb / elapsed:>8.1f} MB/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=2000000, help="lines in the corpus (default: 2000000)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--chunk-mb", type=int, default=8, help="byte range size in MB (default: 8)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "deck.txt")
+        write_corpus(path, args.lines)
+        chunk_bytes = args.chunk_mb * 1024 * 1024
+
+        measure("text reader", iter_cards_from_text_file, path)
+        measure("mmap, 1 worker", lambda p: iter_records_mmap(p, workers=1, chunk_bytes=chunk_bytes), path)
+        measure(f"mmap, {args.workers} workers",
+                lambda p: iter_records_mmap(p, workers=args.workers, chunk_bytes=chunk_bytes), path)
+
+
+if __name__ == "__main__":
+    main()
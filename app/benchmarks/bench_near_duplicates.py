@@ -0,0 +1,46 @@
+"""
+Benchmark near-duplicate detection on a synthetic deck with planted rewordings.
+
+Run from the app directory:
+    python benchmarks/bench_near_duplicates.py [--cards 50000 100000 200000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from near_duplicates import remove_near_duplicates  # noqa: E402
+
+
+def make_questions(num_cards: int, seed: int = 0) -> list:
+    """Build questions sharing a common prefix, with one reworded copy per 1000 cards."""
+    rng = random.Random(seed)
+    syllables = "ka ri po ve sta ni ja lo mi de tu ra go sa vo".split()
+    vocabulary = ["".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))) for _ in range(20000)]
+    questions = ["Ko je " + " ".join(rng.choice(vocabulary) for _ in range(6)) + "?" for _ in range(num_cards)]
+    for i in range(0, num_cards - 1, 1000):
+        questions[i + 1] = questions[i].replace("?", " danas?")
+    return questions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cards", type=int, nargs="+", default=[50000, 100000, 200000],
+                        help="deck sizes to measure (default: 50000 100000 200000)")
+    args = parser.parse_args()
+
+    questions = make_questions(max(args.cards))
+    for num_cards in args.cards:
+        start = time.perf_counter()
+        kept, dropped = remove_near_duplicates((question, "") for question in questions[:num_cards])
+        elapsed = time.perf_counter() - start
+        planted = len(range(0, num_cards - 1, 1000))
+        print(f"{num_cards:>9} cards {elapsed:>7.1f}s {num_cards / elapsed:>8.0f} cards/s "
+              f"{len(dropped):>6} found ({planted} planted)")
+
+
+if __name__ == "__main__":
+    main()
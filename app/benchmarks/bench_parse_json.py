@@ -0,0 +1,123 @@
+"""
+Benchmark the JSON card extractor against the previous _try_parse_json.
+
+Run from the app directory:
+    python benchmarks/bench_parse_json.py [--cards 50000] [--repeat 3]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from typing import Callable, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from card_parser import extract_cards_from_json_text  # noqa: E402
+
+
+def legacy_try_parse_json(text: str) -> Optional[List[Tuple[str, str]]]:
+    """The previous _try_parse_json: slice between the outermost brackets and json.loads it."""
+    json_start = text.find('[')
+    json_end = text.rfind(']') + 1
+
+    if json_start == -1 or json_end == 0:
+        json_start = text.find('{')
+        json_end = text.rfind('}') + 1
+
+    if json_start >= 0 and json_end > json_start:
+        try:
+            cards_data = json.loads(text[json_start:json_end])
+            if isinstance(cards_data, dict):
+                return [(cards_data.get("question", ""), cards_data.get("answer", ""))]
+            return [(card.get("question", ""), card.get("answer", "")) for card in cards_data]
+        except json.JSONDecodeError:
+            return None
+    return None
+
+
+def legacy_extract_cards_from_text(text: str) -> List[Tuple[str, str]]:
+    """The line-based fallback that ran over the whole text whenever legacy parsing failed."""
+    cards = []
+    q_pattern = re.compile(r'^(?:Q:|Question:|Q\.\s*|Card\s*\d+:|^\d+\)|^\d+\.)')
+    a_pattern = re.compile(r'^(?:A:|Answer:|A\.\s*)')
+    current_question = None
+    current_answer = []
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        q_match = q_pattern.search(line)
+        if q_match:
+            if current_question and current_answer:
+                cards.append((current_question, ' '.join(current_answer)))
+                current_answer = []
+            current_question = line[q_match.end():].strip()
+            continue
+        a_match = a_pattern.search(line)
+        if a_match and current_question:
+            current_answer.append(line[a_match.end():].strip())
+            continue
+        if current_question and current_answer:
+            current_answer.append(line)
+    if current_question and current_answer:
+        cards.append((current_question, ' '.join(current_answer)))
+    return cards
+
+
+def legacy_parse(text: str) -> List[Tuple[str, str]]:
+    cards = legacy_try_parse_json(text)
+    return cards if cards is not None else legacy_extract_cards_from_text(text)
+
+
+def new_parse(text: str) -> List[Tuple[str, str]]:
+    cards = extract_cards_from_json_text(text)
+    return cards if cards is not None else legacy_extract_cards_from_text(text)
+
+
+def build_corpora(num_cards: int) -> dict:
+    """Build clean, chatty and truncated responses with num_cards cards each."""
+    cards = [
+        {"question": f"Ko je bio vođa Topličkog ustanka? [{i}]",
+         "answer": f"Kosta Vojinović, 1917. godine ({i}) - ćirilica: Коста Војиновић"}
+        for i in range(num_cards)
+    ]
+    array = json.dumps(cards, ensure_ascii=False, indent=2)
+    chatter = "Sure! Here are your flashcards [as requested]:\n```json\n" + array + "\n```\nLet me know [if] you need more."
+    return {
+        "clean": array,
+        "chatter": chatter,
+        "truncated": array[:int(len(array) * 0.9)],
+    }
+
+
+def time_call(func: Callable[[str], List[Tuple[str, str]]], text: str, repeat: int) -> Tuple[float, int]:
+    best = float("inf")
+    cards = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cards = func(text)
+        best = min(best, time.perf_counter() - start)
+    return best, len(cards)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cards", type=int, default=50000, help="cards per corpus (default: 50000)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement, best is reported")
+    args = parser.parse_args()
+
+    print(f"{'corpus':<10} {'size':>9} {'legacy':>18} {'single-pass':>18} {'speedup':>8}")
+    for name, text in build_corpora(args.cards).items():
+        legacy_time, legacy_cards = time_call(legacy_parse, text, args.repeat)
+        new_time, new_cards = time_call(new_parse, text, args.repeat)
+        size_mb = len(text.encode('utf-8')) / 1e6
+        print(f"{name:<10} {size_mb:>7.1f}MB "
+              f"{legacy_time * 1000:>8.1f}ms {legacy_cards:>7} "
+              f"{new_time * 1000:>8.1f}ms {new_cards:>7} "
+              f"{legacy_time / new_time:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark the startup cost of commands that do not call the Gemini API.
+
+Runs each command in a fresh interpreter with -X importtime, sums the
+import time of the modules it loads beyond a bare interpreter and fails if
+the median exceeds the budget or if a module that should only load on
+demand (the Gemini client, tkinter, PyYAML) was imported.
+
+Run from the app directory:
+    python benchmarks/bench_startup.py [--runs 7] [--budget-ms 150]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules only the code paths that need them may import
+LAZY_MODULES = ("google.generativeai", "tkinter", "yaml", "gemini_generator")
+
+
+def _import_times(args: List[str]) -> Tuple[Dict[str, int], float]:
+    """
+    Run a command with -X importtime.
+
+    Args:
+        args: Interpreter arguments after -X importtime
+
+    Returns:
+        Tuple of (cumulative microseconds per top-level import, wall-clock seconds)
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [APP_DIR, os.environ.get("PYTHONPATH")])))
+    command = [sys.executable, "-X", "importtime"] + args
+    start = time.perf_counter()
+    process = subprocess.run(command, cwd=APP_DIR, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if process.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} exited with {process.returncode}:\n{process.stderr[-2000:]}")
+
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            # Top-level imports are indented by exactly one space
+            if name.startswith(" ") and not name.startswith("  "):
+                times[name.strip()] = int(cumulative)
+            else:
+                times.setdefault(name.strip(), 0)
+    return times, wall
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=7, help="runs per command (default: 7)")
+    parser.add_argument("--budget-ms", type=float, default=150.0,
+                        help="maximum median import time of a command (default: 150)")
+    args = parser.parse_args()
+
+    baseline = set(_import_times(["-c", "pass"])[0])
+    with tempfile.TemporaryDirectory() as temp_dir:
+        commands = {
+            "cli convert": ["cli.py", "convert", temp_dir, "--output", os.path.join(temp_dir, "out")],
+            "cli --help": ["cli.py", "--help"],
+            "main --help": ["main.py", "--help"],
+        }
+
+        failed = False
+        print(f"{'command':<14} {'imports':>10} {'wall':>10}  slowest imports")
+        for name, command in commands.items():
+            import_ms = []
+            walls = []
+            loaded = set()
+            for _ in range(args.runs):
+                times, wall = _import_times(command)
+                own = {module: us for module, us in times.items() if module not in baseline}
+                import_ms.append(sum(own.values()) / 1000)
+                walls.append(wall * 1000)
+                loaded.update(own)
+
+            median = statistics.median(import_ms)
+            slowest = sorted(own.items(), key=lambda item: item[1], reverse=True)[:3]
+            print(f"{name:<14} {median:>8.1f}ms {statistics.median(walls):>8.1f}ms  "
+                  + ", ".join(f"{module} {us / 1000:.1f}ms" for module, us in slowest))
+
+            eager = [module for module in LAZY_MODULES if module in loaded]
+            if eager:
+                print(f"  FAIL: imported {', '.join(eager)}")
+                failed = True
+            if name == "cli convert" and median > args.budget_ms:
+                print(f"  FAIL: over the {args.budget_ms:.0f}ms budget")
+                failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
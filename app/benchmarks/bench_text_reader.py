@@ -0,0 +1,80 @@
+"""
+Benchmark the tolerant text card reader against the previous readlines/split reader.
+
+Run from the app directory:
+    python benchmarks/bench_text_reader.py [--lines 1000000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from typing import List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anki_utils import iter_cards_from_text_file  # noqa: E402
+
+
+def legacy_create_anki_cards_from_text_file(file_path: str) -> List[Tuple[str, str]]:
+    """The previous reader, which raises on any line with more than one tab."""
+    with open(file_path, 'r', encoding='utf-8') as file:
+        lines = file.readlines()
+
+    cards = []
+    for line in lines:
+        if '\t' in line:
+            question, answer = line.strip().split('\t')
+            cards.append((question, answer))
+    return cards
+
+
+def write_corpus(path: str, num_lines: int, dirty: bool) -> None:
+    """Write num_lines cards; a dirty corpus adds headers, comments, extra columns and bad lines."""
+    with open(path, 'w', encoding='utf-8') as file:
+        if dirty:
+            file.write("#separator:tab\n#html:false\n#tags column:3\n")
+        for i in range(num_lines):
+            if dirty and i % 10 == 0:
+                file.write(f"Pitanje {i}\tOdgovor {i}\tistorija srbija\n")
+            elif dirty and i % 97 == 0:
+                file.write("# komentar\n")
+            elif dirty and i % 101 == 0:
+                file.write("red bez tabulatora\n")
+            else:
+                file.write(f"Ko je bio vođa Topličkog ustanka? {i}\tKosta Vojinović ({i})\n")
+
+
+def measure(label: str, func, path: str) -> None:
+    size_mb = os.path.getsize(path) / 1e6
+    start = time.perf_counter()
+    try:
+        count = func(path)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<28} {count:>9} cards {elapsed:>7.2f}s {size_mb / elapsed:>7.1f} MB/s "
+              f"{count / elapsed / 1e6:>6.2f} M cards/s")
+    except ValueError as e:
+        print(f"{label:<28} failed after {time.perf_counter() - start:.2f}s: {e}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=1000000, help="lines per corpus (default: 1000000)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        clean = os.path.join(folder, "clean.txt")
+        dirty = os.path.join(folder, "dirty.txt")
+        write_corpus(clean, args.lines, dirty=False)
+        write_corpus(dirty, args.lines, dirty=True)
+
+        measure("legacy, clean", lambda p: len(legacy_create_anki_cards_from_text_file(p)), clean)
+        measure("tolerant, clean", lambda p: sum(1 for _ in iter_cards_from_text_file(p)), clean)
+        measure("legacy, dirty", lambda p: len(legacy_create_anki_cards_from_text_file(p)), dirty)
+        errors = []
+        measure("tolerant, dirty", lambda p: sum(1 for _ in iter_cards_from_text_file(p, errors=errors)), dirty)
+        print(f"tolerant reader reported {len(errors)} malformed lines")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Compare the HTTP transports of the REST backend against the mock Gemini server.
+
+Sends the same generateContent requests through every installed transport:
+urllib (a new connection per request, as before pooling), the standard
+library keep-alive pool, and httpx (HTTP/2 when h2 is installed). The mock
+answers immediately by default, so the numbers show the per-request cost of
+connection handling, compression and JSON decoding rather than model
+latency. Requests are sent one at a time and from several threads at once,
+the way batch workers share a backend.
+
+Plain HTTP to a local server has no TLS handshake, so the gap to urllib is
+smaller here than against the real API over HTTPS.
+
+Run from the app directory:
+    python benchmarks/bench_transports.py [--requests 500] [--threads 8] [--latency 0]
+"""
+import argparse
+import math
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backends import MockBackend, RestBackend  # noqa: E402
+from http_pool import TRANSPORTS, httpx  # noqa: E402
+from mock_server import start_mock_server  # noqa: E402
+
+PROMPT = "Topic: Bench\nPlease generate 10 high-quality Anki flashcards."
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Return the nearest-rank percentile of values."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def run(backend: RestBackend, requests: int, threads: int) -> Dict[str, float]:
+    """
+    Send requests through a backend and time them.
+
+    Args:
+        backend: Backend under test
+        requests: Number of requests
+        threads: Requests in flight at once
+
+    Returns:
+        Requests per second and p50/p95 latency in milliseconds
+    """
+    def call(_):
+        start = time.perf_counter()
+        backend.generate_text(PROMPT, structured_output=True)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        latencies = list(executor.map(call, range(requests)))
+    elapsed = time.perf_counter() - start
+    return {
+        "per_sec": requests / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500, help="requests per measurement (default: 500)")
+    parser.add_argument("--threads", type=int, default=8, help="threads of the concurrent run (default: 8)")
+    parser.add_argument("--latency", type=float, default=0.0, help="mock latency in seconds (default: 0)")
+    args = parser.parse_args()
+
+    server, url = start_mock_server(MockBackend(args.latency, "fixed", seed=1))
+    transports = [kind for kind in TRANSPORTS if kind != "auto" and (kind != "httpx" or httpx is not None)]
+
+    print(f"Mock server at {url}, latency {args.latency * 1000:.0f}ms, {args.requests} requests")
+    print(f"{'transport':<10} {'threads':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for kind in transports:
+        backend = RestBackend("bench", base_url=url, transport=kind, pool_size=args.threads)
+        # Warm up so every pooled transport starts with its connections open
+        run(backend, args.threads, args.threads)
+        for threads in (1, args.threads):
+            result = run(backend, args.requests, threads)
+            print(f"{backend.transport.name:<10} {threads:>7} {result['per_sec']:>9.0f} "
+                  f"{result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f}")
+        backend.close()
+    server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+import json
+import re
+from typing import Any, List, Optional, Tuple
+
+
+# Characters that change the JSON nesting or string state
+_STRUCTURE_RE = re.compile(r'[{}\[\]"\\]')
+
+# Possible starts of a JSON array or object
+_VALUE_START_RE = re.compile(r'[\[{]')
+
+_decoder = json.JSONDecoder()
+
+# Response schema for models that support structured (JSON) output
+CARD_LIST_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "question": {"type": "string"},
+            "answer": {"type": "string"},
+        },
+        "required": ["question", "answer"],
+    },
+}
+
+
+def card_from_object(obj: Any) -> Optional[Tuple[str, str]]:
+    """
+    Convert a decoded JSON object into a card.
+
+    Args:
+        obj: Decoded JSON value
+
+    Returns:
+        (question, answer) tuple, or None if obj is not a card object
+    """
+    if not isinstance(obj, dict) or "question" not in obj:
+        return None
+    return str(obj.get("question", "")), str(obj.get("answer", ""))
+
+
+def _collect_cards(value: Any, cards: List[Tuple[str, str]]) -> None:
+    """Append every card object nested anywhere inside a decoded JSON value."""
+    if isinstance(value, dict):
+        if "question" in value:
+            cards.append((str(value["question"]), str(value.get("answer", ""))))
+            return
+        value = value.values()
+    elif not isinstance(value, list):
+        return
+
+    for item in value:
+        # Inlined card check, arrays of cards are by far the common case
+        if type(item) is dict and "question" in item:
+            cards.append((str(item["question"]), str(item.get("answer", ""))))
+        elif isinstance(item, (dict, list)):
+            _collect_cards(item, cards)
+
+
+def extract_cards_from_json_text(text: str) -> Optional[List[Tuple[str, str]]]:
+    """
+    Extract card objects from text containing JSON, in a single forward scan.
+
+    Every '[' and '{' is tried as the start of a JSON value with
+    JSONDecoder.raw_decode. A successfully decoded value is searched for card
+    objects and skipped as a whole, so a well-formed array costs a single
+    decode; when decoding fails the scan resumes at the next candidate, so
+    the valid cards of a truncated or otherwise broken array are still
+    recovered object by object. Surrounding prose and code fences are
+    ignored.
+
+    Args:
+        text: Text from the AI response
+
+    Returns:
+        List of (question, answer) tuples, or None if no card object was found
+    """
+    cards: List[Tuple[str, str]] = []
+    match = _VALUE_START_RE.search(text)
+    while match:
+        pos = match.start()
+        try:
+            value, end = _decoder.raw_decode(text, pos)
+        except json.JSONDecodeError:
+            match = _VALUE_START_RE.search(text, pos + 1)
+            continue
+
+        _collect_cards(value, cards)
+        match = _VALUE_START_RE.search(text, end)
+
+    return cards or None
+
+
+def parse_structured_cards(text: str) -> List[Tuple[str, str]]:
+    """
+    Decode and validate a response requested with CARD_LIST_SCHEMA.
+
+    The response must be a JSON array. Items that are not objects with string
+    question and answer fields are dropped and reported.
+
+    Args:
+        text: JSON text from the AI response
+
+    Returns:
+        List of (question, answer) tuples
+
+    Raises:
+        ValueError: If the text is not a JSON array
+    """
+    data = json.loads(text)
+    if not isinstance(data, list):
+        raise ValueError(f"expected a JSON array, got {type(data).__name__}")
+
+    cards = []
+    for item in data:
+        if (isinstance(item, dict)
+                and isinstance(item.get("question"), str)
+                and isinstance(item.get("answer"), str)):
+            cards.append((item["question"], item["answer"]))
+
+    if len(cards) < len(data):
+        print(f"Dropped {len(data) - len(cards)} items that did not match the card schema")
+
+    return cards
+
+
+class IncrementalCardParser:
+    """
+    Incremental parser that extracts cards from a streamed JSON response.
+
+    Text is fed in arbitrary chunks. The parser tracks the open objects and
+    arrays and the string state across chunks, so braces and brackets inside
+    strings are ignored, and decodes each object as soon as its closing brace
+    arrives, so cards become available long before the response is complete.
+    Text around the JSON (prose, code fences) is ignored, and only the part
+    of the buffer belonging to a still-open object is retained.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._scan_pos = 0
+        self._skip_to = 0
+        self._in_string = False
+        # (opening character, buffer position) of every open object and array
+        self._open: List[Tuple[str, int]] = []
+        self.cards_parsed = 0
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """
+        Add a chunk of response text.
+
+        Args:
+            chunk: Next piece of the model response
+
+        Returns:
+            Cards whose objects were completed by this chunk, in order
+        """
+        self._buffer += chunk
+        cards = []
+
+        for match in _STRUCTURE_RE.finditer(self._buffer, self._scan_pos):
+            pos = match.start()
+            if pos < self._skip_to:
+                # Character escaped by a preceding backslash
+                continue
+            char = match.group()
+
+            if self._in_string:
+                if char == '\\':
+                    self._skip_to = pos + 2
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                # Quotes in the prose around the JSON do not start strings
+                self._in_string = bool(self._open)
+            elif char in '{[':
+                self._open.append((char, pos))
+            elif char == '}':
+                start = self._close('{')
+                if start is not None:
+                    card = self._decode(self._buffer[start:pos + 1])
+                    if card is not None:
+                        cards.append(card)
+            else:
+                self._close('[')
+
+        self._scan_pos = len(self._buffer)
+        self._compact()
+        self.cards_parsed += len(cards)
+        return cards
+
+    def _close(self, opener: str) -> Optional[int]:
+        """
+        Close the innermost open object or array.
+
+        A closing character that does not match the innermost container
+        closes the nearest matching one, dropping the broken containers
+        inside it; one without any matching container is ignored.
+
+        Returns:
+            Buffer position of the closed container, or None if none matched
+        """
+        for index in range(len(self._open) - 1, -1, -1):
+            if self._open[index][0] == opener:
+                start = self._open[index][1]
+                del self._open[index:]
+                return start
+        return None
+
+    @staticmethod
+    def _decode(text: str) -> Optional[Tuple[str, str]]:
+        """Decode one complete object, returning None if it is not a valid card."""
+        try:
+            return card_from_object(json.loads(text))
+        except json.JSONDecodeError:
+            return None
+
+    def _compact(self) -> None:
+        """Drop the part of the buffer that no open object can refer to."""
+        offset = next((pos for char, pos in self._open if char == '{'), self._scan_pos)
+        if offset <= 0:
+            return
+
+        self._buffer = self._buffer[offset:]
+        # Open arrays are only tracked for nesting, their text is not needed
+        self._open = [(char, pos - offset) for char, pos in self._open]
+        self._scan_pos -= offset
+        self._skip_to = max(0, self._skip_to - offset)
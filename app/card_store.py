@@ -0,0 +1,333 @@
+import argparse
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from anki_utils import AnkiNote, normalize_question, save_cards_to_csv
+from apkg_exporter import export_cards_to_apkg
+
+
+DEFAULT_STORE_PATH = os.environ.get(
+    "ANKI_CARD_STORE",
+    os.path.join(os.path.expanduser("~"), ".local", "share", "anki_card_generator", "cards.sqlite3")
+)
+
+# Maximum number of host parameters in one "IN (...)" lookup
+_LOOKUP_BATCH = 500
+# Rows fetched at a time while iterating over stored cards
+_ITER_BATCH = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS decks (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS topics (
+    id INTEGER PRIMARY KEY,
+    deck_id INTEGER NOT NULL REFERENCES decks (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    UNIQUE (deck_id, name)
+);
+CREATE TABLE IF NOT EXISTS cards (
+    id INTEGER PRIMARY KEY,
+    topic_id INTEGER NOT NULL REFERENCES topics (id) ON DELETE CASCADE,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    question_hash INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    UNIQUE (topic_id, question_hash)
+);
+CREATE INDEX IF NOT EXISTS cards_question_hash ON cards (question_hash);
+"""
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def question_hash(question: str) -> int:
+    """
+    Hash the normalized form of a question.
+
+    Questions that differ only in case, punctuation or whitespace get the
+    same hash, matching anki_utils.dedupe_cards.
+
+    Args:
+        question: Question text
+
+    Returns:
+        Signed 64-bit integer, as stored in the cards.question_hash column
+    """
+    digest = hashlib.sha1(normalize_question(question).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big', signed=True)
+
+
+class CardStore:
+    """
+    Local SQLite store of every generated card, organised by deck and topic.
+
+    Cards are keyed by a hash of their normalized question, so checking
+    whether a question already exists is a single index lookup instead of
+    re-reading every CSV file. The database runs in WAL mode, so readers are
+    not blocked while a batch writes into it. The store is safe to share
+    between threads.
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH):
+        """
+        Open (and create if needed) a card store.
+
+        Args:
+            path: Path of the SQLite database file
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        # WAL stays consistent with NORMAL, only the last commits can be lost on power failure
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    def _topic_id(self, deck: str, topic: str, now: float) -> int:
+        """Return the id of a topic, creating it and its deck if needed."""
+        self._conn.execute(
+            "INSERT OR IGNORE INTO decks (name, created_at) VALUES (?, ?)", (deck, now)
+        )
+        deck_id = self._conn.execute("SELECT id FROM decks WHERE name = ?", (deck,)).fetchone()[0]
+        self._conn.execute(
+            "INSERT OR IGNORE INTO topics (deck_id, name, created_at, updated_at) VALUES (?, ?, ?, ?)",
+            (deck_id, topic, now, now)
+        )
+        self._conn.execute(
+            "UPDATE topics SET updated_at = ? WHERE deck_id = ? AND name = ?", (now, deck_id, topic)
+        )
+        return self._conn.execute(
+            "SELECT id FROM topics WHERE deck_id = ? AND name = ?", (deck_id, topic)
+        ).fetchone()[0]
+
+    def upsert_cards(self, deck: str, topic: str, cards: Iterable[Tuple[str, str]]) -> Tuple[int, int]:
+        """
+        Insert cards into a topic, updating the answer of questions it already has.
+
+        All cards are written in one transaction. Questions are matched on
+        their normalized form; of repeated questions in cards the first wins.
+
+        Args:
+            deck: Deck name, for example the folder the topic lives in
+            topic: Topic name
+            cards: Iterable of (question, answer) tuples
+
+        Returns:
+            Tuple of (cards inserted, existing cards whose answer changed)
+        """
+        rows = {}
+        for question, answer in cards:
+            key = question_hash(question)
+            if key not in rows:
+                rows[key] = (question, answer, key)
+
+        now = time.time()
+        with self._lock, self._conn:
+            topic_id = self._topic_id(deck, topic, now)
+            count_before = self._count(topic_id)
+            changes_before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT INTO cards (topic_id, question, answer, question_hash, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (topic_id, question_hash) DO UPDATE SET "
+                "question = excluded.question, answer = excluded.answer, updated_at = excluded.updated_at "
+                "WHERE cards.answer != excluded.answer",
+                [(topic_id, question, answer, key, now, now) for question, answer, key in rows.values()]
+            )
+            inserted = self._count(topic_id) - count_before
+            updated = self._conn.total_changes - changes_before - inserted
+
+        return inserted, updated
+
+    def _count(self, topic_id: int) -> int:
+        """Return the number of cards stored for a topic."""
+        return self._conn.execute("SELECT COUNT(*) FROM cards WHERE topic_id = ?", (topic_id,)).fetchone()[0]
+
+    def find_existing(self, questions: Sequence[str], deck: Optional[str] = None) -> List[str]:
+        """
+        Return the questions that are already in the store.
+
+        Args:
+            questions: Questions to look up
+            deck: Only consider cards of this deck (default: all decks)
+
+        Returns:
+            The given questions whose normalized form is stored, in input order
+        """
+        hashes = {question: question_hash(question) for question in questions}
+        unique_hashes = list(set(hashes.values()))
+        found = set()
+
+        with self._lock:
+            for start in range(0, len(unique_hashes), _LOOKUP_BATCH):
+                batch = unique_hashes[start:start + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                query = f"SELECT DISTINCT question_hash FROM cards WHERE question_hash IN ({placeholders})"
+                params: list = list(batch)
+                if deck is not None:
+                    query = (f"SELECT DISTINCT c.question_hash FROM cards c "
+                             f"JOIN topics t ON t.id = c.topic_id JOIN decks d ON d.id = t.deck_id "
+                             f"WHERE c.question_hash IN ({placeholders}) AND d.name = ?")
+                    params.append(deck)
+                found.update(row[0] for row in self._conn.execute(query, params))
+
+        return [question for question in questions if hashes[question] in found]
+
+    def iter_notes(self, deck: Optional[str] = None, topic: Optional[str] = None) -> Iterator[AnkiNote]:
+        """
+        Iterate over stored cards in insertion order.
+
+        Each topic becomes a subdeck ("deck::topic") of its deck. Rows are
+        fetched in batches of _ITER_BATCH, so memory use does not grow with
+        the number of cards.
+
+        Args:
+            deck: Only return cards of this deck (default: all decks)
+            topic: Only return cards of this topic (default: all topics)
+
+        Yields:
+            AnkiNote for every matching card
+        """
+        query = ("SELECT c.question, c.answer, d.name, t.name FROM cards c "
+                 "JOIN topics t ON t.id = c.topic_id JOIN decks d ON d.id = t.deck_id WHERE 1 = 1")
+        params = []
+        if deck is not None:
+            query += " AND d.name = ?"
+            params.append(deck)
+        if topic is not None:
+            query += " AND t.name = ?"
+            params.append(topic)
+        query += " ORDER BY c.id"
+
+        with self._lock:
+            cursor = self._conn.execute(query, params)
+        try:
+            while True:
+                with self._lock:
+                    rows = cursor.fetchmany(_ITER_BATCH)
+                if not rows:
+                    break
+                for question, answer, deck_name, topic_name in rows:
+                    yield AnkiNote(question, answer, deck=f"{deck_name}::{topic_name}")
+        finally:
+            cursor.close()
+
+    def export_csv(
+        self,
+        file_path: str,
+        deck: Optional[str] = None,
+        topic: Optional[str] = None,
+        delimiter: str = ';'
+    ) -> int:
+        """
+        Export stored cards to a CSV file.
+
+        Args:
+            file_path: Path to save the CSV file
+            deck: Only export cards of this deck (default: all decks)
+            topic: Only export cards of this topic (default: all topics)
+            delimiter: CSV delimiter character (default: ';')
+
+        Returns:
+            Number of cards written
+        """
+        cards = ((note.question, note.answer) for note in self.iter_notes(deck, topic))
+        return save_cards_to_csv(cards, file_path, delimiter)
+
+    def export_apkg(self, file_path: str, deck: Optional[str] = None, topic: Optional[str] = None) -> int:
+        """
+        Export stored cards to an Anki package, one subdeck per topic.
+
+        Args:
+            file_path: Path of the .apkg file to create
+            deck: Only export cards of this deck (default: all decks)
+            topic: Only export cards of this topic (default: all topics)
+
+        Returns:
+            Number of notes written
+        """
+        return export_cards_to_apkg(self.iter_notes(deck, topic), file_path, deck or "Default")
+
+    def summary(self) -> List[Tuple[str, str, int]]:
+        """
+        Count the stored cards per topic.
+
+        Returns:
+            List of (deck, topic, number of cards) sorted by deck and topic
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT d.name, t.name, COUNT(c.id) FROM topics t "
+                "JOIN decks d ON d.id = t.deck_id LEFT JOIN cards c ON c.topic_id = t.id "
+                "GROUP BY t.id ORDER BY d.name, t.name"
+            ).fetchall()
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+def get_default_store() -> CardStore:
+    """
+    Return the process-wide card store, opening it on first use.
+
+    Returns:
+        The shared CardStore at DEFAULT_STORE_PATH
+    """
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = CardStore()
+        return _default_store
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point, returns the process exit code."""
+    parser = argparse.ArgumentParser(description="Inspect and export the local card store.")
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH, help="path of the card store")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="count the cards of every topic")
+    export = subparsers.add_parser("export", help="export cards to CSV or .apkg")
+    export.add_argument("output", help="output file, .apkg exports an Anki package")
+    export.add_argument("--deck", help="only export this deck")
+    export.add_argument("--topic", help="only export this topic")
+    export.add_argument("--delimiter", default=';', help="CSV delimiter (default: ';')")
+    args = parser.parse_args(argv)
+
+    try:
+        store = CardStore(args.store)
+        if args.command == "list":
+            for deck, topic, count in store.summary():
+                print(f"{deck} / {topic}: {count} cards")
+        elif args.output.lower().endswith(".apkg"):
+            store.export_apkg(args.output, args.deck, args.topic)
+        else:
+            store.export_csv(args.output, args.deck, args.topic, args.delimiter)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Card store error: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
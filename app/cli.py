@@ -0,0 +1,421 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from typing import Any, Dict, List, Optional
+
+from anki_utils import iter_cards_from_csv_file, save_cards_to_csv
+from apkg_exporter import export_cards_to_apkg
+from batch_generator import DEFAULT_MAX_WORKERS, generate_batch, resume_batch
+from batch_journal import default_journal_path
+from card_store import CardStore, DEFAULT_STORE_PATH
+from deck_converter import convert_directory
+from instrumentation import METRICS_FILE_ENV, TRACE_FILE_ENV, configure_export, format_summary
+from token_budget import get_default_budget
+
+# Process exit codes
+EXIT_OK = 0
+# Some topics or files failed, the rest succeeded
+EXIT_PARTIAL = 1
+# Bad arguments, job file or configuration; nothing was attempted
+EXIT_USAGE = 2
+# The work was attempted and nothing succeeded
+EXIT_FAILED = 3
+EXIT_INTERRUPTED = 130
+
+# Environment variables the API key is read from, in order
+API_KEY_ENV_VARS = ("GEMINI_API_KEY", "GOOGLE_API_KEY")
+
+# Keys accepted in a job file, at the top level and in every entry of "batches"
+_JOB_KEYS = {
+    "topics", "base_dir", "cards", "workers", "delimiter",
+    "incremental", "structured_output", "refresh_cache", "store",
+}
+_JOB_DEFAULTS = {
+    "base_dir": ".",
+    "cards": 50,
+    "workers": DEFAULT_MAX_WORKERS,
+    "delimiter": ';',
+    "incremental": False,
+    "structured_output": False,
+    "refresh_cache": False,
+    "store": True,
+}
+
+
+class UsageError(Exception):
+    """Raised for invalid arguments or job files, exits with EXIT_USAGE."""
+
+
+def _positive_int(value: str) -> int:
+    """Argparse type for card and worker counts; argparse exits with EXIT_USAGE on errors."""
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got '{value}'")
+    return number
+
+
+def _api_key() -> str:
+    """Return the Gemini API key from the environment."""
+    for name in API_KEY_ENV_VARS:
+        if os.environ.get(name):
+            return os.environ[name]
+    raise UsageError(f"Set {' or '.join(API_KEY_ENV_VARS)} to your Gemini API key")
+
+
+def _check_gemini_client() -> None:
+    """Fail with a usage error before any work when the Gemini client library is needed but missing."""
+    # Imported here so commands that never call the API do not load the backends
+    from backends import BACKEND_ENV, require_genai
+
+    if os.environ.get(BACKEND_ENV, "sdk") not in ("", "sdk"):
+        return
+    try:
+        require_genai()
+    except ImportError as e:
+        raise UsageError(str(e)) from e
+
+
+def _topic_file_name(topic: str) -> str:
+    """Build the default card file name for a topic, as the menu does."""
+    safe_topic = "".join(c if c.isalnum() or c in " -_" else "_" for c in topic)
+    return f"{safe_topic.replace(' ', '_').lower()}_cards.csv"
+
+
+def _open_store(enabled: bool, path: str = DEFAULT_STORE_PATH) -> Optional[CardStore]:
+    """Open the card store if enabled, warning instead of failing when it is unavailable."""
+    if not enabled:
+        return None
+    try:
+        return CardStore(path)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Card store not available ({e}), cards are only saved as CSV", file=sys.stderr)
+        return None
+
+
+def _is_positive_int(value: Any) -> bool:
+    """Check a job file count; true and false decode as bool, a subclass of int, and are rejected."""
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 1
+
+
+def load_job_file(file_path: str) -> List[Dict[str, Any]]:
+    """
+    Read a JSON or YAML job file into a list of batch definitions.
+
+    A job file holds the settings of one batch at the top level, or a
+    "batches" list whose entries override the top-level settings. Every
+    batch needs "topics"; the other keys default to the batch command's
+    defaults.
+
+    Args:
+        file_path: Path of the .json, .yaml or .yml job file
+
+    Returns:
+        List of batch settings with every key filled in
+
+    Raises:
+        UsageError: If the file cannot be read or is not a valid job file
+    """
+    yaml = None
+    if file_path.lower().endswith(('.yaml', '.yml')):
+        # Imported here, PyYAML is optional and slow to import
+        try:
+            import yaml
+        except ImportError:
+            raise UsageError("YAML job files need PyYAML: pip install pyyaml")
+
+    try:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            job = yaml.safe_load(file) if yaml else json.load(file)
+    except (OSError, ValueError) as e:
+        raise UsageError(f"Cannot read job file {file_path}: {e}") from e
+    except Exception as e:
+        # PyYAML errors do not derive from ValueError
+        if yaml and isinstance(e, yaml.YAMLError):
+            raise UsageError(f"Cannot read job file {file_path}: {e}") from e
+        raise
+
+    if not isinstance(job, dict):
+        raise UsageError(f"Job file {file_path} must contain a mapping")
+
+    defaults = {key: value for key, value in job.items() if key != "batches"}
+    entries = job.get("batches") or [{}]
+    batches = []
+    for number, entry in enumerate(entries, 1):
+        if not isinstance(entry, dict):
+            raise UsageError(f"Batch {number} in {file_path} must be a mapping")
+        batch = {**_JOB_DEFAULTS, **defaults, **entry}
+        unknown = set(batch) - _JOB_KEYS
+        if unknown:
+            raise UsageError(f"Unknown keys in {file_path}: {', '.join(sorted(unknown))}")
+        topics = batch.get("topics")
+        if not topics or not isinstance(topics, list) or not all(isinstance(t, str) and t.strip() for t in topics):
+            raise UsageError(f"Batch {number} in {file_path} needs a non-empty list of topic names")
+        for key in ("cards", "workers"):
+            if not _is_positive_int(batch[key]):
+                raise UsageError(f"Batch {number} in {file_path}: {key} must be a positive integer")
+        batches.append(batch)
+
+    base_dirs = [os.path.abspath(batch["base_dir"]) for batch in batches]
+    if len(set(base_dirs)) < len(base_dirs):
+        # Each base directory holds the journal of exactly one batch
+        raise UsageError(f"Batches in {file_path} must use different base_dir values")
+    return batches
+
+
+def _batch_exit_code(results) -> int:
+    """Map the results of a batch to an exit code."""
+    failed = sum(1 for result in results if result.error)
+    if failed == 0:
+        return EXIT_OK
+    return EXIT_FAILED if failed == len(results) else EXIT_PARTIAL
+
+
+def cmd_generate(args: argparse.Namespace) -> int:
+    """Generate the cards of one topic into a CSV or .apkg file."""
+    format_instructions = None
+    if args.format_file:
+        try:
+            with open(args.format_file, 'r', encoding='utf-8') as file:
+                format_instructions = file.read()
+        except OSError as e:
+            raise UsageError(f"Cannot read {args.format_file}: {e}") from e
+
+    from gemini_generator import GeminiGenerationError, generate_anki_cards_with_gemini
+
+    api_key = _api_key()
+    _check_gemini_client()
+    try:
+        cards = generate_anki_cards_with_gemini(
+            api_key, args.topic, args.cards, format_instructions,
+            use_cache=not args.no_cache, refresh_cache=args.refresh_cache,
+            structured_output=args.structured_output
+        )
+    except GeminiGenerationError as e:
+        print(f"Error generating cards: {e}", file=sys.stderr)
+        return EXIT_FAILED
+
+    if not cards:
+        print(f"No cards were generated for '{args.topic}'", file=sys.stderr)
+        return EXIT_FAILED
+
+    output = args.output or _topic_file_name(args.topic)
+    if output.lower().endswith(".apkg"):
+        export_cards_to_apkg(cards, output, args.deck or args.topic)
+    else:
+        save_cards_to_csv(cards, output, args.delimiter)
+
+    store = _open_store(args.store, args.store_path)
+    if store:
+        deck = args.deck or os.path.basename(os.path.dirname(os.path.abspath(output)))
+        store.upsert_cards(deck, args.topic, cards)
+    return EXIT_OK if len(cards) >= args.cards else EXIT_PARTIAL
+
+
+def cmd_batch(args: argparse.Namespace) -> int:
+    """Generate the cards of many topics, from arguments, a job file or a journal."""
+    if args.resume:
+        journal_path = default_journal_path(args.base_dir)
+        if not os.path.exists(journal_path):
+            raise UsageError(f"No batch journal found in {args.base_dir}")
+        api_key = _api_key()
+        _check_gemini_client()
+        results = resume_batch(
+            api_key, journal_path, args.workers, args.refresh_cache, _open_store(args.store, args.store_path)
+        )
+        return _batch_exit_code(results)
+
+    if args.job:
+        if args.topics:
+            raise UsageError("Give topics either on the command line or in the job file, not both")
+        batches = load_job_file(args.job)
+    elif args.topics:
+        batches = [{
+            "topics": args.topics,
+            "base_dir": args.base_dir,
+            "cards": args.cards,
+            "workers": args.workers,
+            "delimiter": args.delimiter,
+            "incremental": args.incremental,
+            "structured_output": args.structured_output,
+            "refresh_cache": args.refresh_cache,
+            "store": args.store,
+        }]
+    else:
+        raise UsageError("Give at least one topic, --job or --resume")
+
+    api_key = _api_key()
+    _check_gemini_client()
+    results = []
+    for batch in batches:
+        results.extend(generate_batch(
+            api_key, batch["topics"], batch["base_dir"], batch["cards"], batch["workers"],
+            batch["delimiter"], batch["refresh_cache"], batch["structured_output"],
+            _open_store(batch["store"], args.store_path), batch["incremental"]
+        ))
+    return _batch_exit_code(results)
+
+
+def cmd_convert(args: argparse.Namespace) -> int:
+    """Convert every card file below a directory."""
+    if not os.path.isdir(args.root):
+        raise UsageError(f"Not a directory: {args.root}")
+    try:
+        results = convert_directory(
+            args.root, args.output, args.in_delimiter, args.out_delimiter,
+            args.suffix, args.workers, args.force
+        )
+    except ValueError as e:
+        raise UsageError(str(e)) from e
+
+    failed = sum(1 for result in results if result.error)
+    if failed == 0:
+        return EXIT_OK
+    return EXIT_FAILED if failed == len(results) else EXIT_PARTIAL
+
+
+def cmd_export(args: argparse.Namespace) -> int:
+    """Export a CSV file or the card store to CSV or .apkg."""
+    to_apkg = args.output.lower().endswith(".apkg")
+    try:
+        if args.source:
+            cards = iter_cards_from_csv_file(args.source, args.delimiter)
+            deck = args.deck or os.path.splitext(os.path.basename(args.source))[0]
+            if to_apkg:
+                count = export_cards_to_apkg(cards, args.output, deck, args.tag)
+            else:
+                count = save_cards_to_csv(cards, args.output, args.out_delimiter)
+        else:
+            store = CardStore(args.store_path)
+            if to_apkg:
+                count = store.export_apkg(args.output, args.deck, args.topic)
+            else:
+                count = store.export_csv(args.output, args.deck, args.topic, args.out_delimiter)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Error exporting cards: {e}", file=sys.stderr)
+        return EXIT_FAILED
+
+    return EXIT_OK if count else EXIT_FAILED
+
+
+def cmd_budget(args: argparse.Namespace) -> int:
+    """Print the learned token usage per profile and how well it predicted the actual usage."""
+    rows = get_default_budget().report()
+    if not rows:
+        print("No token usage recorded yet")
+        return EXIT_OK
+    print(f"{'profile':<40} {'requests':>8} {'tokens/card':>11} {'upper':>7} {'cards/req':>9} "
+          f"{'error':>7} {'truncated':>9}")
+    for row in rows:
+        print(f"{row['profile']:<40} {row['requests']:>8} {row['tokens_per_card']:>11.1f} "
+              f"{row['tokens_per_card_upper']:>7.1f} {row['cards_per_request']:>9} "
+              f"{row['prediction_error']:>7.1%} {row['truncated']:>9}")
+    return EXIT_OK
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser with one subcommand per operation."""
+    parser = argparse.ArgumentParser(
+        prog="anki-cards",
+        description="Generate, convert and export Anki cards without the interactive menu.",
+        epilog=f"Exit codes: {EXIT_OK} success, {EXIT_PARTIAL} partial failure, {EXIT_USAGE} usage error, "
+               f"{EXIT_FAILED} failure, {EXIT_INTERRUPTED} interrupted. "
+               f"The API key is read from {' or '.join(API_KEY_ENV_VARS)}."
+    )
+    parser.add_argument("--store-path", default=DEFAULT_STORE_PATH, help="path of the card store")
+    parser.add_argument("--metrics-file", help=f"write counters and stage timings in the Prometheus text format "
+                                               f"at exit (default: ${METRICS_FILE_ENV})")
+    parser.add_argument("--trace-file", help=f"record a trace of every stage, .json for chrome://tracing or "
+                                             f"Perfetto, .jsonl for one event per line (default: ${TRACE_FILE_ENV})")
+    parser.add_argument("--profile", action="store_true", help="print where the time went when done")
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND")
+    subparsers.required = True
+
+    generate = subparsers.add_parser("generate", help="generate the cards of one topic")
+    generate.add_argument("topic", help="topic to generate cards for")
+    generate.add_argument("-n", "--cards", type=_positive_int, default=10, help="number of cards (default: 10)")
+    generate.add_argument("-o", "--output", help="CSV or .apkg output file (default: <topic>_cards.csv)")
+    generate.add_argument("--deck", help="deck name for .apkg output and the card store")
+    generate.add_argument("--delimiter", default=';', help="CSV delimiter (default: ';')")
+    generate.add_argument("--format-file", help="file with custom formatting instructions")
+    generate.add_argument("--structured-output", action="store_true", help="request schema-constrained JSON")
+    generate.add_argument("--no-cache", action="store_true", help="do not read or write the response cache")
+    generate.add_argument("--refresh-cache", action="store_true", help="ignore cached responses")
+    generate.add_argument("--no-store", dest="store", action="store_false", help="do not write the card store")
+    generate.set_defaults(func=cmd_generate)
+
+    batch = subparsers.add_parser("batch", help="generate the cards of many topics, one folder each")
+    batch.add_argument("topics", nargs="*", help="topic names, also used as folder names")
+    batch.add_argument("--job", help="JSON or YAML job file describing one or more batches")
+    batch.add_argument("--resume", action="store_true", help="continue the interrupted batch in --base-dir")
+    batch.add_argument("--base-dir", default=".", help="directory for the topic folders (default: current)")
+    batch.add_argument("-n", "--cards", type=_positive_int, default=50, help="cards per topic (default: 50)")
+    batch.add_argument("-j", "--workers", type=_positive_int, default=DEFAULT_MAX_WORKERS,
+                       help=f"concurrent requests (default: {DEFAULT_MAX_WORKERS})")
+    batch.add_argument("--delimiter", default=';', help="CSV delimiter (default: ';')")
+    batch.add_argument("--incremental", action="store_true", help="only generate cards missing from existing files")
+    batch.add_argument("--structured-output", action="store_true", help="request schema-constrained JSON")
+    batch.add_argument("--refresh-cache", action="store_true", help="ignore cached responses")
+    batch.add_argument("--no-store", dest="store", action="store_false", help="do not write the card store")
+    batch.set_defaults(func=cmd_batch)
+
+    convert = subparsers.add_parser("convert", help="convert every card file below a directory")
+    convert.add_argument("root", help="directory containing the card files")
+    convert.add_argument("-o", "--output", help="output directory (default: next to the sources)")
+    convert.add_argument(
+        "--in-delimiter", help="delimiter of the source files (default: detected, tab for .txt and .tsv)"
+    )
+    convert.add_argument("--out-delimiter", default=';', help="delimiter of the converted files (default: ';')")
+    convert.add_argument("--suffix", default='', help="text added before the extension of converted files")
+    convert.add_argument("-j", "--workers", type=_positive_int, help="worker processes (default: CPU count)")
+    convert.add_argument("--force", action="store_true", help="convert files even if up to date")
+    convert.set_defaults(func=cmd_convert)
+
+    export = subparsers.add_parser("export", help="export a CSV file or the card store to CSV or .apkg")
+    export.add_argument("output", help="output file, .apkg exports an Anki package")
+    export.add_argument("--source", help="CSV file to export (default: the card store)")
+    export.add_argument("--deck", help="deck name, or the deck to export from the card store")
+    export.add_argument("--topic", help="only export this topic from the card store")
+    export.add_argument("--delimiter", default=';', help="delimiter of the source CSV (default: ';')")
+    export.add_argument("--out-delimiter", default=';', help="delimiter of CSV output (default: ';')")
+    export.add_argument("--tag", action="append", default=[], help="tag added to every card of a CSV source")
+    export.set_defaults(func=cmd_export)
+
+    budget = subparsers.add_parser("budget", help="show the learned output tokens per card and request sizes")
+    budget.set_defaults(func=cmd_budget)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Run one command without any prompts or dialogs.
+
+    Args:
+        argv: Command line arguments without the program name (default: sys.argv[1:])
+
+    Returns:
+        Process exit code
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    configure_export(args.metrics_file, args.trace_file)
+    try:
+        return args.func(args)
+    except UsageError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    except KeyboardInterrupt:
+        print("Interrupted", file=sys.stderr)
+        return EXIT_INTERRUPTED
+    finally:
+        if args.profile:
+            print(format_summary())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
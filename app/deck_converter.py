@@ -0,0 +1,309 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from anki_utils import ParseIssue, iter_cards_from_csv_file, save_cards_to_csv
+from mmap_reader import iter_text_file_cards
+
+
+# Records the source hash and settings of every converted file
+MANIFEST_NAME = ".convert_manifest.json"
+CARD_FILE_EXTENSIONS = ('.csv', '.txt', '.tsv')
+# Extensions of Anki text exports, tab-separated unless their header says otherwise
+TEXT_FILE_EXTENSIONS = ('.txt', '.tsv')
+# Delimiters considered when detecting the delimiter of a CSV file
+SNIFFED_DELIMITERS = ',;\t|'
+SNIFF_SAMPLE_SIZE = 64 * 1024
+
+
+@dataclass
+class ConversionResult:
+    """Outcome of converting a single card file."""
+    source: str
+    output: str
+    cards: int = 0
+    bytes_read: int = 0
+    skipped: bool = False
+    skipped_lines: int = 0
+    source_hash: Optional[str] = None
+    error: Optional[str] = None
+
+
+def _file_hash(file_path: str) -> str:
+    """Return the SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def find_card_files(
+    root: str,
+    extensions: Tuple[str, ...] = CARD_FILE_EXTENSIONS,
+    exclude: Optional[str] = None
+) -> List[str]:
+    """
+    Find all card files below a directory.
+
+    Args:
+        root: Directory to walk
+        extensions: File extensions treated as card files
+        exclude: Directory below root that is not searched, such as the output directory
+
+    Returns:
+        Sorted list of file paths
+    """
+    excluded = os.path.abspath(exclude) if exclude else None
+    card_files = []
+    for folder, subfolders, files in os.walk(root):
+        # Skip hidden folders such as .git, and the excluded directory
+        subfolders[:] = [
+            name for name in subfolders
+            if not name.startswith('.') and os.path.abspath(os.path.join(folder, name)) != excluded
+        ]
+        for name in files:
+            if name.lower().endswith(extensions) and not name.startswith('.'):
+                card_files.append(os.path.join(folder, name))
+    return sorted(card_files)
+
+
+def _sniff_delimiter(file_path: str) -> str:
+    """Detect the delimiter of a CSV file from its first lines, ',' if it cannot be told."""
+    with open(file_path, 'r', encoding='utf-8', newline='') as file:
+        sample = file.read(SNIFF_SAMPLE_SIZE)
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=SNIFFED_DELIMITERS).delimiter
+    except csv.Error:
+        return ','
+
+
+def _iter_source_cards(
+    source: str,
+    in_delimiter: Optional[str],
+    issues: List[ParseIssue]
+) -> Iterator[Tuple[str, str]]:
+    """
+    Read the cards of a source file with the reader its extension calls for.
+
+    Args:
+        source: Path of the card file
+        in_delimiter: Delimiter of the source file, None to detect it
+        issues: List collecting the lines of text files that were skipped
+
+    Returns:
+        Iterator over (question, answer) tuples
+    """
+    if source.lower().endswith(TEXT_FILE_EXTENSIONS):
+        # Files are already converted in parallel, so large ones are parsed in-process
+        return iter_text_file_cards(source, in_delimiter, issues, workers=1)
+    return iter_cards_from_csv_file(source, in_delimiter or _sniff_delimiter(source))
+
+
+def _convert_file(
+    source: str,
+    output: str,
+    in_delimiter: Optional[str],
+    out_delimiter: str
+) -> ConversionResult:
+    """
+    Convert one card file, run in a worker process.
+
+    Args:
+        source: Path of the card file to convert
+        output: Path of the converted file
+        in_delimiter: Delimiter of the source file, None to detect it
+        out_delimiter: Delimiter of the converted file
+
+    Returns:
+        ConversionResult describing the conversion
+    """
+    try:
+        folder = os.path.dirname(output)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        issues: List[ParseIssue] = []
+        cards = save_cards_to_csv(_iter_source_cards(source, in_delimiter, issues), output, out_delimiter)
+        return ConversionResult(
+            source, output, cards, os.path.getsize(source), skipped_lines=len(issues),
+            source_hash=_file_hash(source)
+        )
+    except (OSError, UnicodeDecodeError, csv.Error) as e:
+        # Do not leave a half-written output behind
+        try:
+            os.remove(output)
+        except OSError:
+            pass
+        return ConversionResult(source, output, error=str(e))
+
+
+def _load_manifest(output_root: str) -> Dict[str, dict]:
+    """Load the conversion manifest of an output directory, or an empty one."""
+    try:
+        with open(os.path.join(output_root, MANIFEST_NAME), 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(output_root: str, manifest: Dict[str, dict]) -> None:
+    """Write the conversion manifest of an output directory."""
+    os.makedirs(output_root, exist_ok=True)
+    with open(os.path.join(output_root, MANIFEST_NAME), 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+
+
+def _is_up_to_date(source: str, output: str, entry: Optional[dict], settings: dict) -> bool:
+    """
+    Decide whether an output file can be kept as it is.
+
+    The output is up to date if it is newer than its source, or if the
+    manifest records the same source hash for the same settings (for
+    example after a checkout touched the source without changing it).
+    """
+    if not os.path.exists(output) or (entry and entry.get('settings') != settings):
+        return False
+    if os.path.getmtime(output) >= os.path.getmtime(source):
+        return True
+    return bool(entry) and entry.get('hash') == _file_hash(source)
+
+
+def convert_directory(
+    root: str,
+    output_root: Optional[str] = None,
+    in_delimiter: Optional[str] = None,
+    out_delimiter: str = ';',
+    suffix: str = '',
+    workers: Optional[int] = None,
+    force: bool = False
+) -> List[ConversionResult]:
+    """
+    Convert every card file below a directory using a process pool.
+
+    The directory structure is mirrored below output_root. Files whose
+    output is already up to date (by modification time or, failing that,
+    by content hash recorded in the manifest) are skipped.
+
+    .txt and .tsv files are read as Anki text exports: tab-separated unless
+    their "#separator:" header or in_delimiter says otherwise, with quoted
+    fields. The delimiter of CSV files is detected unless in_delimiter is
+    given. Files that yield no cards are reported.
+
+    Args:
+        root: Directory containing the card files
+        output_root: Directory for the converted files (default: next to the sources)
+        in_delimiter: Delimiter of the source files (default: detected)
+        out_delimiter: Delimiter of the converted files (default: ';')
+        suffix: Text inserted before the extension of converted files (default: '')
+        workers: Number of worker processes (default: CPU count)
+        force: Convert every file even if its output is up to date (default: False)
+
+    Returns:
+        List of ConversionResult, one per card file
+    """
+    output_root = output_root or root
+    if os.path.abspath(output_root) == os.path.abspath(root) and not suffix:
+        raise ValueError("Converting in place needs a suffix or a separate output directory")
+
+    settings = {'in_delimiter': in_delimiter, 'out_delimiter': out_delimiter}
+    manifest = _load_manifest(output_root)
+    results = []
+    jobs = []
+
+    # An output directory inside the input tree must not be converted again on the next run
+    exclude = None if os.path.abspath(output_root) == os.path.abspath(root) else output_root
+    for source in find_card_files(root, exclude=exclude):
+        relative = os.path.relpath(source, root)
+        stem, extension = os.path.splitext(relative)
+        if suffix and stem.endswith(suffix):
+            # Output of an earlier in-place run
+            continue
+        output = os.path.join(output_root, stem + suffix + extension)
+
+        if not force and _is_up_to_date(source, output, manifest.get(relative), settings):
+            results.append(ConversionResult(source, output, skipped=True))
+        else:
+            jobs.append((relative, source, output))
+
+    started = time.perf_counter()
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(_convert_file, source, output, in_delimiter, out_delimiter): relative
+                for relative, source, output in jobs
+            }
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                if result.error:
+                    print(f"Error converting {result.source}: {result.error}")
+                    continue
+                manifest[futures[future]] = {'hash': result.source_hash, 'settings': settings}
+                if result.cards == 0:
+                    print(f"Warning: no cards found in {result.source}, check --in-delimiter")
+                elif result.skipped_lines:
+                    print(f"Warning: skipped {result.skipped_lines} malformed lines in {result.source}")
+        _save_manifest(output_root, manifest)
+
+    _print_conversion_summary(results, time.perf_counter() - started)
+    return results
+
+
+def _print_conversion_summary(results: List[ConversionResult], wall_time: float) -> None:
+    """
+    Print the aggregate throughput of a directory conversion.
+
+    Args:
+        results: Results of all card files
+        wall_time: Time spent converting in seconds
+    """
+    converted = [result for result in results if not result.skipped and not result.error]
+    skipped = sum(1 for result in results if result.skipped)
+    failed = sum(1 for result in results if result.error)
+    cards = sum(result.cards for result in converted)
+    megabytes = sum(result.bytes_read for result in converted) / 1e6
+
+    print(f"\nConverted {len(converted)} files ({cards} cards, {megabytes:.1f} MB) in {wall_time:.2f}s")
+    if converted and wall_time > 0:
+        print(f"Throughput: {cards / wall_time:.0f} cards/s, {megabytes / wall_time:.1f} MB/s")
+    print(f"Skipped {skipped} up-to-date files, {failed} failed")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point, returns the process exit code."""
+    parser = argparse.ArgumentParser(description="Convert every card file below a directory.")
+    parser.add_argument("root", help="directory containing the card files")
+    parser.add_argument("-o", "--output", help="output directory (default: next to the sources)")
+    parser.add_argument(
+        "--in-delimiter", help="delimiter of the source files (default: detected, tab for .txt and .tsv)"
+    )
+    parser.add_argument("--out-delimiter", default=';', help="delimiter of the converted files (default: ';')")
+    parser.add_argument("--suffix", default='', help="text added before the extension of converted files")
+    parser.add_argument("-j", "--workers", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="convert files even if up to date")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.root):
+        print(f"Not a directory: {args.root}")
+        return 2
+
+    try:
+        results = convert_directory(
+            args.root, args.output, args.in_delimiter, args.out_delimiter,
+            args.suffix, args.workers, args.force
+        )
+    except ValueError as e:
+        print(e)
+        return 2
+    return 1 if any(result.error for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
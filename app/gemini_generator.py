@@ -1,40 +1,933 @@
-import json
+import asyncio
+import contextvars
 import re
-from typing import List, Tuple, Optional
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Sequence, Tuple, Optional, Union
 
-# Import the official Google Generative AI Python client library
-try:
-    import google.generativeai as genai
-except ImportError:
-    print("Google Generative AI library not found. Please install it with:")
-    print("pip install google-generativeai")
-    raise
+from anki_utils import dedupe_cards, normalize_question
+from backends import MODEL_NAME, GenerationBackend, default_backend
+from card_parser import (
+    IncrementalCardParser,
+    extract_cards_from_json_text,
+    parse_structured_cards
+)
+from instrumentation import capture_tokens, increment, span
+from rate_limiter import RequestScheduler
+from response_cache import ResponseCache, get_default_cache
+from token_budget import TokenBudget, get_default_budget, output_limit, profile_key
+
+# Chunk size letting the token budget pick the most cards a request can hold
+# without reaching the model's output token limit
+AUTO_CHUNK_SIZE = "auto"
+# Requests for more cards than this are split into parallel sub-requests
+DEFAULT_CHUNK_SIZE = AUTO_CHUNK_SIZE
+# Maximum number of sub-requests of one chunked request in flight at once
+DEFAULT_CHUNK_WORKERS = 4
+# Most existing questions listed in a prompt, which keeps top-up prompts bounded
+MAX_EXCLUDED_QUESTIONS = 200
+
+
+class GeminiGenerationError(RuntimeError):
+    """Raised when the Gemini API call fails, after any retries."""
+
+
+class GeminiCardGenerator:
+    """
+    Long-lived card generator bound to one API key and model.
+    
+    Prompts are sent through a GenerationBackend: the google.generativeai
+    SDK unless another backend is given or selected with the ANKI_BACKEND
+    environment variable, see backends.default_backend. Instances are safe
+    to share between threads; use GeminiCardGenerator.for_key to get the
+    shared instance for an API key and model name.
+    
+    Every model call goes through the generator's RequestScheduler, which
+    enforces requests/tokens per minute, lowers concurrency when the API
+    throttles and retries transient errors with exponential backoff.
+    
+    Model calls, parsing and cache lookups are timed and counted through
+    the instrumentation module. The token usage of every request is added to
+    a TokenBudget, which predicts the output of later requests and sizes
+    chunks so responses are not cut off at the output token limit.
+    """
+    
+    _instances: Dict[Tuple[str, str], 'GeminiCardGenerator'] = {}
+    _instances_lock = threading.Lock()
+    
+    def __init__(
+        self,
+        api_key: str,
+        model_name: str = MODEL_NAME,
+        scheduler: Optional[RequestScheduler] = None,
+        backend: Optional[GenerationBackend] = None,
+        budget: Optional[TokenBudget] = None
+    ):
+        """
+        Create a generator for an API key and model.
+        
+        Args:
+            api_key: Google API key with Gemini access, not needed with an explicit backend
+            model_name: Name of the Gemini model to use (default: 'gemini-1.5-pro')
+            scheduler: Rate limiting and retry scheduler (default: a RequestScheduler with default limits)
+            backend: Backend sending the prompts (default: backends.default_backend())
+            budget: Token usage history (default: token_budget.get_default_budget())
+        """
+        if not api_key and backend is None:
+            raise ValueError("API key is required for Gemini API access")
+        
+        self.api_key = api_key
+        self.backend = backend or default_backend(api_key, model_name)
+        # Cache keys use the backend's model name, so mock responses never replace real ones
+        self.model_name = self.backend.model_name
+        self.scheduler = scheduler or RequestScheduler()
+        self.budget = budget or get_default_budget()
+    
+    @classmethod
+    def for_key(cls, api_key: str, model_name: str = MODEL_NAME) -> 'GeminiCardGenerator':
+        """
+        Return the shared generator for an API key and model, creating it if needed.
+        
+        With the default sdk backend, generators for different API keys take
+        turns, see backends.SdkBackend.
+        
+        Args:
+            api_key: Google API key with Gemini access
+            model_name: Name of the Gemini model to use (default: 'gemini-1.5-pro')
+            
+        Returns:
+            The shared GeminiCardGenerator
+        """
+        if not api_key:
+            raise ValueError("API key is required for Gemini API access")
+        
+        with cls._instances_lock:
+            generator = cls._instances.get((api_key, model_name))
+            if generator is None:
+                generator = cls(api_key, model_name)
+                cls._instances[(api_key, model_name)] = generator
+            return generator
+    
+    def cards_per_request(self, format_instructions: Optional[str] = None, structured_output: bool = False) -> int:
+        """
+        Return the most cards one request should ask for, from the token budget.
+        
+        Args:
+            format_instructions: Optional specific formatting instructions
+            structured_output: Whether schema-constrained JSON output is requested (default: False)
+            
+        Returns:
+            Cards per request that fit the model's output token limit
+        """
+        key = profile_key(self.model_name, format_instructions, structured_output)
+        return self.budget.cards_per_request(key, self._output_limit())
+    
+    def _output_limit(self) -> int:
+        """Return the output token limit of the backend's model."""
+        return self.backend.max_output_tokens or output_limit(self.model_name)
+    
+    @contextmanager
+    def _chunk_plan(
+        self,
+        topic: str,
+        num_cards: int,
+        format_instructions: Optional[str],
+        chunk_size: Union[int, str, None],
+        structured_output: bool
+    ) -> Iterator[Optional[int]]:
+        """
+        Resolve the chunk size of a request for the block making it.
+        
+        An "auto" size is the token budget's remembered plan for the request,
+        so repeats split it the same way and hit the response cache. The plan
+        is dropped if a response of the block hits the output token limit.
+        
+        Args:
+            topic: The topic to generate cards for
+            num_cards: Number of cards requested
+            format_instructions: Optional specific formatting instructions
+            chunk_size: Chunk size passed to generate
+            structured_output: Whether schema-constrained JSON output is requested
+            
+        Yields:
+            Maximum cards per request, None or 0 if chunking is disabled
+        """
+        if chunk_size != AUTO_CHUNK_SIZE:
+            yield chunk_size
+            return
+        key = profile_key(self.model_name, format_instructions, structured_output)
+        with capture_tokens() as usage:
+            yield self.budget.planned_cards_per_request(key, topic, num_cards, self._output_limit())
+        if usage["truncated"]:
+            self.budget.forget_plan(key, topic, num_cards)
+    
+    def generate(
+        self,
+        topic: str,
+        num_cards: int = 10,
+        format_instructions: Optional[str] = None,
+        chunk_size: Union[int, str, None] = DEFAULT_CHUNK_SIZE,
+        max_workers: int = DEFAULT_CHUNK_WORKERS,
+        use_cache: bool = True,
+        refresh_cache: bool = False,
+        structured_output: bool = False,
+        exclude_questions: Optional[Sequence[str]] = None
+    ) -> List[Tuple[str, str]]:
+        """
+        Generate Anki cards for a topic.
+        
+        Requests for more than chunk_size cards are split into sub-requests of
+        at most chunk_size cards that run in parallel; their results are merged
+        and deduplicated by question. With chunk_size "auto" the chunk size
+        comes from cards_per_request the first time a request is made, and is
+        kept for repeats of it.
+        
+        Responses are stored in the on-disk response cache, so regenerating the
+        same topic with the same parameters returns the cached cards without a
+        model call. Pass use_cache=False to bypass the cache entirely, or
+        refresh_cache=True to call the model and overwrite the cached entry.
+        
+        With structured_output=True the model is asked for a JSON response
+        matching CARD_LIST_SCHEMA, which is decoded and validated directly
+        instead of being scraped from free text. Only use it with models that
+        support response schemas.
+        
+        exclude_questions lists questions the deck already has. The most
+        recent MAX_EXCLUDED_QUESTIONS of them are named in the prompt, and
+        generated cards repeating any of them are dropped, so only new cards
+        are returned.
+        
+        Args:
+            topic: The topic to generate cards for
+            num_cards: Number of cards to generate (default: 10)
+            format_instructions: Optional specific formatting instructions
+            chunk_size: Maximum cards per request, "auto" to size requests from the token budget,
+                None or 0 disables chunking (default: "auto")
+            max_workers: Maximum number of sub-requests in flight at once (default: 4)
+            use_cache: Read and write the response cache (default: True)
+            refresh_cache: Ignore cached responses but store the new ones (default: False)
+            structured_output: Request schema-constrained JSON output (default: False)
+            exclude_questions: Questions the generated cards must not repeat (default: none)
+            
+        Returns:
+            List of tuples containing (question, answer) pairs
+            
+        Raises:
+            GeminiGenerationError: If the request (or every chunk of it) failed
+        """
+        options = dict(
+            use_cache=use_cache, refresh_cache=refresh_cache, structured_output=structured_output,
+            exclude_questions=exclude_questions
+        )
+        with self._chunk_plan(topic, num_cards, format_instructions, chunk_size, structured_output) as size:
+            chunks = _split_into_chunks(num_cards, size)
+            if len(chunks) == 1:
+                cards = self._request(topic, num_cards, format_instructions, **options)
+                return _drop_excluded(cards, exclude_questions)
+            
+            print(f"Splitting {num_cards} cards for '{topic}' into {len(chunks)} requests...")
+            with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+                # Each chunk runs in a copy of this context, so its token usage reaches the plan
+                futures = [
+                    executor.submit(
+                        contextvars.copy_context().run, self._request, topic, chunk_cards, format_instructions,
+                        part=(index + 1, len(chunks)), **options
+                    )
+                    for index, chunk_cards in enumerate(chunks)
+                ]
+                # Merge in chunk order so the output is deterministic
+                results = []
+                for future in futures:
+                    try:
+                        results.append(future.result())
+                    except GeminiGenerationError as e:
+                        results.append(e)
+        
+        return _drop_excluded(_merge_chunk_results(topic, results), exclude_questions)
+    
+    def generate_many(
+        self,
+        topics: Iterable[str],
+        num_cards: int = 10,
+        format_instructions: Optional[str] = None,
+        max_workers: int = 4,
+        **options
+    ) -> Iterator[Tuple[str, List[Tuple[str, str]]]]:
+        """
+        Generate cards for several topics concurrently, yielding results as they complete.
+        
+        Args:
+            topics: Topics to generate cards for
+            num_cards: Number of cards to generate per topic (default: 10)
+            format_instructions: Optional specific formatting instructions
+            max_workers: Maximum number of topics generated at once (default: 4)
+            **options: Further keyword arguments passed on to generate
+            
+        Yields:
+            Tuples of (topic, cards) in completion order
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self.generate, topic, num_cards, format_instructions, **options): topic
+                for topic in topics
+            }
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+    
+    def _request(
+        self,
+        topic: str,
+        num_cards: int,
+        format_instructions: Optional[str] = None,
+        part: Optional[Tuple[int, int]] = None,
+        use_cache: bool = True,
+        refresh_cache: bool = False,
+        structured_output: bool = False,
+        exclude_questions: Optional[Sequence[str]] = None
+    ) -> List[Tuple[str, str]]:
+        """
+        Generate cards with a single model request.
+        
+        Args:
+            topic: The topic to generate cards for
+            num_cards: Number of cards to generate
+            format_instructions: Optional specific formatting instructions
+            part: Optional (index, total) when this request is one chunk of a larger one
+            use_cache: Read and write the response cache (default: True)
+            refresh_cache: Ignore cached responses but store the new ones (default: False)
+            structured_output: Request schema-constrained JSON output (default: False)
+            exclude_questions: Existing questions to list in the prompt (default: none)
+            
+        Returns:
+            List of tuples containing (question, answer) pairs
+        """
+        prompt = _build_prompt(topic, num_cards, format_instructions, part, exclude_questions)
+        
+        cache = _open_cache(use_cache)
+        cache_key = ResponseCache.make_key(self.model_name, prompt, _cache_params(structured_output))
+        if cache and not refresh_cache:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                increment("cache_hits")
+                return cached[1]
+            increment("cache_misses")
+        
+        # Generate the content
+        key = profile_key(self.model_name, format_instructions, structured_output)
+        predicted_tokens = self.budget.predict_output_tokens(key, num_cards)
+        try:
+            with capture_tokens() as usage:
+                response_text = self.scheduler.run(
+                    lambda: self._call_model(prompt, structured_output),
+                    _estimate_tokens(prompt, predicted_tokens)
+                )
+        except Exception as e:
+            raise GeminiGenerationError(f"Gemini API error: {e}") from e
+        
+        cards = self._parse_and_record(response_text, structured_output, key, num_cards, predicted_tokens, usage)
+        # A truncated response lacks cards, so it is not cached and the next run asks again
+        if cache and cards and not usage["truncated"]:
+            cache.put(cache_key, response_text, cards)
+        return cards
+    
+    def _parse_and_record(
+        self,
+        response_text: str,
+        structured_output: bool,
+        key: str,
+        num_cards: int,
+        predicted_tokens: int,
+        usage: Dict[str, Any]
+    ) -> List[Tuple[str, str]]:
+        """
+        Parse a response and add its actual token usage to the budget history.
+        
+        A response cut off at the output limit is no longer valid JSON, so the
+        complete cards are salvaged with the tolerant parser even when
+        structured output was requested. Usage is recorded even when parsing
+        fails, since truncated responses are what the history has to learn from.
+        
+        Args:
+            response_text: Text from the AI response
+            structured_output: Whether the response was requested as schema-constrained JSON
+            key: Profile key of the request
+            num_cards: Cards the prompt asked for
+            predicted_tokens: Output tokens predicted before the request
+            usage: Token usage captured during the request
+            
+        Returns:
+            List of tuples containing (question, answer) pairs
+        """
+        cards: List[Tuple[str, str]] = []
+        try:
+            cards = _parse_cards(response_text, structured_output and not usage["truncated"])
+        finally:
+            if usage["output_tokens"]:
+                self.budget.record(
+                    key, num_cards, len(cards), predicted_tokens, usage["output_tokens"], usage["truncated"]
+                )
+            if usage["truncated"]:
+                print(f"Response hit the output token limit, got {len(cards)} of {num_cards} cards")
+        increment("cards_generated", len(cards))
+        return cards
+    
+    def _call_model(self, prompt: str, structured_output: bool, stream: bool = False) -> Union[str, Iterator[str]]:
+        """
+        Make one timed model call, with the token usage the backend reports.
+        
+        Args:
+            prompt: The prompt text
+            structured_output: Request schema-constrained JSON output
+            stream: Open a streamed response instead of waiting for the whole text
+            
+        Returns:
+            The response text, or an iterator over its chunks when streaming
+        """
+        increment("model_calls")
+        if stream:
+            chunks = self._timed_stream(prompt, structured_output)
+            # Run up to the opened stream, so errors opening it are raised here and can be retried
+            next(chunks)
+            return chunks
+        with span("model_call", model=self.model_name, stream=stream) as attributes, capture_tokens() as usage:
+            response_text = self.backend.generate_text(prompt, structured_output)
+            attributes.update(usage)
+            return response_text
+    
+    def _timed_stream(self, prompt: str, structured_output: bool) -> Iterator[str]:
+        """
+        Open a streamed model call and yield its chunks, timing the call until the stream is read.
+        
+        An empty string is yielded first, once the stream is open; _call_model
+        consumes it. Backends may report the token usage only with the last
+        chunk, so it is captured for the whole stream.
+        """
+        with span("model_call", model=self.model_name, stream=True) as attributes, capture_tokens() as usage:
+            chunks = self.backend.open_stream(prompt, structured_output)
+            yield ""
+            yield from chunks
+            attributes.update(usage)
+    
+    async def _acall_model(self, prompt: str, structured_output: bool) -> str:
+        """Asynchronous counterpart of _call_model."""
+        increment("model_calls")
+        with span("model_call", model=self.model_name) as attributes, capture_tokens() as usage:
+            response_text = await self.backend.agenerate_text(prompt, structured_output)
+            attributes.update(usage)
+            return response_text
+    
+    def generate_stream(
+        self,
+        topic: str,
+        num_cards: int = 10,
+        format_instructions: Optional[str] = None,
+        use_cache: bool = True,
+        refresh_cache: bool = False,
+        structured_output: bool = False
+    ) -> Iterator[Tuple[str, str]]:
+        """
+        Generate cards with a streamed model response, yielding each card as soon as it is complete.
+        
+        The response is parsed incrementally while it arrives, so the first
+        cards are available long before the whole response is. If the model
+        does not answer with JSON, the cards are extracted from the full text
+        once the stream ends. Streamed requests are not chunked, and only
+        opening the stream is retried since cards may already have been
+        yielded when a later part fails.
+        
+        Args:
+            topic: The topic to generate cards for
+            num_cards: Number of cards to generate (default: 10)
+            format_instructions: Optional specific formatting instructions
+            use_cache: Read and write the response cache (default: True)
+            refresh_cache: Ignore cached responses but store the new ones (default: False)
+            structured_output: Request schema-constrained JSON output (default: False)
+            
+        Yields:
+            Tuples of (question, answer) in response order
+            
+        Raises:
+            GeminiGenerationError: If the request failed
+        """
+        prompt = _build_prompt(topic, num_cards, format_instructions)
+        
+        cache = _open_cache(use_cache)
+        cache_key = ResponseCache.make_key(self.model_name, prompt, _cache_params(structured_output))
+        if cache and not refresh_cache:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                increment("cache_hits")
+                yield from cached[1]
+                return
+            increment("cache_misses")
+        
+        parser = IncrementalCardParser()
+        chunks = []
+        cards = []
+        key = profile_key(self.model_name, format_instructions, structured_output)
+        predicted_tokens = self.budget.predict_output_tokens(key, num_cards)
+        try:
+            with capture_tokens() as usage:
+                stream = self.scheduler.run(
+                    lambda: self._call_model(prompt, structured_output, stream=True),
+                    _estimate_tokens(prompt, predicted_tokens)
+                )
+                # Closed inside the capture block, so an abandoned stream ends its timing and capture first
+                with closing(stream):
+                    for text in stream:
+                        chunks.append(text)
+                        for card in parser.feed(text):
+                            cards.append(card)
+                            yield card
+        except Exception as e:
+            raise GeminiGenerationError(f"Gemini API error: {e}") from e
+        
+        response_text = ''.join(chunks)
+        if not cards and not structured_output:
+            # No JSON objects in the stream, fall back to parsing the whole text
+            cards = _parse_response_text(response_text)
+            yield from cards
+        
+        increment("cards_generated", len(cards))
+        if usage["output_tokens"]:
+            self.budget.record(key, num_cards, len(cards), predicted_tokens, usage["output_tokens"], usage["truncated"])
+        if cache and cards and not usage["truncated"]:
+            cache.put(cache_key, response_text, cards)
+    
+    async def agenerate(
+        self,
+        topic: str,
+        num_cards: int = 10,
+        format_instructions: Optional[str] = None,
+        chunk_size: Union[int, str, None] = DEFAULT_CHUNK_SIZE,
+        use_cache: bool = True,
+        refresh_cache: bool = False,
+        structured_output: bool = False,
+        exclude_questions: Optional[Sequence[str]] = None
+    ) -> List[Tuple[str, str]]:
+        """
+        Asynchronous counterpart of generate.
+        
+        The model call is awaited instead of blocking the calling thread, so many
+        topics can be generated from a single event loop. Large requests are
+        chunked, responses cached and exclude_questions applied the same way
+        as in the synchronous version.
+        
+        Args:
+            topic: The topic to generate cards for
+            num_cards: Number of cards to generate (default: 10)
+            format_instructions: Optional specific formatting instructions
+            chunk_size: Maximum cards per request, "auto" to size requests from the token budget,
+                None or 0 disables chunking (default: "auto")
+            use_cache: Read and write the response cache (default: True)
+            refresh_cache: Ignore cached responses but store the new ones (default: False)
+            structured_output: Request schema-constrained JSON output (default: False)
+            exclude_questions: Questions the generated cards must not repeat (default: none)
+            
+        Returns:
+            List of tuples containing (question, answer) pairs
+            
+        Raises:
+            GeminiGenerationError: If the request (or every chunk of it) failed
+        """
+        options = dict(
+            use_cache=use_cache, refresh_cache=refresh_cache, structured_output=structured_output,
+            exclude_questions=exclude_questions
+        )
+        with self._chunk_plan(topic, num_cards, format_instructions, chunk_size, structured_output) as size:
+            chunks = _split_into_chunks(num_cards, size)
+            if len(chunks) == 1:
+                cards = await self._arequest(topic, num_cards, format_instructions, **options)
+                return _drop_excluded(cards, exclude_questions)
+            
+            results = await asyncio.gather(*(
+                self._arequest(
+                    topic, chunk_cards, format_instructions,
+                    part=(index + 1, len(chunks)), **options
+                )
+                for index, chunk_cards in enumerate(chunks)
+            ), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException) and not isinstance(result, GeminiGenerationError):
+                raise result
+        return _drop_excluded(_merge_chunk_results(topic, results), exclude_questions)
+    
+    async def agenerate_many(
+        self,
+        topics: Iterable[str],
+        num_cards: int = 10,
+        format_instructions: Optional[str] = None,
+        max_concurrency: int = 4,
+        **options
+    ) -> AsyncIterator[Tuple[str, List[Tuple[str, str]]]]:
+        """
+        Generate cards for several topics concurrently, yielding results as they complete.
+        
+        At most max_concurrency topics are in flight at once. Closing the
+        iterator early (or cancelling the task consuming it) cancels every
+        request that has not finished yet.
+        
+        Args:
+            topics: Topics to generate cards for
+            num_cards: Number of cards to generate per topic (default: 10)
+            format_instructions: Optional specific formatting instructions
+            max_concurrency: Maximum number of concurrent requests (default: 4)
+            **options: Further keyword arguments passed on to agenerate
+            
+        Yields:
+            Tuples of (topic, cards) in completion order
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def _run(topic: str) -> Tuple[str, List[Tuple[str, str]]]:
+            async with semaphore:
+                return topic, await self.agenerate(topic, num_cards, format_instructions, **options)
+        
+        tasks = [asyncio.ensure_future(_run(topic)) for topic in topics]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Cancel whatever is still pending if the consumer stopped early
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def _arequest(
+        self,
+        topic: str,
+        num_cards: int,
+        format_instructions: Optional[str] = None,
+        part: Optional[Tuple[int, int]] = None,
+        use_cache: bool = True,
+        refresh_cache: bool = False,
+        structured_output: bool = False,
+        exclude_questions: Optional[Sequence[str]] = None
+    ) -> List[Tuple[str, str]]:
+        """
+        Generate cards with a single awaited model request.
+        
+        Args:
+            topic: The topic to generate cards for
+            num_cards: Number of cards to generate
+            format_instructions: Optional specific formatting instructions
+            part: Optional (index, total) when this request is one chunk of a larger one
+            use_cache: Read and write the response cache (default: True)
+            refresh_cache: Ignore cached responses but store the new ones (default: False)
+            structured_output: Request schema-constrained JSON output (default: False)
+            exclude_questions: Existing questions to list in the prompt (default: none)
+            
+        Returns:
+            List of tuples containing (question, answer) pairs
+        """
+        prompt = _build_prompt(topic, num_cards, format_instructions, part, exclude_questions)
+        
+        cache = _open_cache(use_cache)
+        cache_key = ResponseCache.make_key(self.model_name, prompt, _cache_params(structured_output))
+        if cache and not refresh_cache:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                increment("cache_hits")
+                return cached[1]
+            increment("cache_misses")
+        
+        key = profile_key(self.model_name, format_instructions, structured_output)
+        predicted_tokens = self.budget.predict_output_tokens(key, num_cards)
+        try:
+            with capture_tokens() as usage:
+                response_text = await self.scheduler.arun(
+                    lambda: self._acall_model(prompt, structured_output),
+                    _estimate_tokens(prompt, predicted_tokens)
+                )
+        except Exception as e:
+            raise GeminiGenerationError(f"Gemini API error: {e}") from e
+        
+        cards = self._parse_and_record(response_text, structured_output, key, num_cards, predicted_tokens, usage)
+        if cache and cards and not usage["truncated"]:
+            cache.put(cache_key, response_text, cards)
+        return cards
 
 
 def generate_anki_cards_with_gemini(
     api_key: str, 
     topic: str, 
     num_cards: int = 10, 
-    format_instructions: Optional[str] = None
+    format_instructions: Optional[str] = None,
+    chunk_size: Union[int, str, None] = DEFAULT_CHUNK_SIZE,
+    max_workers: int = DEFAULT_CHUNK_WORKERS,
+    use_cache: bool = True,
+    refresh_cache: bool = False,
+    structured_output: bool = False,
+    exclude_questions: Optional[Sequence[str]] = None
 ) -> List[Tuple[str, str]]:
     """
     Generate Anki cards using Google's Gemini AI API.
     
+    Thin wrapper around the shared GeminiCardGenerator for api_key, see
+    GeminiCardGenerator.generate for chunking, caching, structured output and
+    excluded questions.
+    
+    Args:
+        api_key: Google API key with Gemini access
+        topic: The topic to generate cards for
+        num_cards: Number of cards to generate (default: 10)
+        format_instructions: Optional specific formatting instructions
+        chunk_size: Maximum cards per request, "auto" to size requests from the token budget,
+            None or 0 disables chunking (default: "auto")
+        max_workers: Maximum number of sub-requests in flight at once (default: 4)
+        use_cache: Read and write the response cache (default: True)
+        refresh_cache: Ignore cached responses but store the new ones (default: False)
+        structured_output: Request schema-constrained JSON output (default: False)
+        exclude_questions: Questions the generated cards must not repeat (default: none)
+        
+    Returns:
+        List of tuples containing (question, answer) pairs
+        
+    Raises:
+        GeminiGenerationError: If the API call failed after retries
+    """
+    generator = GeminiCardGenerator.for_key(api_key)
+    return generator.generate(
+        topic, num_cards, format_instructions, chunk_size, max_workers, use_cache, refresh_cache,
+        structured_output, exclude_questions
+    )
+
+
+def stream_anki_cards_with_gemini(
+    api_key: str, 
+    topic: str, 
+    num_cards: int = 10, 
+    format_instructions: Optional[str] = None,
+    use_cache: bool = True,
+    refresh_cache: bool = False,
+    structured_output: bool = False
+) -> Iterator[Tuple[str, str]]:
+    """
+    Generate Anki cards with a streamed response, yielding each card as it arrives.
+    
+    Thin wrapper around the shared GeminiCardGenerator for api_key, see
+    GeminiCardGenerator.generate_stream.
+    
+    Args:
+        api_key: Google API key with Gemini access
+        topic: The topic to generate cards for
+        num_cards: Number of cards to generate (default: 10)
+        format_instructions: Optional specific formatting instructions
+        use_cache: Read and write the response cache (default: True)
+        refresh_cache: Ignore cached responses but store the new ones (default: False)
+        structured_output: Request schema-constrained JSON output (default: False)
+        
+    Yields:
+        Tuples of (question, answer) in response order
+    """
+    generator = GeminiCardGenerator.for_key(api_key)
+    return generator.generate_stream(
+        topic, num_cards, format_instructions, use_cache, refresh_cache, structured_output
+    )
+
+
+async def agenerate_anki_cards(
+    api_key: str, 
+    topic: str, 
+    num_cards: int = 10, 
+    format_instructions: Optional[str] = None,
+    chunk_size: Union[int, str, None] = DEFAULT_CHUNK_SIZE,
+    use_cache: bool = True,
+    refresh_cache: bool = False,
+    structured_output: bool = False,
+    exclude_questions: Optional[Sequence[str]] = None
+) -> List[Tuple[str, str]]:
+    """
+    Asynchronous counterpart of generate_anki_cards_with_gemini.
+    
     Args:
         api_key: Google API key with Gemini access
         topic: The topic to generate cards for
         num_cards: Number of cards to generate (default: 10)
         format_instructions: Optional specific formatting instructions
+        chunk_size: Maximum cards per request, "auto" to size requests from the token budget,
+            None or 0 disables chunking (default: "auto")
+        use_cache: Read and write the response cache (default: True)
+        refresh_cache: Ignore cached responses but store the new ones (default: False)
+        structured_output: Request schema-constrained JSON output (default: False)
+        exclude_questions: Questions the generated cards must not repeat (default: none)
         
     Returns:
         List of tuples containing (question, answer) pairs
     """
-    if not api_key:
-        raise ValueError("API key is required for Gemini API access")
+    generator = GeminiCardGenerator.for_key(api_key)
+    return await generator.agenerate(
+        topic, num_cards, format_instructions, chunk_size, use_cache, refresh_cache, structured_output,
+        exclude_questions
+    )
+
+
+async def agenerate_many(
+    api_key: str,
+    topics: Iterable[str],
+    num_cards: int = 10,
+    format_instructions: Optional[str] = None,
+    max_concurrency: int = 4
+) -> AsyncIterator[Tuple[str, List[Tuple[str, str]]]]:
+    """
+    Generate cards for several topics concurrently, yielding results as they complete.
+    
+    At most max_concurrency requests are in flight at once. Closing the
+    iterator early (or cancelling the task consuming it) cancels every
+    request that has not finished yet.
     
-    # Configure the Gemini API client
-    genai.configure(api_key=api_key)
+    Args:
+        api_key: Google API key with Gemini access
+        topics: Topics to generate cards for
+        num_cards: Number of cards to generate per topic (default: 10)
+        format_instructions: Optional specific formatting instructions
+        max_concurrency: Maximum number of concurrent requests (default: 4)
+        
+    Yields:
+        Tuples of (topic, cards) in completion order
+    """
+    generator = GeminiCardGenerator.for_key(api_key)
+    async for result in generator.agenerate_many(topics, num_cards, format_instructions, max_concurrency):
+        yield result
+
+
+def _open_cache(use_cache: bool) -> Optional[ResponseCache]:
+    """
+    Return the response cache, or None if caching is disabled or unavailable.
     
+    Args:
+        use_cache: Whether the caller wants to use the cache
+        
+    Returns:
+        The shared ResponseCache or None
+    """
+    if not use_cache:
+        return None
+    
+    try:
+        return get_default_cache()
+    except (OSError, sqlite3.Error) as e:
+        print(f"Response cache unavailable, continuing without it: {e}")
+        return None
+
+
+def _split_into_chunks(num_cards: int, chunk_size: Optional[int]) -> List[int]:
+    """
+    Split a card count into evenly sized chunks of at most chunk_size cards.
+    
+    Args:
+        num_cards: Total number of cards requested
+        chunk_size: Maximum cards per chunk, None or 0 disables chunking
+        
+    Returns:
+        List of card counts, one per chunk
+    """
+    if not chunk_size or num_cards <= chunk_size:
+        return [num_cards]
+    
+    num_chunks = -(-num_cards // chunk_size)
+    base, extra = divmod(num_cards, num_chunks)
+    return [base + 1 if index < extra else base for index in range(num_chunks)]
+
+
+def _merge_chunk_results(
+    topic: str,
+    results: List[Union[List[Tuple[str, str]], GeminiGenerationError]]
+) -> List[Tuple[str, str]]:
+    """
+    Merge the cards of all chunks, dropping duplicate questions.
+    
+    Failed chunks are reported and skipped; only if every chunk failed is
+    the error raised.
+    
+    Args:
+        topic: The topic the chunks were generated for
+        results: Cards or the error of each chunk, in chunk order
+        
+    Returns:
+        List of tuples containing (question, answer) pairs
+    """
+    errors = [result for result in results if isinstance(result, GeminiGenerationError)]
+    if len(errors) == len(results):
+        raise errors[0]
+    if errors:
+        print(f"{len(errors)} of {len(results)} requests for '{topic}' failed: {errors[0]}")
+    
+    merged = [card for cards in results if not isinstance(cards, GeminiGenerationError) for card in cards]
+    unique_cards = dedupe_cards(merged)
+    
+    if len(unique_cards) < len(merged):
+        print(f"Removed {len(merged) - len(unique_cards)} duplicate cards across chunks")
+    
+    return unique_cards
+
+
+def _drop_excluded(
+    cards: List[Tuple[str, str]],
+    exclude_questions: Optional[Sequence[str]]
+) -> List[Tuple[str, str]]:
+    """
+    Remove cards whose question repeats one of the excluded questions.
+    
+    Args:
+        cards: Generated cards
+        exclude_questions: Questions the deck already has, or None
+        
+    Returns:
+        The cards with a new question
+    """
+    if not exclude_questions:
+        return cards
+    
+    excluded = {normalize_question(question) for question in exclude_questions}
+    new_cards = [card for card in cards if normalize_question(card[0]) not in excluded]
+    if len(new_cards) < len(cards):
+        print(f"Dropped {len(cards) - len(new_cards)} generated cards that repeat existing questions")
+    return new_cards
+
+
+def _estimate_tokens(prompt: str, output_tokens: int) -> int:
+    """
+    Estimate the prompt plus output tokens of a request.
+    
+    Args:
+        prompt: The prompt text
+        output_tokens: Output tokens predicted by the token budget
+        
+    Returns:
+        Approximate token count
+    """
+    return len(prompt) // 4 + output_tokens
+
+
+def _build_prompt(
+    topic: str,
+    num_cards: int,
+    format_instructions: Optional[str] = None,
+    part: Optional[Tuple[int, int]] = None,
+    exclude_questions: Optional[Sequence[str]] = None
+) -> str:
+    """
+    Build the card generation prompt sent to the model.
+    
+    Args:
+        topic: The topic to generate cards for
+        num_cards: Number of cards to generate
+        format_instructions: Optional specific formatting instructions
+        part: Optional (index, total) when this request is one chunk of a larger one
+        exclude_questions: Optional questions the deck already has
+        
+    Returns:
+        The prompt text
+    """
     # Default format instructions if none provided
     if not format_instructions:
         format_instructions = (
@@ -43,73 +936,103 @@ def generate_anki_cards_with_gemini(
             "Format your response as a JSON array of objects, where each object has a 'question' and 'answer' field."
         )
     
+    # Steer parallel chunks towards different parts of the topic to limit overlap
+    part_instructions = ""
+    if part:
+        index, total = part
+        part_instructions = (
+            f"This is part {index} of {total} of a larger deck on this topic. "
+            f"Divide the material into {total} roughly equal sections and only "
+            f"cover section {index}, so the parts do not repeat each other."
+        )
+    
+    # Name the questions the deck already has, keeping the most recent ones when capped
+    exclude_instructions = ""
+    if exclude_questions:
+        listed = list(exclude_questions)[-MAX_EXCLUDED_QUESTIONS:]
+        exclude_instructions = (
+            "\n    The deck already contains the questions below. Only generate new cards, "
+            "do not repeat these questions or ask the same thing in other words:\n"
+            + "\n".join(f"- {question}" for question in listed)
+        )
+    
     # Construct the prompt
-    prompt = f"""
+    return f"""
     Topic: {topic}
     
     Please generate {num_cards} high-quality Anki flashcards for this topic.
+    {part_instructions}{exclude_instructions}
     
     {format_instructions}
     """
+
+
+def _cache_params(structured_output: bool) -> Optional[Dict[str, Any]]:
+    """Generation parameters that change the response and so belong in the cache key."""
+    return {"structured_output": True} if structured_output else None
+
+
+def _parse_cards(response_text: str, structured_output: bool) -> List[Tuple[str, str]]:
+    """
+    Parse a response with the parser matching how it was requested.
     
-    # Get a reference to the model
-    model = genai.GenerativeModel('gemini-1.5-pro')
+    Args:
+        response_text: Text from the AI response
+        structured_output: Whether the response was requested as schema-constrained JSON
+        
+    Returns:
+        List of tuples containing (question, answer) pairs
+        
+    Raises:
+        GeminiGenerationError: If a structured response does not match the schema
+    """
+    if not structured_output:
+        return _parse_response_text(response_text)
     
-    # Generate the content
     try:
-        response = model.generate_content(prompt)
-        
-        # Process the response text
-        response_text = response.text
+        with span("parse_structured"):
+            return parse_structured_cards(response_text)
+    except ValueError as e:
+        raise GeminiGenerationError(f"Invalid structured response: {e}") from e
+
+
+def _parse_response_text(response_text: str) -> List[Tuple[str, str]]:
+    """
+    Turn the raw model response into cards.
+    
+    Args:
+        response_text: Text from the AI response
         
-        # First try to parse as JSON
+    Returns:
+        List of tuples containing (question, answer) pairs
+    """
+    # First try to parse as JSON
+    with span("parse_json"):
         cards = _try_parse_json(response_text)
-        if cards is not None:
-            return cards
-        
-        # If JSON parsing fails, try to extract cards from text
+    if cards is not None:
+        return cards
+    
+    # If JSON parsing fails, try to extract cards from text
+    increment("parse_fallbacks")
+    with span("parse_text_fallback"):
         return _extract_cards_from_text(response_text)
-        
-    except Exception as e:
-        print(f"Gemini API error: {e}")
-        return []
 
 
 def _try_parse_json(text: str) -> Optional[List[Tuple[str, str]]]:
     """
     Try to parse JSON content from the AI response.
     
+    Each card object is decoded independently in one pass over the text, so
+    chatter around the JSON is skipped and the valid cards of a partially
+    broken array are kept.
+    
     Args:
         text: Text from the AI response
     
     Returns:
         List of tuples containing (question, answer) pairs or None if parsing fails
     """
-    # Find JSON content - look for JSON array
-    json_start = text.find('[')
-    json_end = text.rfind(']') + 1
-    
-    if json_start == -1 or json_end == 0:
-        # Try to find JSON object if not an array
-        json_start = text.find('{')
-        json_end = text.rfind('}') + 1
-    
-    if json_start >= 0 and json_end > json_start:
-        json_content = text[json_start:json_end]
-        try:
-            cards_data = json.loads(json_content)
-            
-            # Handle both array of objects and single object formats
-            if isinstance(cards_data, dict):
-                # Single card
-                return [(cards_data.get("question", ""), cards_data.get("answer", ""))]
-            else:
-                # Array of cards
-                return [(card.get("question", ""), card.get("answer", "")) for card in cards_data]
-        except json.JSONDecodeError:
-            return None
-    
-    return None
+    return extract_cards_from_json_text(text)
 
 
 def _extract_cards_from_text(text: str) -> List[Tuple[str, str]]:
@@ -0,0 +1,291 @@
+import gzip
+import http.client
+import json
+import socket
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import Any, Dict, List, Optional, Tuple
+
+# httpx is optional; with the h2 package installed as well it speaks HTTP/2,
+# which multiplexes every request over one connection per host
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = httpx is not None
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_READ_TIMEOUT = 120.0
+# Idle connections kept per host, matching the scheduler's default concurrency
+DEFAULT_POOL_SIZE = 8
+
+TRANSPORTS = ("auto", "httpx", "pool", "urllib")
+
+
+class HttpStatusError(Exception):
+    """Raised for non-2xx responses; code holds the HTTP status for the scheduler."""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(f"HTTP {code}: {message}")
+        self.code = code
+
+
+def _error_message(body: bytes) -> str:
+    """Extract the message of a Google API error body, or the start of the raw body."""
+    try:
+        return json.loads(body)["error"]["message"]
+    except (ValueError, KeyError, TypeError):
+        return body[:200].decode('utf-8', 'replace')
+
+
+def _decode(status: int, content_encoding: Optional[str], body: bytes) -> Dict[str, Any]:
+    """Decompress and decode a JSON response, raising HttpStatusError for error statuses."""
+    if content_encoding == "gzip":
+        body = gzip.decompress(body)
+    if status >= 400:
+        raise HttpStatusError(status, _error_message(body))
+    return json.loads(body)
+
+
+class HttpTransport:
+    """Sends JSON POST requests; subclasses differ in how they manage connections."""
+
+    name = "base"
+
+    def post_json(self, url: str, payload: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, Any]:
+        """
+        POST a JSON payload and decode the JSON response.
+
+        Args:
+            url: Request URL
+            payload: JSON-serialisable request body
+            headers: Extra request headers
+
+        Returns:
+            The decoded response body
+
+        Raises:
+            HttpStatusError: If the server answered with an error status
+            ConnectionError: If the server could not be reached
+            TimeoutError: If connecting or reading timed out
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Close every connection held by the transport."""
+
+
+class UrllibTransport(HttpTransport):
+    """Opens a new connection, and TLS session, for every request."""
+
+    name = "urllib"
+
+    def __init__(self, read_timeout: float = DEFAULT_READ_TIMEOUT):
+        self.read_timeout = read_timeout
+
+    def post_json(self, url: str, payload: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, Any]:
+        request = urllib.request.Request(
+            url, data=json.dumps(payload).encode('utf-8'),
+            headers={**headers, "Content-Type": "application/json", "Accept-Encoding": "gzip"}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.read_timeout) as response:
+                return _decode(response.status, response.headers.get("Content-Encoding"), response.read())
+        except urllib.error.HTTPError as e:
+            body = e.read()
+            if e.headers.get("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+            raise HttpStatusError(e.code, _error_message(body)) from e
+        except urllib.error.URLError as e:
+            if isinstance(e.reason, socket.timeout):
+                raise TimeoutError(f"Timed out connecting to {url}") from e
+            raise ConnectionError(f"Cannot reach {url}: {e.reason}") from e
+        except socket.timeout as e:
+            raise TimeoutError(f"Timed out reading from {url}") from e
+
+
+class PooledTransport(HttpTransport):
+    """
+    Keep-alive connection pool on top of http.client, using only the standard library.
+
+    Connections are reused across requests and threads, so a batch pays for
+    the TCP and TLS handshakes once per pooled connection instead of once per
+    request. A request that fails on a reused connection because the server
+    closed it while idle is retried once on a fresh connection.
+    """
+
+    name = "pool"
+
+    def __init__(
+        self,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+        pool_size: int = DEFAULT_POOL_SIZE
+    ):
+        """
+        Create an empty pool.
+
+        Args:
+            connect_timeout: Seconds to wait for a connection (default: 10)
+            read_timeout: Seconds to wait for response data (default: 120)
+            pool_size: Idle connections kept per host (default: 8)
+        """
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.pool_size = pool_size
+        self._idle: Dict[Tuple[str, str, int], List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+
+    def _acquire(self, key: Tuple[str, str, int]) -> Tuple[http.client.HTTPConnection, bool]:
+        """Return an idle connection to the host, or open a new one, and whether it was reused."""
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+
+        scheme, host, port = key
+        connection_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        connection = connection_class(host, port, timeout=self.connect_timeout)
+        connection.connect()
+        connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        connection.sock.settimeout(self.read_timeout)
+        return connection, False
+
+    def _release(self, key: Tuple[str, str, int], connection: http.client.HTTPConnection) -> None:
+        """Return a connection to the pool, closing it if the pool is full."""
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.pool_size:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def post_json(self, url: str, payload: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, Any]:
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        body = json.dumps(payload).encode('utf-8')
+        headers = {**headers, "Content-Type": "application/json", "Accept-Encoding": "gzip"}
+
+        for attempt in range(2):
+            try:
+                connection, reused = self._acquire(key)
+            except socket.timeout as e:
+                raise TimeoutError(f"Timed out connecting to {parts.netloc}") from e
+            except OSError as e:
+                raise ConnectionError(f"Cannot reach {parts.netloc}: {e}") from e
+
+            try:
+                connection.request("POST", path, body, headers)
+                response = connection.getresponse()
+                data = response.read()
+            except (ConnectionResetError, BrokenPipeError, http.client.RemoteDisconnected) as e:
+                connection.close()
+                if reused and attempt == 0:
+                    # The server closed the idle keep-alive connection, try a fresh one
+                    continue
+                raise ConnectionError(f"Connection to {parts.netloc} lost: {e}") from e
+            except socket.timeout as e:
+                connection.close()
+                raise TimeoutError(f"Timed out reading from {parts.netloc}") from e
+            except (OSError, http.client.HTTPException) as e:
+                connection.close()
+                raise ConnectionError(f"Request to {parts.netloc} failed: {e}") from e
+
+            if response.will_close:
+                connection.close()
+            else:
+                self._release(key, connection)
+            return _decode(response.status, response.getheader("Content-Encoding"), data)
+
+    def close(self) -> None:
+        with self._lock:
+            connections = [connection for idle in self._idle.values() for connection in idle]
+            self._idle.clear()
+        for connection in connections:
+            connection.close()
+
+
+class HttpxTransport(HttpTransport):
+    """Pooled httpx client, over HTTP/2 when the h2 package is installed."""
+
+    def __init__(
+        self,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+        pool_size: int = DEFAULT_POOL_SIZE
+    ):
+        """
+        Create the client.
+
+        Args:
+            connect_timeout: Seconds to wait for a connection (default: 10)
+            read_timeout: Seconds to wait for response data (default: 120)
+            pool_size: Maximum connections per host (default: 8)
+        """
+        if httpx is None:
+            raise ImportError("The httpx transport needs httpx: pip install httpx[http2]")
+        self.name = "httpx-h2" if HTTP2_AVAILABLE else "httpx"
+        # httpx asks for and decompresses gzip responses by itself
+        self._client = httpx.Client(
+            http2=HTTP2_AVAILABLE,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        )
+
+    def post_json(self, url: str, payload: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, Any]:
+        try:
+            response = self._client.post(url, json=payload, headers=headers)
+        except httpx.TimeoutException as e:
+            raise TimeoutError(f"Timed out talking to {url}: {e}") from e
+        except httpx.TransportError as e:
+            raise ConnectionError(f"Cannot reach {url}: {e}") from e
+        if response.status_code >= 400:
+            raise HttpStatusError(response.status_code, _error_message(response.content))
+        return response.json()
+
+    def close(self) -> None:
+        self._client.close()
+
+
+def create_transport(
+    kind: str = "auto",
+    connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+    read_timeout: float = DEFAULT_READ_TIMEOUT,
+    pool_size: int = DEFAULT_POOL_SIZE
+) -> HttpTransport:
+    """
+    Create an HTTP transport.
+
+    Args:
+        kind: "httpx", "pool" (standard library keep-alive pool), "urllib"
+            (a new connection per request) or "auto" for httpx when it is
+            installed and the pool otherwise (default: "auto")
+        connect_timeout: Seconds to wait for a connection (default: 10)
+        read_timeout: Seconds to wait for response data (default: 120)
+        pool_size: Connections kept per host (default: 8)
+
+    Returns:
+        The transport
+
+    Raises:
+        ValueError: If kind names no known transport
+        ImportError: If kind is "httpx" and httpx is not installed
+    """
+    if kind == "auto":
+        kind = "httpx" if httpx is not None else "pool"
+    if kind == "httpx":
+        return HttpxTransport(connect_timeout, read_timeout, pool_size)
+    if kind == "pool":
+        return PooledTransport(connect_timeout, read_timeout, pool_size)
+    if kind == "urllib":
+        return UrllibTransport(read_timeout)
+    raise ValueError(f"Unknown HTTP transport '{kind}', expected one of {', '.join(TRANSPORTS)}")
@@ -0,0 +1,320 @@
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+# Environment variables naming files written when the process exits: a
+# Prometheus text file with counters and stage timings, and a trace of every
+# span (.json for chrome://tracing and Perfetto, .jsonl for one event per line)
+METRICS_FILE_ENV = "ANKI_METRICS_FILE"
+TRACE_FILE_ENV = "ANKI_TRACE_FILE"
+
+# Counters always exported, even when still zero
+COUNTERS = {
+    "model_calls": "Model calls made, including retried attempts.",
+    "retries": "Model calls retried after a retryable error.",
+    "cache_hits": "Requests answered from the response cache.",
+    "cache_misses": "Requests that had to call the model.",
+    "cards_generated": "Cards parsed from model responses.",
+    "parse_fallbacks": "Responses without JSON cards, parsed as Q:/A: text instead.",
+    "prompt_tokens": "Prompt tokens reported by the model.",
+    "output_tokens": "Output tokens reported by the model.",
+    "truncated_responses": "Responses cut off at the model's output token limit.",
+}
+
+# Spans kept for the trace; later ones are counted but dropped
+MAX_TRACE_EVENTS = 200000
+
+_lock = threading.Lock()
+_counters: Dict[str, int] = dict.fromkeys(COUNTERS, 0)
+# Stage name -> [count, total seconds, max seconds]
+_stages: Dict[str, List[float]] = {}
+_events: List[Dict[str, Any]] = []
+_thread_names: Dict[int, str] = {}
+_dropped_events = 0
+_tracing = False
+_epoch = time.perf_counter()
+
+_metrics_file: Optional[str] = None
+_trace_file: Optional[str] = None
+_exit_hook_registered = False
+
+# Usage dicts of the capture_tokens blocks of the current context, innermost last
+_token_sinks: contextvars.ContextVar = contextvars.ContextVar("token_sinks", default=())
+
+
+def increment(name: str, amount: int = 1) -> None:
+    """
+    Add to a counter.
+
+    Args:
+        name: Counter name, usually one of COUNTERS
+        amount: Amount to add (default: 1)
+    """
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def record_tokens(prompt_tokens: int, output_tokens: int, truncated: bool = False) -> None:
+    """
+    Record the token usage a model response reported.
+
+    The usage is added to the token counters and to every capture_tokens
+    block the call runs in.
+
+    Args:
+        prompt_tokens: Tokens of the prompt
+        output_tokens: Tokens of the generated response
+        truncated: Whether the response stopped at the output token limit (default: False)
+    """
+    with _lock:
+        _counters["prompt_tokens"] += prompt_tokens
+        _counters["output_tokens"] += output_tokens
+        _counters["truncated_responses"] += truncated
+    for sink in _token_sinks.get():
+        sink["prompt_tokens"] += prompt_tokens
+        sink["output_tokens"] += output_tokens
+        sink["truncated"] = sink["truncated"] or truncated
+
+
+@contextmanager
+def capture_tokens() -> Iterator[Dict[str, Any]]:
+    """
+    Collect the token usage recorded by the calls made inside the block.
+
+    Yields:
+        Dict with prompt_tokens, output_tokens and truncated, filled in as usage is recorded
+    """
+    sink = {"prompt_tokens": 0, "output_tokens": 0, "truncated": False}
+    token = _token_sinks.set(_token_sinks.get() + (sink,))
+    try:
+        yield sink
+    finally:
+        _token_sinks.reset(token)
+
+
+@contextmanager
+def span(name: str, **args) -> Iterator[Dict[str, Any]]:
+    """
+    Time a stage of the work.
+
+    The duration is added to the stage's totals, and, while tracing is on,
+    recorded as a complete event for timeline viewers.
+
+    Args:
+        name: Stage name
+        **args: Attributes stored with the trace event
+
+    Yields:
+        The attributes, so the block can add results such as card counts
+    """
+    start = time.perf_counter()
+    try:
+        yield args
+    finally:
+        _record_span(name, start, time.perf_counter() - start, args)
+
+
+def _record_span(name: str, start: float, duration: float, args: Dict[str, Any]) -> None:
+    """Add a finished span to the stage totals and the trace."""
+    global _dropped_events
+    with _lock:
+        stage = _stages.get(name)
+        if stage is None:
+            _stages[name] = [1, duration, duration]
+        else:
+            stage[0] += 1
+            stage[1] += duration
+            stage[2] = max(stage[2], duration)
+
+        if not _tracing:
+            return
+        if len(_events) >= MAX_TRACE_EVENTS:
+            _dropped_events += 1
+            return
+        thread_id = threading.get_ident()
+        if thread_id not in _thread_names:
+            _thread_names[thread_id] = threading.current_thread().name
+        _events.append({
+            "name": name,
+            "ph": "X",
+            "ts": round((start - _epoch) * 1e6, 1),
+            "dur": round(duration * 1e6, 1),
+            "pid": os.getpid(),
+            "tid": thread_id,
+            "args": args,
+        })
+
+
+def enable_tracing(enabled: bool = True) -> None:
+    """Start or stop recording spans for the trace; stage totals are always kept."""
+    global _tracing
+    _tracing = enabled
+
+
+def snapshot() -> Dict[str, Any]:
+    """
+    Return the current counters and stage timings.
+
+    Returns:
+        Dict with counters (name -> value) and stages (name -> count, seconds, max_seconds)
+    """
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "stages": {
+                name: {"count": int(count), "seconds": total, "max_seconds": longest}
+                for name, (count, total, longest) in _stages.items()
+            },
+        }
+
+
+def reset() -> None:
+    """Clear every counter, stage timing and trace event."""
+    global _dropped_events
+    with _lock:
+        _counters.clear()
+        _counters.update(dict.fromkeys(COUNTERS, 0))
+        _stages.clear()
+        _events.clear()
+        _thread_names.clear()
+        _dropped_events = 0
+
+
+def format_summary() -> str:
+    """
+    Format the stage timings and counters as a table for the console.
+
+    Returns:
+        The summary text
+    """
+    data = snapshot()
+    lines = [f"{'stage':<24} {'count':>7} {'total s':>9} {'mean ms':>9} {'max ms':>9}"]
+    for name, stage in sorted(data["stages"].items(), key=lambda item: -item[1]["seconds"]):
+        lines.append(
+            f"{name:<24} {stage['count']:>7} {stage['seconds']:>9.3f} "
+            f"{stage['seconds'] / stage['count'] * 1000:>9.2f} {stage['max_seconds'] * 1000:>9.2f}"
+        )
+    lines.append("")
+    lines.extend(f"{name:<24} {value:>7}" for name, value in data["counters"].items())
+    return "\n".join(lines)
+
+
+def _write_atomically(path: str, text: str) -> None:
+    """Write a file through a temporary file, so readers never see it half written."""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        file.write(text)
+    os.replace(temp_path, path)
+
+
+def _label_value(value: str) -> str:
+    """Escape a Prometheus label value."""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def write_prometheus(path: str) -> None:
+    """
+    Write the counters and stage timings in the Prometheus text format.
+
+    The file can be picked up by node_exporter's textfile collector or read
+    directly.
+
+    Args:
+        path: Output file, replaced atomically
+    """
+    data = snapshot()
+    lines = []
+    for name, value in data["counters"].items():
+        lines.append(f"# HELP anki_{name}_total {COUNTERS.get(name, name)}")
+        lines.append(f"# TYPE anki_{name}_total counter")
+        lines.append(f"anki_{name}_total {value}")
+
+    lines.append("# HELP anki_stage_seconds Time spent in each instrumented stage.")
+    lines.append("# TYPE anki_stage_seconds summary")
+    for name, stage in data["stages"].items():
+        label = _label_value(name)
+        lines.append(f'anki_stage_seconds_sum{{stage="{label}"}} {stage["seconds"]:.6f}')
+        lines.append(f'anki_stage_seconds_count{{stage="{label}"}} {stage["count"]}')
+    lines.append("# HELP anki_stage_max_seconds Longest single run of each instrumented stage.")
+    lines.append("# TYPE anki_stage_max_seconds gauge")
+    for name, stage in data["stages"].items():
+        lines.append(f'anki_stage_max_seconds{{stage="{_label_value(name)}"}} {stage["max_seconds"]:.6f}')
+
+    _write_atomically(path, "\n".join(lines) + "\n")
+
+
+def write_trace(path: str) -> int:
+    """
+    Write the recorded spans in the Chrome trace event format.
+
+    A .jsonl path gets one event per line; any other path gets a JSON
+    document that chrome://tracing, Perfetto and speedscope open directly.
+
+    Args:
+        path: Output file
+
+    Returns:
+        Number of span events written
+    """
+    with _lock:
+        events = list(_events)
+        names = dict(_thread_names)
+        dropped = _dropped_events
+    pid = os.getpid()
+    metadata = [
+        {"name": "thread_name", "ph": "M", "pid": pid, "tid": thread_id, "args": {"name": name}}
+        for thread_id, name in names.items()
+    ]
+
+    if path.endswith(".jsonl"):
+        text = "".join(json.dumps(event, ensure_ascii=False) + "\n" for event in metadata + events)
+    else:
+        text = json.dumps({
+            "traceEvents": metadata + events,
+            "displayTimeUnit": "ms",
+            "otherData": {"dropped_events": dropped},
+        }, ensure_ascii=False)
+    _write_atomically(path, text)
+    if dropped:
+        print(f"Trace limit of {MAX_TRACE_EVENTS} spans reached, {dropped} later spans were dropped")
+    return len(events)
+
+
+def write_exports() -> None:
+    """Write the metrics and trace files chosen with configure_export."""
+    try:
+        if _metrics_file:
+            write_prometheus(_metrics_file)
+        if _trace_file:
+            write_trace(_trace_file)
+    except OSError as e:
+        print(f"Could not write metrics: {e}")
+
+
+def configure_export(metrics_file: Optional[str] = None, trace_file: Optional[str] = None) -> None:
+    """
+    Choose files written when the process exits.
+
+    Naming a trace file turns tracing on.
+
+    Args:
+        metrics_file: Prometheus text file for counters and stage timings
+        trace_file: Trace file for the recorded spans
+    """
+    global _metrics_file, _trace_file, _exit_hook_registered
+    if metrics_file:
+        _metrics_file = metrics_file
+    if trace_file:
+        _trace_file = trace_file
+        enable_tracing()
+    if (_metrics_file or _trace_file) and not _exit_hook_registered:
+        atexit.register(write_exports)
+        _exit_hook_registered = True
+
+
+configure_export(os.environ.get(METRICS_FILE_ENV), os.environ.get(TRACE_FILE_ENV))
@@ -1,17 +1,21 @@
 import os
-import tkinter as tk
-from tkinter import filedialog
+import sqlite3
+import sys
 
-from anki_utils import (
-    create_folder_for_anki_cards,
-    create_anki_cards_from_text_file,
-    save_cards_to_csv
-)
-from gemini_generator import generate_anki_cards_with_gemini
+from anki_utils import create_folder_for_anki_cards, save_cards_to_csv
+from batch_generator import DEFAULT_MAX_WORKERS, generate_batch, resume_batch
+from batch_journal import default_journal_path
+from card_store import get_default_store
+from mmap_reader import iter_text_file_cards
+from near_duplicates import print_near_duplicates, remove_near_duplicates
 
 
 def select_folder_with_dialog():
     """Open a folder selection dialog using Tkinter."""
+    # Imported here so the command line works on machines without a display or Tk
+    import tkinter as tk
+    from tkinter import filedialog
+
     # Hide the main Tkinter window
     root = tk.Tk()
     root.withdraw()
@@ -100,6 +104,8 @@ def open_folder_and_generate_cards():
         
         print("Generating cards with Gemini AI...")
         try:
+            from gemini_generator import generate_anki_cards_with_gemini
+
             cards = generate_anki_cards_with_gemini(api_key, topic, num_cards)
             print(f"Generated {len(cards)} cards")
             
@@ -113,6 +119,7 @@ def open_folder_and_generate_cards():
                 
                 if len(cards) > 3:
                     print(f"\n... plus {len(cards) - 3} more cards")
+            cards = _offer_near_duplicate_removal(cards)
         except Exception as e:
             print(f"Error generating cards: {e}")
             return
@@ -125,12 +132,22 @@ def open_folder_and_generate_cards():
         delimiter = input("Enter delimiter for CSV (default ';'): ") or ';'
         save_cards_to_csv(cards, file_path, delimiter)
         print(f"\nCards saved to {file_path}")
+        
+        store = _open_card_store()
+        if store:
+            deck = os.path.basename(os.path.normpath(folder_path))
+            inserted, updated = store.upsert_cards(deck, topic, cards)
+            print(f"Card store: {inserted} new, {updated} updated cards")
     else:
         print("No cards created. File not saved.")
 
 
 def create_batch_folders_and_cards():
     """Create multiple folders and generate cards for each one."""
+    if input("Resume an interrupted batch? (y/n): ").lower() == 'y':
+        _resume_batch()
+        return
+    
     print("Enter a list of folder names (one per line). Type 'DONE' on a new line when finished:")
     folders = []
     while True:
@@ -167,28 +184,111 @@ def create_batch_folders_and_cards():
             print("API key is required for Gemini. Falling back to empty cards.")
             gen_choice = "1"
     
-    for folder in folders:
-        # Create folder
-        folder_path = os.path.join(base_dir, folder)
-        create_folder_for_anki_cards(folder_path)
-        
-        # Generate cards
-        cards = []
-        if gen_choice == "2":
-            try:
-                print(f"\nGenerating cards for '{folder}'...")
-                cards = generate_anki_cards_with_gemini(api_key, folder, cards_per_folder)
-                print(f"Generated {len(cards)} cards for '{folder}'")
-            except Exception as e:
-                print(f"Error generating cards for '{folder}': {e}")
-        
-        # Save cards
-        csv_path = os.path.join(folder_path, f"{folder}_cards.csv")
-        save_cards_to_csv(cards, csv_path, delimiter=';')
+    if gen_choice == "2":
+        max_workers = int(input(f"Max concurrent requests (default {DEFAULT_MAX_WORKERS}): ") or DEFAULT_MAX_WORKERS)
+        incremental = input("Only generate the cards missing from existing card files? (y/n): ").lower() == 'y'
+        refresh_cache = input("Ignore cached responses and regenerate? (y/n): ").lower() == 'y'
+        generate_batch(
+            api_key, folders, base_dir, cards_per_folder, max_workers,
+            refresh_cache=refresh_cache, store=_open_card_store(), incremental=incremental
+        )
+    else:
+        for folder in folders:
+            # Create folder with an empty card file
+            folder_path = os.path.join(base_dir, folder)
+            create_folder_for_anki_cards(folder_path)
+            csv_path = os.path.join(folder_path, f"{folder}_cards.csv")
+            save_cards_to_csv([], csv_path, delimiter=';')
     
     print(f"\nCreated {len(folders)} folders with card files.")
 
 
+def _resume_batch():
+    """Continue a batch whose journal is in the selected base directory."""
+    print("\nSelect the base directory of the interrupted batch:")
+    base_dir = select_folder_with_dialog() or input("Enter base directory path: ").strip()
+    journal_path = default_journal_path(base_dir)
+    if not os.path.exists(journal_path):
+        print(f"No batch journal found in {base_dir}")
+        return
+    
+    api_key = input("Enter your Gemini API key: ")
+    if not api_key:
+        print("API key is required. Operation cancelled.")
+        return
+    
+    max_workers = int(input(f"Max concurrent requests (default {DEFAULT_MAX_WORKERS}): ") or DEFAULT_MAX_WORKERS)
+    resume_batch(api_key, journal_path, max_workers, store=_open_card_store())
+
+
+def _open_card_store():
+    """Open the local card store, or return None if it is not available."""
+    try:
+        return get_default_store()
+    except (OSError, sqlite3.Error) as e:
+        print(f"Card store not available ({e}), cards are only saved as CSV")
+        return None
+
+
+def _preview_cards(cards):
+    """Print the first few cards of a finished generation."""
+    if cards:
+        print("\nPreview of generated cards:")
+        for i, (question, answer) in enumerate(cards[:3], 1):
+            print(f"\nCard {i}:")
+            print(f"Q: {question}")
+            print(f"A: {answer}")
+        
+        if len(cards) > 3:
+            print(f"\n... plus {len(cards) - 3} more cards")
+
+
+def _stream_and_preview_cards(api_key, topic, num_cards, format_instructions=None):
+    """Generate cards with a streamed response, previewing them while they arrive."""
+    from gemini_generator import stream_anki_cards_with_gemini
+
+    cards = []
+    for question, answer in stream_anki_cards_with_gemini(api_key, topic, num_cards, format_instructions):
+        cards.append((question, answer))
+        if len(cards) <= 3:
+            print(f"\nCard {len(cards)}:")
+            print(f"Q: {question}")
+            print(f"A: {answer}")
+        else:
+            print(f"\r... received {len(cards)} of {num_cards} cards", end="", flush=True)
+    
+    if len(cards) > 3:
+        print()
+    print(f"Generated {len(cards)} cards")
+    return cards
+
+
+def _offer_near_duplicate_removal(cards):
+    """Report cards with near-identical questions and let the user drop them."""
+    kept, dropped = remove_near_duplicates(cards)
+    if not dropped:
+        return cards
+    
+    print(f"\nFound {len(dropped)} cards whose question nearly repeats an earlier one:")
+    print_near_duplicates(dropped)
+    if input("Remove them? (y/n): ").lower() == 'y':
+        print(f"Kept {len(kept)} cards")
+        return kept
+    return cards
+
+
+def _print_parse_issues(errors, limit=5):
+    """Summarize the lines skipped while reading a card file."""
+    if not errors:
+        return
+    
+    print(f"Skipped {len(errors)} malformed lines:")
+    for issue in errors[:limit]:
+        print(f"  line {issue.line_number}: {issue.message}")
+    if len(errors) > limit:
+        print(f"  ... plus {len(errors) - limit} more")
+
+
 def main():
     print("\n===== Anki Card Generator =====")
     print("This script helps create and manage Anki cards")
@@ -208,14 +308,17 @@ def main():
             print("\n-- Creating Anki cards from text file --")
             file_path = input("Enter text file path: ")
             if os.path.exists(file_path):
-                cards = create_anki_cards_from_text_file(file_path)
-                print(f"Created {len(cards)} cards from text file")
-                
+                errors = []
                 save_option = input("Save cards to CSV? (y/n): ")
                 if save_option.lower() == 'y':
                     output_path = input("Enter output CSV path: ")
                     delimiter = input("Enter delimiter (default ';'): ") or ';'
-                    save_cards_to_csv(cards, output_path, delimiter)
+                    # Stream cards from the text file straight into the CSV file
+                    count = save_cards_to_csv(iter_text_file_cards(file_path, errors=errors), output_path, delimiter)
+                else:
+                    count = sum(1 for _ in iter_text_file_cards(file_path, errors=errors))
+                print(f"Created {count} cards from text file")
+                _print_parse_issues(errors)
             else:
                 print("File not found!")
                 
@@ -249,19 +352,17 @@ def main():
             
             print("Generating cards with Gemini AI...")
             try:
-                cards = generate_anki_cards_with_gemini(api_key, topic, num_cards, format_instructions)
-                print(f"Generated {len(cards)} cards")
-                
-                # Preview some cards
-                if cards:
-                    print("\nPreview of generated cards:")
-                    for i, (question, answer) in enumerate(cards[:3], 1):
-                        print(f"\nCard {i}:")
-                        print(f"Q: {question}")
-                        print(f"A: {answer}")
-                    
-                    if len(cards) > 3:
-                        print(f"\n... plus {len(cards) - 3} more cards")
+                # Imported on first use, loading the Gemini client is slow
+                from gemini_generator import GeminiCardGenerator, generate_anki_cards_with_gemini
+
+                if num_cards > GeminiCardGenerator.for_key(api_key).cards_per_request(format_instructions):
+                    # Large requests are chunked, which needs the complete responses
+                    cards = generate_anki_cards_with_gemini(api_key, topic, num_cards, format_instructions)
+                    print(f"Generated {len(cards)} cards")
+                    _preview_cards(cards)
+                else:
+                    cards = _stream_and_preview_cards(api_key, topic, num_cards, format_instructions)
+                cards = _offer_near_duplicate_removal(cards)
                 
                 save_option = input("\nSave cards to CSV? (y/n): ")
                 if save_option.lower() == 'y':
@@ -288,4 +389,8 @@ def main():
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        import cli
+
+        sys.exit(cli.main(sys.argv[1:]))
     main()
\ No newline at end of file
@@ -0,0 +1,275 @@
+import mmap
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from anki_utils import ParseIssue, iter_cards_from_text_file, text_file_separator
+
+
+# Size of the byte range handed to one worker (default: 32 MB)
+DEFAULT_CHUNK_BYTES = 32 * 1024 * 1024
+# Text files at least this large are read by iter_text_file_cards with the mmap reader
+MMAP_MIN_BYTES = 16 * 1024 * 1024
+
+
+def split_byte_ranges(file_path: str, chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> List[Tuple[int, int]]:
+    """
+    Split a file into byte ranges of roughly chunk_bytes that end at line boundaries.
+
+    Args:
+        file_path: Path to the card file
+        chunk_bytes: Target size of each range in bytes (default: 32 MB)
+
+    Returns:
+        List of (start, end) byte offsets covering the whole file, in order
+    """
+    size = os.path.getsize(file_path)
+    if size == 0:
+        return []
+
+    ranges = []
+    with open(file_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        start = 0
+        while start < size:
+            end = min(start + chunk_bytes, size)
+            if end < size:
+                # Extend the range to the end of the line it cuts through
+                newline = data.find(b'\n', end)
+                end = size if newline == -1 else newline + 1
+            ranges.append((start, end))
+            start = end
+
+    return ranges
+
+
+def parse_byte_range(
+    file_path: str,
+    start: int,
+    end: int,
+    delimiter: bytes = b'\t',
+    fields: Sequence[int] = (0, 1)
+) -> Tuple[List[Tuple[str, ...]], List[Tuple[int, str, str]], int]:
+    """
+    Parse the records in one byte range of a delimited card file.
+
+    Records and fields are split on the raw bytes; only the requested fields
+    are decoded. Blank lines, comment lines starting with '#' and lines
+    with too few fields or a blank first field are skipped, as in
+    anki_utils.iter_cards_from_text_file. Quoted fields are not unquoted, use
+    anki_utils.iter_notes_from_text_file for files that need that.
+
+    Args:
+        file_path: Path to the card file
+        start: Offset of the first byte of the range
+        end: Offset just past the last byte of the range
+        delimiter: Field delimiter as bytes (default: tab)
+        fields: Indexes of the fields to return (default: question and answer)
+
+    Returns:
+        Tuple of (records as tuples of the requested fields, skipped lines as
+        (line index in the range, message, line) tuples, number of newlines in the range)
+    """
+    with open(file_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        lines = data[start:end].split(b'\n')
+
+    # Fields past the last requested one are never split off, let alone decoded
+    needed = max(fields) + 1
+    rows = [line.split(delimiter, needed) for line in lines]
+    if tuple(fields) == (0, 1):
+        # Common case of question and answer, without the per-field generator
+        records = [
+            (row[0].decode('utf-8', 'replace').strip(), row[1].decode('utf-8', 'replace').strip())
+            for row in rows
+            if len(row) >= 2 and row[0][:1] != b'#' and row[0].strip()
+        ]
+    else:
+        records = [
+            tuple(row[index].decode('utf-8', 'replace').strip() for index in fields)
+            for row in rows
+            if len(row) >= needed and row[0][:1] != b'#' and row[0].strip()
+        ]
+
+    skipped = []
+    # The range normally ends with a newline, leaving one empty trailing line
+    if len(records) < len(lines) - 1:
+        # Second pass only for ranges with skipped lines, to tell blank lines and comments apart
+        for index, row in enumerate(rows):
+            if len(row) >= needed and row[0][:1] != b'#' and row[0].strip():
+                continue
+            line = lines[index].rstrip(b'\r')
+            if not line.strip() or line[:1] == b'#':
+                continue
+            message = (f"expected at least {needed} fields, found {len(row)}" if len(row) < needed
+                       else "empty question")
+            skipped.append((index, message, line.decode('utf-8', 'replace')))
+    return records, skipped, len(lines) - 1
+
+
+def _parse_range_task(
+    args: Tuple[str, int, int, bytes, Sequence[int]]
+) -> Tuple[List[Tuple[str, ...]], List[Tuple[int, str, str]], int]:
+    """Process pool entry point for parse_byte_range."""
+    return parse_byte_range(*args)
+
+
+def iter_records_mmap(
+    file_path: str,
+    delimiter: str = '\t',
+    fields: Sequence[int] = (0, 1),
+    workers: Optional[int] = None,
+    chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+    stats: Optional[dict] = None,
+    errors: Optional[List[ParseIssue]] = None
+) -> Iterator[Tuple[str, ...]]:
+    """
+    Read a large delimited card file in parallel, yielding records in file order.
+
+    The file is split into line-aligned byte ranges that are parsed in a
+    process pool. At most two ranges per worker are in flight, so memory
+    stays bounded even for multi-GB files.
+
+    Args:
+        file_path: Path to the card file
+        delimiter: Field delimiter (default: tab)
+        fields: Indexes of the fields to return (default: question and answer)
+        workers: Number of worker processes, 1 parses in-process (default: CPU count)
+        chunk_bytes: Target size of each byte range (default: 32 MB)
+        stats: Optional dict that receives 'records', 'skipped', 'bytes' and 'seconds'
+        errors: Optional list collecting a ParseIssue per skipped line
+
+    Yields:
+        Tuples of the requested fields
+    """
+    workers = workers or os.cpu_count() or 1
+    delimiter_bytes = delimiter.encode('utf-8')
+    ranges = split_byte_ranges(file_path, chunk_bytes)
+    tasks = [(file_path, start, end, delimiter_bytes, tuple(fields)) for start, end in ranges]
+
+    started = time.perf_counter()
+    records = skipped = 0
+    # 1-based number of the first line of the next range
+    line_number = 1
+
+    def _collect(result):
+        nonlocal records, skipped, line_number
+        chunk_records, chunk_skipped, newlines = result
+        records += len(chunk_records)
+        skipped += len(chunk_skipped)
+        if errors is not None:
+            errors.extend(ParseIssue(line_number + index, message, line) for index, message, line in chunk_skipped)
+        line_number += newlines
+        return chunk_records
+
+    if workers == 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield from _collect(_parse_range_task(task))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for task in tasks:
+                pending.append(executor.submit(_parse_range_task, task))
+                if len(pending) >= workers * 2:
+                    yield from _collect(pending.popleft().result())
+            while pending:
+                yield from _collect(pending.popleft().result())
+
+    if stats is not None:
+        stats.update(
+            records=records,
+            skipped=skipped,
+            bytes=ranges[-1][1] if ranges else 0,
+            seconds=time.perf_counter() - started
+        )
+
+
+def iter_text_file_cards(
+    file_path: str,
+    separator: Optional[str] = None,
+    errors: Optional[List[ParseIssue]] = None,
+    workers: Optional[int] = None
+) -> Iterator[Tuple[str, str]]:
+    """
+    Read the cards of an Anki text file, with the mmap reader for large files.
+
+    Files of at least MMAP_MIN_BYTES are parsed by iter_records_mmap, unless
+    they contain quote characters: quoted fields may hold separators and
+    newlines, which only anki_utils.iter_cards_from_text_file handles. Both
+    readers return the same cards and report the same skipped lines.
+
+    Args:
+        file_path: Path to the text file
+        separator: Field separator, overrides the file header (default: header or tab)
+        errors: Optional list collecting a ParseIssue per skipped line; if
+            omitted, skipped lines are printed
+        workers: Worker processes of the mmap reader, 1 parses in-process (default: CPU count)
+
+    Returns:
+        Iterator over (question, answer) tuples in file order
+    """
+    if os.path.getsize(file_path) < MMAP_MIN_BYTES or _has_quotes(file_path):
+        return iter_cards_from_text_file(file_path, separator, errors)
+    return _iter_mmap_cards(file_path, text_file_separator(file_path, separator), errors, workers)
+
+
+def _has_quotes(file_path: str) -> bool:
+    """Tell whether a file contains a double quote, scanning it without reading it into memory."""
+    with open(file_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        return data.find(b'"') != -1
+
+
+def _iter_mmap_cards(
+    file_path: str,
+    separator: str,
+    errors: Optional[List[ParseIssue]],
+    workers: Optional[int]
+) -> Iterator[Tuple[str, str]]:
+    """Yield the cards of iter_records_mmap, printing skipped lines if no errors list is given."""
+    issues = [] if errors is None else errors
+    yield from iter_records_mmap(file_path, separator, (0, 1), workers, errors=issues)
+    if errors is None:
+        for issue in issues:
+            print(f"Skipping line {issue.line_number}: {issue.message}")
+
+
+def bulk_import_cards(
+    file_path: str,
+    delimiter: str = '\t',
+    workers: Optional[int] = None,
+    chunk_bytes: int = DEFAULT_CHUNK_BYTES
+) -> List[Tuple[str, str]]:
+    """
+    Import every card of a large delimited file using mmap and a process pool.
+
+    Prints the number of cards, skipped lines and the throughput in MB/s.
+
+    Args:
+        file_path: Path to the card file
+        delimiter: Field delimiter (default: tab)
+        workers: Number of worker processes (default: CPU count)
+        chunk_bytes: Target size of each byte range (default: 32 MB)
+
+    Returns:
+        List of (question, answer) tuples in file order
+    """
+    stats = {}
+    cards = list(iter_records_mmap(file_path, delimiter, (0, 1), workers, chunk_bytes, stats))
+    print_import_stats(file_path, stats)
+    return cards
+
+
+def print_import_stats(file_path: str, stats: dict) -> None:
+    """
+    Print the summary of a bulk import.
+
+    Args:
+        file_path: Path of the imported file
+        stats: Statistics filled in by iter_records_mmap
+    """
+    megabytes = stats.get('bytes', 0) / 1e6
+    seconds = stats.get('seconds', 0) or 1e-9
+    print(f"Imported {stats.get('records', 0)} cards from {file_path} "
+          f"({megabytes:.1f} MB in {seconds:.2f}s, {megabytes / seconds:.1f} MB/s)")
+    if stats.get('skipped'):
+        print(f"Skipped {stats['skipped']} lines with too few fields or an empty question")
@@ -0,0 +1,161 @@
+import argparse
+import gzip
+import json
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Tuple
+
+from backends import LATENCY_DISTRIBUTIONS, MockApiError, MockBackend
+
+
+DEFAULT_PORT = 8765
+
+_GENERATE_PATH_RE = re.compile(r'^/v1beta/models/([^/:]+):generateContent$')
+
+_STATUS_NAMES = {429: "RESOURCE_EXHAUSTED", 500: "INTERNAL"}
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    """Answers generateContent requests the way the Gemini REST API does."""
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without this, keep-alive
+    # clients wait for a delayed ACK on every response
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+        if not _GENERATE_PATH_RE.match(self.path.split('?', 1)[0]):
+            self._send_json(404, _error_body(404, "NOT_FOUND", f"Unknown path {self.path}"))
+            return
+        try:
+            request = json.loads(body)
+            prompt = "".join(part.get("text", "") for part in request["contents"][-1]["parts"])
+            config = request.get("generationConfig") or {}
+            structured_output = config.get("responseMimeType") == "application/json"
+        except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+            self._send_json(400, _error_body(400, "INVALID_ARGUMENT", "Invalid generateContent request"))
+            return
+
+        backend: MockBackend = self.server.backend
+        try:
+            delay = backend.plan(prompt)
+        except MockApiError as e:
+            self._send_json(e.code, _error_body(e.code, _STATUS_NAMES.get(e.code, "UNKNOWN"), str(e)))
+            return
+
+        time.sleep(delay)
+        text, truncated = backend.limit_output(backend.respond(prompt, structured_output))
+        self._send_json(200, {
+            "candidates": [{
+                "content": {"role": "model", "parts": [{"text": text}]},
+                "finishReason": "MAX_TOKENS" if truncated else "STOP",
+                "index": 0,
+            }],
+            "usageMetadata": {
+                "promptTokenCount": len(prompt) // 4,
+                "candidatesTokenCount": len(text) // 4,
+                "totalTokenCount": (len(prompt) + len(text)) // 4,
+            },
+        })
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        compress = "gzip" in (self.headers.get("Accept-Encoding") or "")
+        if compress:
+            data = gzip.compress(data, compresslevel=5)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        if compress:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def _error_body(code: int, status: str, message: str) -> dict:
+    """Build an error response body in the Google API format."""
+    return {"error": {"code": code, "message": message, "status": status}}
+
+
+def start_mock_server(
+    backend: Optional[MockBackend] = None,
+    host: str = "127.0.0.1",
+    port: int = 0,
+    verbose: bool = False
+) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Start a mock Gemini REST server in a background thread.
+
+    Args:
+        backend: Mock deciding latencies, errors and responses (default: MockBackend())
+        host: Interface to listen on (default: '127.0.0.1')
+        port: Port to listen on, 0 picks a free one (default: 0)
+        verbose: Log every request to stderr (default: False)
+
+    Returns:
+        Tuple of (server, base URL for RestBackend); call server.shutdown() to stop it
+    """
+    server = ThreadingHTTPServer((host, port), _MockHandler)
+    server.daemon_threads = True
+    server.backend = backend or MockBackend()
+    server.verbose = verbose
+    threading.Thread(target=server.serve_forever, name="mock-gemini-server", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1beta"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point, returns the process exit code."""
+    parser = argparse.ArgumentParser(description="Serve a mock Gemini generateContent endpoint for offline runs.")
+    parser.add_argument("--host", default="127.0.0.1", help="interface to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("--latency", type=float, default=0.5, help="median seconds per response (default: 0.5)")
+    parser.add_argument("--distribution", choices=LATENCY_DISTRIBUTIONS, default="lognormal",
+                        help="latency distribution (default: lognormal)")
+    parser.add_argument("--jitter", type=float, default=0.3, help="spread of the distribution (default: 0.3)")
+    parser.add_argument("--latency-per-card", type=float, default=0.0, help="extra seconds per card (default: 0)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 500 responses (default: 0)")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of 429 responses (default: 0)")
+    parser.add_argument("--format", choices=("json", "prose"), default="json", help="response format (default: json)")
+    parser.add_argument("--canned", nargs="+", metavar="FILE", help="files whose text is returned in turn")
+    parser.add_argument("--seed", type=int, help="seed for reproducible latencies and errors")
+    parser.add_argument("--max-output-tokens", type=int, help="cut responses off at this many tokens")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+
+    canned = None
+    if args.canned:
+        try:
+            canned = []
+            for file_path in args.canned:
+                with open(file_path, 'r', encoding='utf-8') as file:
+                    canned.append(file.read())
+        except OSError as e:
+            print(f"Error: {e}")
+            return 1
+
+    backend = MockBackend(
+        args.latency, args.distribution, args.jitter, args.latency_per_card, args.error_rate,
+        args.throttle_rate, args.format, canned, args.seed, max_output_tokens=args.max_output_tokens
+    )
+    server, url = start_mock_server(backend, args.host, args.port, args.verbose)
+    print(f"Mock Gemini server listening on {url}")
+    print(f"Point the app at it with: ANKI_BACKEND={url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,368 @@
+import argparse
+import json
+import os
+import sys
+import zlib
+from array import array
+from operator import eq
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from anki_utils import iter_cards_from_csv_file, normalize_question, save_cards_to_csv
+
+
+DEFAULT_NUM_PERM = 48
+DEFAULT_BANDS = 12
+DEFAULT_SHINGLE_SIZE = 4
+# Estimated Jaccard similarity of the question shingles above which cards are duplicates
+DEFAULT_THRESHOLD = 0.7
+
+_FILE_VERSION = 1
+
+# Marks a signature slot no shingle hashed into
+_EMPTY = 1 << 32
+# Odd multiplier spreading crc32 values evenly over the slots
+_MIX = 0x9E3779B1
+
+# Buckets holding more cards than this come from wording shared by many
+# questions ("What is the ..."); they are frozen, like stop words, so
+# lookups never degrade into comparing against a large part of the deck
+MAX_BUCKET_SIZE = 16
+_FULL = ()
+
+
+class NearDuplicateIndex:
+    """
+    MinHash/LSH index for finding cards with near-identical questions.
+
+    Each question is normalized, split into overlapping character shingles
+    and summarised by a one-permutation MinHash signature: every shingle is
+    hashed once into one of num_perm slots, each slot keeps its minimum and
+    empty slots borrow from their neighbours (rotation densification). This
+    is several times faster than num_perm separate hash functions in pure
+    Python and estimates the Jaccard similarity just as well. Signatures are cut into bands and
+    every band is hashed into a bucket, so only cards sharing at least one
+    bucket are compared. Lookups therefore cost roughly constant time and
+    building the index over n cards is linear rather than quadratic.
+
+    Signatures are kept in one flat array of 32-bit values, about
+    num_perm * 4 bytes per card, plus one bucket entry per band.
+    """
+
+    def __init__(
+        self,
+        num_perm: int = DEFAULT_NUM_PERM,
+        bands: int = DEFAULT_BANDS,
+        shingle_size: int = DEFAULT_SHINGLE_SIZE,
+        threshold: float = DEFAULT_THRESHOLD,
+        seed: int = 1
+    ):
+        """
+        Create an empty index.
+
+        Args:
+            num_perm: Length of the MinHash signatures (default: 48)
+            bands: Number of LSH bands, must divide num_perm (default: 12)
+            shingle_size: Characters per shingle (default: 4)
+            threshold: Minimum estimated similarity of a duplicate (default: 0.7)
+            seed: Seed of the shingle hash, fixed so saved indexes stay valid (default: 1)
+        """
+        if num_perm % bands:
+            raise ValueError("bands must divide num_perm")
+
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+        self.seed = seed
+
+        self._signatures = array('I')
+        self._labels: List[str] = []
+        # Bucket key -> card id, list of card ids once shared, or _FULL
+        self._buckets: Dict[int, object] = {}
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+    def signature(self, question: str) -> array:
+        """
+        Compute the MinHash signature of a question.
+
+        Args:
+            question: Question text
+
+        Returns:
+            Array of num_perm 32-bit values
+        """
+        text = normalize_question(question)
+        size = self.shingle_size
+        num_perm = self.num_perm
+        slots = [_EMPTY] * num_perm
+        for shingle in {text[i:i + size] for i in range(max(1, len(text) - size + 1))}:
+            value, slot = divmod((zlib.crc32(shingle.encode('utf-8'), self.seed) * _MIX) & 0xFFFFFFFF, num_perm)
+            if value < slots[slot]:
+                slots[slot] = value
+
+        if _EMPTY in slots:
+            slots = self._densify(slots)
+        return array('I', slots)
+
+    @staticmethod
+    def _densify(slots: List[int]) -> List[int]:
+        """Fill every empty slot from the next non-empty one, offset by the distance."""
+        num_perm = len(slots)
+        # Slot values stay below offset, so borrowed values never clash with own ones
+        offset = _EMPTY // num_perm
+        dense = list(slots)
+        for slot in range(num_perm):
+            if slots[slot] == _EMPTY:
+                distance = 1
+                while slots[(slot + distance) % num_perm] == _EMPTY:
+                    distance += 1
+                dense[slot] = slots[(slot + distance) % num_perm] + distance * offset
+        return dense
+
+    def _band_keys(self, signature: array) -> List[int]:
+        """Return one bucket key per band of a signature."""
+        rows = self.rows
+        return [hash((band,) + tuple(signature[band * rows:(band + 1) * rows])) for band in range(self.bands)]
+
+    def _signature_at(self, card_id: int) -> array:
+        """Return the stored signature of a card."""
+        return self._signatures[card_id * self.num_perm:(card_id + 1) * self.num_perm]
+
+    def _insert(self, card_id: int, band_keys: List[int]) -> None:
+        """Register a card in the buckets of its bands."""
+        buckets = self._buckets
+        for key in band_keys:
+            entry = buckets.get(key)
+            if entry is None:
+                buckets[key] = card_id
+            elif isinstance(entry, list):
+                if len(entry) < MAX_BUCKET_SIZE:
+                    entry.append(card_id)
+                else:
+                    buckets[key] = _FULL
+            elif entry is not _FULL:
+                buckets[key] = [entry, card_id]
+
+    def _candidates(self, band_keys: List[int]) -> set:
+        """Return the ids of every card sharing a bucket with the given keys."""
+        candidates = set()
+        for key in band_keys:
+            entry = self._buckets.get(key)
+            if entry is None:
+                continue
+            if isinstance(entry, list):
+                candidates.update(entry)
+            elif entry is not _FULL:
+                candidates.add(entry)
+        return candidates
+
+    def _matches(self, signature: array, band_keys: List[int]) -> List[Tuple[int, float]]:
+        """Score the candidates of a signature, keeping those above the threshold."""
+        matches = []
+        for card_id in self._candidates(band_keys):
+            other = self._signature_at(card_id)
+            similarity = sum(map(eq, signature, other)) / self.num_perm
+            if similarity >= self.threshold:
+                matches.append((card_id, similarity))
+        matches.sort(key=lambda match: match[1], reverse=True)
+        return matches
+
+    def add(self, question: str) -> int:
+        """
+        Add a question to the index.
+
+        Args:
+            question: Question text
+
+        Returns:
+            Id of the new entry
+        """
+        signature = self.signature(question)
+        return self._add_signature(question, signature, self._band_keys(signature))
+
+    def _add_signature(self, question: str, signature: array, band_keys: List[int]) -> int:
+        """Store a question with its precomputed signature and bucket keys."""
+        card_id = len(self._labels)
+        self._labels.append(question)
+        self._signatures.extend(signature)
+        self._insert(card_id, band_keys)
+        return card_id
+
+    def query(self, question: str) -> List[Tuple[str, float]]:
+        """
+        Find indexed questions similar to a question.
+
+        Args:
+            question: Question text
+
+        Returns:
+            List of (indexed question, estimated similarity), most similar first
+        """
+        signature = self.signature(question)
+        return [(self._labels[card_id], similarity)
+                for card_id, similarity in self._matches(signature, self._band_keys(signature))]
+
+    def add_if_new(self, question: str) -> Optional[str]:
+        """
+        Add a question unless the index already holds a near duplicate of it.
+
+        Args:
+            question: Question text
+
+        Returns:
+            None if the question was added, otherwise the indexed question it duplicates
+        """
+        signature = self.signature(question)
+        band_keys = self._band_keys(signature)
+        matches = self._matches(signature, band_keys)
+        if matches:
+            return self._labels[matches[0][0]]
+        self._add_signature(question, signature, band_keys)
+        return None
+
+    def save(self, file_path: str) -> None:
+        """
+        Save the index so later runs can check new cards against it.
+
+        The file holds a JSON header line with the parameters and questions,
+        followed by the raw little-endian signatures.
+
+        Args:
+            file_path: Path of the index file
+        """
+        header = {
+            "version": _FILE_VERSION,
+            "num_perm": self.num_perm,
+            "bands": self.bands,
+            "shingle_size": self.shingle_size,
+            "threshold": self.threshold,
+            "seed": self.seed,
+            "labels": self._labels,
+        }
+        signatures = self._signatures
+        if sys.byteorder != 'little':
+            signatures = array('I', signatures)
+            signatures.byteswap()
+
+        with open(file_path, 'wb') as file:
+            file.write(json.dumps(header, ensure_ascii=False).encode('utf-8') + b'\n')
+            signatures.tofile(file)
+
+    @classmethod
+    def load(cls, file_path: str) -> 'NearDuplicateIndex':
+        """
+        Load an index written by save.
+
+        Args:
+            file_path: Path of the index file
+
+        Returns:
+            The loaded index
+
+        Raises:
+            ValueError: If the file is not a near-duplicate index
+        """
+        with open(file_path, 'rb') as file:
+            header = json.loads(file.readline().decode('utf-8'))
+            if header.get("version") != _FILE_VERSION:
+                raise ValueError(f"Unsupported near-duplicate index file: {file_path}")
+
+            index = cls(header["num_perm"], header["bands"], header["shingle_size"],
+                        header["threshold"], header["seed"])
+            labels = header["labels"]
+            signatures = array('I')
+            signatures.frombytes(file.read())
+
+        if sys.byteorder != 'little':
+            signatures.byteswap()
+        if len(signatures) != len(labels) * index.num_perm:
+            raise ValueError(f"Corrupt near-duplicate index file: {file_path}")
+
+        index._labels = labels
+        index._signatures = signatures
+        for card_id in range(len(labels)):
+            index._insert(card_id, index._band_keys(index._signature_at(card_id)))
+        return index
+
+
+def remove_near_duplicates(
+    cards: Iterable[Tuple[str, str]],
+    index: Optional[NearDuplicateIndex] = None
+) -> Tuple[List[Tuple[str, str]], List[Tuple[Tuple[str, str], str]]]:
+    """
+    Drop cards whose question nearly duplicates an earlier one.
+
+    Only similar wording is detected; a translated question is not a near
+    duplicate of its original.
+
+    Args:
+        cards: Iterable of (question, answer) tuples
+        index: Index to check against and add the kept cards to, for example
+            one loaded from disk (default: a new index)
+
+    Returns:
+        Tuple of (kept cards, list of (dropped card, question it duplicates))
+    """
+    index = index if index is not None else NearDuplicateIndex()
+    kept = []
+    dropped = []
+    for card in cards:
+        duplicate_of = index.add_if_new(card[0])
+        if duplicate_of is None:
+            kept.append(card)
+        else:
+            dropped.append((card, duplicate_of))
+    return kept, dropped
+
+
+def print_near_duplicates(dropped: List[Tuple[Tuple[str, str], str]], limit: int = 5) -> None:
+    """
+    Print the first few near duplicates found by remove_near_duplicates.
+
+    Args:
+        dropped: Dropped cards with the question each one duplicates
+        limit: Maximum number of pairs to print (default: 5)
+    """
+    for (question, _), duplicate_of in dropped[:limit]:
+        print(f"  '{question}' ~ '{duplicate_of}'")
+    if len(dropped) > limit:
+        print(f"  ... plus {len(dropped) - limit} more")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point, returns the process exit code."""
+    parser = argparse.ArgumentParser(description="Find near-duplicate cards in a CSV card file.")
+    parser.add_argument("csv_file", help="CSV file with question and answer columns")
+    parser.add_argument("--delimiter", default=';', help="CSV delimiter (default: ';')")
+    parser.add_argument("--index", help="index file to check against and update")
+    parser.add_argument("--output", help="write the cards without near duplicates to this CSV file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"minimum similarity of a duplicate (default: {DEFAULT_THRESHOLD})")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.index and os.path.exists(args.index):
+            index = NearDuplicateIndex.load(args.index)
+            index.threshold = args.threshold
+        else:
+            index = NearDuplicateIndex(threshold=args.threshold)
+
+        kept, dropped = remove_near_duplicates(iter_cards_from_csv_file(args.csv_file, args.delimiter), index)
+        print(f"Found {len(dropped)} near duplicates among {len(kept) + len(dropped)} cards")
+        print_near_duplicates(dropped)
+
+        if args.output:
+            save_cards_to_csv(kept, args.output, args.delimiter)
+        if args.index:
+            index.save(args.index)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
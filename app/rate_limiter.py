@@ -0,0 +1,360 @@
+import asyncio
+import random
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from instrumentation import increment
+
+
+T = TypeVar('T')
+
+DEFAULT_REQUESTS_PER_MINUTE = 60
+DEFAULT_TOKENS_PER_MINUTE = 1000000
+DEFAULT_MAX_CONCURRENCY = 8
+
+# HTTP status codes and google.api_core exception names worth retrying
+_RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+_THROTTLE_CODES = {429}
+_RETRYABLE_NAMES = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable",
+    "DeadlineExceeded", "InternalServerError", "GatewayTimeout", "Aborted"
+}
+_THROTTLE_NAMES = {"ResourceExhausted", "TooManyRequests"}
+
+
+class RetriesExhaustedError(RuntimeError):
+    """Raised when a call still fails with a retryable error after the last retry."""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at a fixed rate.
+
+    Callers reserve tokens up front and are told how long to wait before
+    using them, which works the same way for threads and asyncio tasks.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        """
+        Create a full bucket.
+
+        Args:
+            rate_per_minute: Tokens added per minute
+            capacity: Maximum tokens held at once (default: rate_per_minute)
+        """
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute must be positive")
+
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1) -> float:
+        """
+        Take tokens from the bucket, possibly going into debt.
+
+        Args:
+            amount: Number of tokens to take (capped at the bucket capacity)
+
+        Returns:
+            Seconds the caller has to wait before the reservation is covered
+        """
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            return max(0.0, -self._tokens / self.rate)
+
+
+class RateLimiter:
+    """Combined requests-per-minute and tokens-per-minute limiter."""
+
+    def __init__(
+        self,
+        requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+        tokens_per_minute: Optional[float] = DEFAULT_TOKENS_PER_MINUTE
+    ):
+        """
+        Create a rate limiter.
+
+        Args:
+            requests_per_minute: Maximum requests per minute (default: 60)
+            tokens_per_minute: Maximum tokens per minute, None for no limit (default: 1000000)
+        """
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    def reserve(self, estimated_tokens: int = 0) -> float:
+        """
+        Reserve capacity for one request.
+
+        Args:
+            estimated_tokens: Expected prompt plus output tokens of the request
+
+        Returns:
+            Seconds to wait before sending the request
+        """
+        delay = self.requests.reserve(1)
+        if self.tokens and estimated_tokens:
+            delay = max(delay, self.tokens.reserve(estimated_tokens))
+        return delay
+
+    def acquire(self, estimated_tokens: int = 0) -> None:
+        """Block until one request of estimated_tokens may be sent."""
+        delay = self.reserve(estimated_tokens)
+        if delay:
+            time.sleep(delay)
+
+    async def aacquire(self, estimated_tokens: int = 0) -> None:
+        """Wait without blocking the event loop until one request may be sent."""
+        delay = self.reserve(estimated_tokens)
+        if delay:
+            await asyncio.sleep(delay)
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Concurrency limit that backs off when the provider throttles.
+
+    The limit is halved on every throttling error and grows by one again
+    after increase_after consecutive successes (additive increase,
+    multiplicative decrease), so it settles just below what the provider
+    sustains.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        min_concurrency: int = 1,
+        increase_after: int = 5
+    ):
+        """
+        Create a limiter starting at max_concurrency.
+
+        Args:
+            max_concurrency: Upper bound of concurrent calls (default: 8)
+            min_concurrency: Lower bound the limit never drops below (default: 1)
+            increase_after: Consecutive successes needed to raise the limit (default: 5)
+        """
+        if not 1 <= min_concurrency <= max_concurrency:
+            raise ValueError("Require 1 <= min_concurrency <= max_concurrency")
+
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.increase_after = increase_after
+        self.limit = max_concurrency
+        self._in_flight = 0
+        self._successes = 0
+        self._condition = threading.Condition()
+
+    def _try_enter(self) -> bool:
+        with self._condition:
+            if self._in_flight < self.limit:
+                self._in_flight += 1
+                return True
+            return False
+
+    def _leave(self) -> None:
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self):
+        """Hold one concurrency slot for the duration of the block."""
+        with self._condition:
+            while self._in_flight >= self.limit:
+                self._condition.wait()
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            self._leave()
+
+    @asynccontextmanager
+    async def aslot(self):
+        """Asynchronous variant of slot that polls instead of blocking the event loop."""
+        while not self._try_enter():
+            await asyncio.sleep(0.05)
+        try:
+            yield
+        finally:
+            self._leave()
+
+    def on_success(self) -> None:
+        """Record a successful call, growing the limit after enough of them."""
+        with self._condition:
+            self._successes += 1
+            if self._successes >= self.increase_after and self.limit < self.max_concurrency:
+                self.limit += 1
+                self._successes = 0
+                self._condition.notify_all()
+
+    def on_throttle(self) -> None:
+        """Record a throttling error and halve the limit."""
+        with self._condition:
+            self._successes = 0
+            new_limit = max(self.min_concurrency, self.limit // 2)
+            if new_limit < self.limit:
+                print(f"Provider is throttling, reducing concurrency to {new_limit}")
+            self.limit = new_limit
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter for retryable errors."""
+
+    def __init__(self, max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 60.0):
+        """
+        Create a retry policy.
+
+        Args:
+            max_retries: Retries after the first attempt (default: 5)
+            base_delay: Backoff of the first retry in seconds (default: 1.0)
+            max_delay: Upper bound of a single backoff in seconds (default: 60.0)
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Delay before the given retry.
+
+        Args:
+            attempt: Zero-based retry number
+
+        Returns:
+            Seconds to wait, drawn uniformly up to the exponential bound
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+def _error_code(error: BaseException) -> Optional[int]:
+    """Extract an HTTP status code from SDK or HTTP client exceptions."""
+    code = getattr(error, "code", None)
+    if code is None:
+        code = getattr(getattr(error, "response", None), "status_code", None)
+    if callable(code):
+        # grpc style errors expose code() returning an enum
+        return None
+    try:
+        return int(code) if code is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def is_throttle_error(error: BaseException) -> bool:
+    """Return True if the error means the provider is rate limiting us."""
+    return type(error).__name__ in _THROTTLE_NAMES or _error_code(error) in _THROTTLE_CODES
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """Return True if the call that raised the error may succeed when retried."""
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    return type(error).__name__ in _RETRYABLE_NAMES or _error_code(error) in _RETRYABLE_CODES
+
+
+class RequestScheduler:
+    """
+    Runs model calls under a rate limit, an adaptive concurrency limit and retries.
+
+    One scheduler should be shared by every call made with the same API key,
+    since that is the granularity at which the provider enforces quotas.
+    """
+
+    def __init__(
+        self,
+        rate_limiter: Optional[RateLimiter] = None,
+        concurrency: Optional[AdaptiveConcurrencyLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None
+    ):
+        """
+        Create a scheduler, using default limits for anything not given.
+
+        Args:
+            rate_limiter: Requests/tokens per minute limiter
+            concurrency: Adaptive concurrency limiter
+            retry_policy: Backoff policy for retryable errors
+        """
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.concurrency = concurrency or AdaptiveConcurrencyLimiter()
+        self.retry_policy = retry_policy or RetryPolicy()
+
+    def _handle_error(self, error: Exception, attempt: int) -> float:
+        """Decide whether to retry a failed call and return the backoff delay."""
+        if not is_retryable_error(error):
+            raise error
+        if is_throttle_error(error):
+            self.concurrency.on_throttle()
+        if attempt >= self.retry_policy.max_retries:
+            raise RetriesExhaustedError(
+                f"Giving up after {attempt + 1} attempts: {error}"
+            ) from error
+
+        delay = self.retry_policy.backoff(attempt)
+        increment("retries")
+        print(f"Retryable error ({error}), retrying in {delay:.1f}s...")
+        return delay
+
+    def run(self, call: Callable[[], T], estimated_tokens: int = 0) -> T:
+        """
+        Run a call, waiting for capacity and retrying retryable errors.
+
+        Args:
+            call: Function performing the model request
+            estimated_tokens: Expected prompt plus output tokens of the request
+
+        Returns:
+            Whatever call returns
+
+        Raises:
+            RetriesExhaustedError: If every attempt failed with a retryable error
+        """
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire(estimated_tokens)
+            try:
+                with self.concurrency.slot():
+                    result = call()
+            except Exception as e:
+                time.sleep(self._handle_error(e, attempt))
+                attempt += 1
+                continue
+
+            self.concurrency.on_success()
+            return result
+
+    async def arun(self, call: Callable[[], Awaitable[T]], estimated_tokens: int = 0) -> T:
+        """
+        Asynchronous variant of run for coroutine-returning calls.
+
+        Args:
+            call: Function returning an awaitable that performs the model request
+            estimated_tokens: Expected prompt plus output tokens of the request
+
+        Returns:
+            Whatever the awaited call returns
+
+        Raises:
+            RetriesExhaustedError: If every attempt failed with a retryable error
+        """
+        attempt = 0
+        while True:
+            await self.rate_limiter.aacquire(estimated_tokens)
+            try:
+                async with self.concurrency.aslot():
+                    result = await call()
+            except Exception as e:
+                await asyncio.sleep(self._handle_error(e, attempt))
+                attempt += 1
+                continue
+
+            self.concurrency.on_success()
+            return result
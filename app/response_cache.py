@@ -0,0 +1,222 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    "ANKI_CARD_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "anki_card_generator", "responses.sqlite3")
+)
+# Entries older than this are treated as misses and removed (default: 30 days)
+DEFAULT_TTL = 30 * 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Share of the limits a full cache is trimmed to, so eviction runs once per batch of puts
+EVICT_TARGET = 0.9
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+class ResponseCache:
+    """
+    Content-addressed SQLite cache of model responses.
+
+    Entries are keyed by a hash of the model name, prompt and generation
+    parameters and hold both the raw model text and the parsed cards.
+    Expired entries are dropped on read and write, and once the cache grows
+    beyond max_entries or max_bytes the least recently used entries are
+    evicted until it is back to EVICT_TARGET of the limits. The entry count
+    and size are kept as running totals, so a write does not scan the table.
+    The cache is safe to share between threads.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        ttl: Optional[float] = DEFAULT_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES
+    ):
+        """
+        Open (and create if needed) a response cache.
+
+        Args:
+            path: Path of the SQLite database file
+            ttl: Maximum age of an entry in seconds, None for no expiry (default: 30 days)
+            max_entries: Maximum number of entries kept (default: 10000)
+            max_bytes: Maximum total size of the stored responses (default: 256 MB)
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    raw_text TEXT NOT NULL,
+                    cards TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS responses_created_at ON responses (created_at)"
+            )
+        self._count, self._size = self._totals()
+
+    @staticmethod
+    def make_key(model_name: str, prompt: str, params: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Build the cache key for a request.
+
+        Args:
+            model_name: Name of the model the prompt is sent to
+            prompt: Full prompt text
+            params: Optional generation parameters that influence the response
+
+        Returns:
+            Hex digest identifying the request
+        """
+        payload = json.dumps(
+            {"model": model_name, "prompt": prompt, "params": params or {}},
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[str, List[Tuple[str, str]]]]:
+        """
+        Look up a cached response.
+
+        Args:
+            key: Cache key from make_key
+
+        Returns:
+            Tuple of (raw model text, cards) or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT raw_text, cards, size, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            raw_text, cards_json, size, created_at = row
+            with self._conn:
+                if self.ttl is not None and now - created_at > self.ttl:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._count -= 1
+                    self._size -= size
+                    return None
+                self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+
+        return raw_text, [tuple(card) for card in json.loads(cards_json)]
+
+    def put(self, key: str, raw_text: str, cards: List[Tuple[str, str]]) -> None:
+        """
+        Store a response, evicting least recently used entries if the cache is full.
+
+        Args:
+            key: Cache key from make_key
+            raw_text: Raw model response text
+            cards: Cards parsed from the response
+        """
+        cards_json = json.dumps(cards, ensure_ascii=False)
+        size = len(raw_text.encode('utf-8')) + len(cards_json.encode('utf-8'))
+        now = time.time()
+
+        with self._lock, self._conn:
+            replaced = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, raw_text, cards, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, raw_text, cards_json, size, now, now)
+            )
+            if replaced:
+                self._size -= replaced[0]
+            else:
+                self._count += 1
+            self._size += size
+            self._evict()
+
+    def _totals(self) -> Tuple[int, int]:
+        """Count the entries and their total size with a full scan."""
+        count, total_size = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        return count, total_size
+
+    def _evict(self) -> None:
+        """Drop expired entries, then least recently used ones if a limit is exceeded; the caller holds the lock."""
+        if self.ttl is not None:
+            cutoff = time.time() - self.ttl
+            expired, expired_size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses WHERE created_at < ?", (cutoff,)
+            ).fetchone()
+            if expired:
+                self._conn.execute("DELETE FROM responses WHERE created_at < ?", (cutoff,))
+                self._count -= expired
+                self._size -= expired_size
+
+        if self._count <= self.max_entries and self._size <= self.max_bytes:
+            return
+        # Other processes may share the file, so the totals are recounted before evicting
+        self._count, self._size = self._totals()
+        if self._count <= self.max_entries and self._size <= self.max_bytes:
+            return
+
+        max_count = int(self.max_entries * EVICT_TARGET)
+        max_size = int(self.max_bytes * EVICT_TARGET)
+        doomed = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+            if self._count <= max_count and self._size <= max_size:
+                break
+            doomed.append((key,))
+            self._count -= 1
+            self._size -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+
+    def clear(self) -> None:
+        """Remove every entry from the cache."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses")
+            self._count = self._size = 0
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+def get_default_cache() -> ResponseCache:
+    """
+    Return the process-wide response cache, opening it on first use.
+
+    Returns:
+        The shared ResponseCache at DEFAULT_CACHE_PATH
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache()
+        return _default_cache
@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+# The application modules import each other as top-level modules from app/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import instrumentation  # noqa: E402
+import response_cache  # noqa: E402
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """Point the process-wide response cache at an empty temporary database."""
+    test_cache = response_cache.ResponseCache(str(tmp_path / "responses.sqlite3"))
+    monkeypatch.setattr(response_cache, "_default_cache", test_cache)
+    yield test_cache
+    test_cache.close()
+
+
+@pytest.fixture
+def counters():
+    """Reset the instrumentation counters and return a function reading them."""
+    instrumentation.reset()
+    return lambda: instrumentation.snapshot()["counters"]
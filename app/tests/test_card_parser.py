@@ -0,0 +1,33 @@
+import json
+
+from card_parser import IncrementalCardParser, extract_cards_from_json_text
+
+CARDS = [
+    {"question": "How is a set literal written?", "answer": "As {1, 2}, while {} is a dict"},
+    {"question": "What does \"}\" close?", "answer": "An object opened by \"{\", escaped \\\" or not"},
+    {"question": "Where do [brackets go?", "answer": "}]"},
+]
+
+
+def _feed_in_pieces(text, size):
+    parser = IncrementalCardParser()
+    cards = []
+    for offset in range(0, len(text), size):
+        cards.extend(parser.feed(text[offset:offset + size]))
+    return cards
+
+
+def test_braces_in_answers_do_not_break_streamed_cards():
+    text = "Here are the cards:\n```json\n" + json.dumps(CARDS, indent=2) + "\n```"
+    expected = [(card["question"], card["answer"]) for card in CARDS]
+
+    assert extract_cards_from_json_text(text) == expected
+    for size in (1, 2, 3, 7, 64, len(text)):
+        assert _feed_in_pieces(text, size) == expected
+
+
+def test_strings_in_arrays_are_skipped_like_the_batch_parser():
+    text = '["an open {", ' + json.dumps(CARDS)[1:-1] + ', "a close }"]'
+
+    for size in (1, 5, len(text)):
+        assert _feed_in_pieces(text, size) == extract_cards_from_json_text(text)
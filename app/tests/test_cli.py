@@ -0,0 +1,35 @@
+import json
+
+import pytest
+
+from cli import UsageError, load_job_file
+
+
+def _write_job(tmp_path, job):
+    path = tmp_path / "job.json"
+    path.write_text(json.dumps(job), encoding="utf-8")
+    return str(path)
+
+
+@pytest.mark.parametrize("key", ["cards", "workers"])
+@pytest.mark.parametrize("value", [True, False, 0, "5", 2.5])
+def test_job_file_counts_must_be_positive_integers(tmp_path, key, value):
+    path = _write_job(tmp_path, {"topics": ["Rome"], key: value})
+
+    with pytest.raises(UsageError, match=f"{key} must be a positive integer"):
+        load_job_file(path)
+
+
+def test_job_file_settings_apply_to_every_batch(tmp_path):
+    path = _write_job(tmp_path, {
+        "cards": 20,
+        "batches": [
+            {"base_dir": str(tmp_path / "a"), "topics": ["Rome"]},
+            {"base_dir": str(tmp_path / "b"), "topics": ["Cells"], "workers": 2},
+        ],
+    })
+
+    batches = load_job_file(path)
+
+    assert [batch["cards"] for batch in batches] == [20, 20]
+    assert batches[1]["workers"] == 2
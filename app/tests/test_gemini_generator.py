@@ -0,0 +1,39 @@
+from backends import MockBackend
+from gemini_generator import GeminiCardGenerator
+from token_budget import TokenBudget, profile_key
+
+
+def test_repeated_auto_chunked_request_is_served_from_cache(cache, counters):
+    budget = TokenBudget(path=None)
+    generator = GeminiCardGenerator("key", backend=MockBackend(), budget=budget)
+    key = profile_key(generator.model_name)
+    initial_size = generator.cards_per_request()
+
+    first = generator.generate("Chemistry", 500)
+    assert counters()["cache_misses"] > 1
+    # The first run taught the budget a different size than the prior gave
+    assert generator.cards_per_request() != initial_size
+    assert budget.planned_cards_per_request(key, "Chemistry", 500, generator._output_limit()) == initial_size
+
+    misses = counters()["cache_misses"]
+    second = generator.generate("Chemistry", 500)
+    assert second == first
+    assert counters()["cache_misses"] == misses
+    assert counters()["cache_hits"] == misses
+
+
+def test_truncated_request_forgets_its_plan(cache):
+    budget = TokenBudget(path=None)
+    generator = GeminiCardGenerator("key", backend=MockBackend(max_output_tokens=100), budget=budget)
+    key = profile_key(generator.model_name)
+
+    generator.generate("Physics", 20)
+    assert budget._plans == {}
+    assert key in budget._profiles
+
+
+def test_uneven_chunks_of_mock_responses_do_not_overlap(cache):
+    generator = GeminiCardGenerator("key", backend=MockBackend(), budget=TokenBudget(path=None))
+
+    cards = generator.generate("Biology", 500, chunk_size=61, use_cache=False)
+    assert len(cards) == 500
@@ -0,0 +1,61 @@
+import mmap_reader
+from anki_utils import iter_cards_from_text_file
+from mmap_reader import iter_records_mmap, iter_text_file_cards
+
+QUOTED_DECK = (
+    '#separator:tab\n'
+    'Plain question\tPlain answer\n'
+    '"Question over\ntwo lines"\t"Answer with a ""quote"" and a\ttab"\n'
+    'malformed line\n'
+    '5" screen\tFive inches\n'
+    '"Answer with a blank line"\t"First\n\nLast"\n'
+)
+
+PLAIN_DECK = (
+    '#separator:tab\n'
+    'Ko je bio vođa Topličkog ustanka?\tKosta Vojinović\n'
+    'malformed line\n'
+    '\n'
+    '# comment\n'
+    ' \tanswer without a question\n'
+    'Kada je počeo Prvi srpski ustanak?\t1804.\r\n'
+) * 50
+
+
+def _read_both(path, **mmap_options):
+    mmap_issues, text_issues = [], []
+    mmap_cards = list(iter_text_file_cards(str(path), errors=mmap_issues, **mmap_options))
+    text_cards = list(iter_cards_from_text_file(str(path), errors=text_issues))
+    return mmap_cards, text_cards, mmap_issues, text_issues
+
+
+def test_quoted_newlines_give_the_same_cards_as_the_text_reader(tmp_path, monkeypatch):
+    monkeypatch.setattr(mmap_reader, "MMAP_MIN_BYTES", 0)
+    path = tmp_path / "deck.txt"
+    path.write_text(QUOTED_DECK, encoding='utf-8')
+
+    mmap_cards, text_cards, mmap_issues, text_issues = _read_both(path)
+    assert mmap_cards == text_cards == [
+        ("Plain question", "Plain answer"),
+        ("Question over\ntwo lines", 'Answer with a "quote" and a\ttab'),
+        ('5" screen', "Five inches"),
+        ("Answer with a blank line", "First\n\nLast"),
+    ]
+    assert mmap_issues == text_issues
+    assert [issue.line_number for issue in text_issues] == [5]
+
+
+def test_mmap_ranges_match_the_text_reader(tmp_path, monkeypatch):
+    monkeypatch.setattr(mmap_reader, "MMAP_MIN_BYTES", 0)
+    path = tmp_path / "deck.txt"
+    path.write_text(PLAIN_DECK, encoding='utf-8')
+
+    mmap_cards, text_cards, mmap_issues, text_issues = _read_both(path, workers=1)
+    assert mmap_cards == text_cards
+    assert len(mmap_cards) == 100
+    assert mmap_issues == text_issues
+
+    issues = []
+    split_cards = list(iter_records_mmap(str(path), workers=2, chunk_bytes=100, errors=issues))
+    assert split_cards == text_cards
+    assert issues == text_issues
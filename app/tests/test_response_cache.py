@@ -0,0 +1,27 @@
+from response_cache import EVICT_TARGET, ResponseCache
+
+
+def test_running_totals_follow_replacements_and_eviction(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite3"), max_entries=100)
+    for index in range(100):
+        cache.put(f"key{index}", "text", [("q", "a")])
+    cache.put("key0", "longer text", [("q", "a")])
+    assert (cache._count, cache._size) == cache._totals()
+
+    cache.get("key1")
+    cache.put("key100", "text", [("q", "a")])
+    assert cache._count == int(100 * EVICT_TARGET)
+    assert (cache._count, cache._size) == cache._totals()
+    # Least recently used entries go first
+    assert cache.get("key1") is not None
+    assert cache.get("key2") is None
+    cache.close()
+
+
+def test_expired_entries_are_dropped_on_write(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite3"), ttl=-1)
+    cache.put("old", "text", [("q", "a")])
+    cache.put("new", "text", [("q", "a")])
+    assert cache._totals() == (0, 0)
+    assert (cache._count, cache._size) == (0, 0)
+    cache.close()
@@ -0,0 +1,310 @@
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+DEFAULT_STATS_PATH = os.environ.get(
+    "ANKI_TOKEN_STATS",
+    os.path.join(os.path.expanduser("~"), ".cache", "anki_card_generator", "token_stats.json")
+)
+
+# Output token limit of each model; a response is cut off when it reaches it
+MODEL_OUTPUT_LIMITS = {
+    "gemini-1.0-pro": 2048,
+    "gemini-1.5-pro": 8192,
+    "gemini-1.5-flash": 8192,
+    "gemini-2.0-flash": 8192,
+}
+DEFAULT_OUTPUT_LIMIT = 8192
+
+# Output tokens per card assumed until enough runs have been recorded
+PRIOR_TOKENS_PER_CARD = 80
+# Safety margin on the prior, which has no measured spread
+PRIOR_MARGIN = 0.5
+# Output tokens of a response that do not belong to any card: brackets, an intro sentence
+RESPONSE_OVERHEAD_TOKENS = 50
+# Requests recorded before a profile's own history replaces the prior
+MIN_SAMPLES = 5
+# Standard deviations of tokens per card added as a safety margin
+SAFETY_SIGMAS = 2.0
+# Share of the output limit a request is planned to fill
+TARGET_FILL = 0.9
+# Weight of the history is capped, so the estimate follows changes in the model's output
+MAX_HISTORY_WEIGHT = 200
+MIN_CARDS_PER_REQUEST = 5
+MAX_CARDS_PER_REQUEST = 100
+# Request plans remembered, the least recently created are forgotten first
+MAX_PLANS = 5000
+
+_default_budget = None
+_default_budget_lock = threading.Lock()
+
+
+def output_limit(model_name: str) -> int:
+    """Return the output token limit of a model, DEFAULT_OUTPUT_LIMIT for unknown models."""
+    return MODEL_OUTPUT_LIMITS.get(model_name, DEFAULT_OUTPUT_LIMIT)
+
+
+def profile_key(model_name: str, format_instructions: Optional[str] = None, structured_output: bool = False) -> str:
+    """
+    Return the key requests with comparable output sizes share.
+
+    Card length depends on the model and the formatting instructions, so each
+    combination keeps its own history.
+
+    Args:
+        model_name: Name of the model
+        format_instructions: Custom formatting instructions, None for the default ones
+        structured_output: Whether schema-constrained JSON is requested
+
+    Returns:
+        The profile key
+    """
+    digest = hashlib.sha1((format_instructions or "").encode('utf-8')).hexdigest()[:12]
+    return f"{model_name}:{digest}" + (":json" if structured_output else "")
+
+
+class TokenBudget:
+    """
+    Learns how many output tokens a card takes and sizes requests accordingly.
+
+    Every completed request records the output tokens the model reported
+    against the cards parsed from it, per profile (model, formatting
+    instructions and output mode). The running mean and spread of tokens per
+    card give the expected output of a request, used for rate limiting and
+    logged against the actual usage, and the largest card count that still
+    fits the model's output limit with a safety margin. Until a profile has
+    MIN_SAMPLES requests, PRIOR_TOKENS_PER_CARD with a fixed margin is used.
+
+    The card count chosen for a topic's requests is remembered as well, see
+    planned_cards_per_request, so repeated requests are split the same way
+    and stay answerable from the response cache.
+
+    The history is kept in a JSON file, rewritten after every recorded
+    request. Instances are safe to share between threads.
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_STATS_PATH):
+        """
+        Open the statistics file, starting empty if it does not exist or is unreadable.
+
+        Args:
+            path: JSON file with the history, None keeps it in memory only
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._profiles: Dict[str, Dict[str, Any]] = {}
+        self._plans: Dict[str, int] = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as file:
+                    data = json.load(file)
+                self._profiles = data.get("profiles", {})
+                self._plans = data.get("plans", {})
+            except (OSError, ValueError, AttributeError) as e:
+                print(f"Ignoring unreadable token statistics {path}: {e}")
+
+    def tokens_per_card(self, key: str) -> Tuple[float, float]:
+        """
+        Estimate the output tokens of one card.
+
+        Args:
+            key: Profile key from profile_key
+
+        Returns:
+            Tuple of (expected tokens per card, upper bound including the safety margin)
+        """
+        with self._lock:
+            stats = self._profiles.get(key)
+            if not stats or stats["samples"] < MIN_SAMPLES:
+                return PRIOR_TOKENS_PER_CARD, PRIOR_TOKENS_PER_CARD * (1 + PRIOR_MARGIN)
+            spread = math.sqrt(stats["m2"] / (stats["samples"] - 1))
+            return stats["mean"], stats["mean"] + SAFETY_SIGMAS * spread
+
+    def predict_output_tokens(self, key: str, num_cards: int) -> int:
+        """
+        Predict the output tokens of a request.
+
+        Args:
+            key: Profile key from profile_key
+            num_cards: Cards requested
+
+        Returns:
+            Expected output tokens
+        """
+        expected, _ = self.tokens_per_card(key)
+        return round(RESPONSE_OVERHEAD_TOKENS + expected * num_cards)
+
+    def cards_per_request(self, key: str, limit: int) -> int:
+        """
+        Return the most cards one request can ask for without being truncated.
+
+        Fewer, larger requests spend less prompt quota and fewer round trips
+        per card, so the largest count whose upper-bound output still fits
+        TARGET_FILL of the limit is used.
+
+        Args:
+            key: Profile key from profile_key
+            limit: Output token limit of the model
+
+        Returns:
+            Cards per request, between MIN_CARDS_PER_REQUEST and MAX_CARDS_PER_REQUEST
+        """
+        _, upper = self.tokens_per_card(key)
+        fitting = int((limit * TARGET_FILL - RESPONSE_OVERHEAD_TOKENS) / max(upper, 1.0))
+        return max(MIN_CARDS_PER_REQUEST, min(MAX_CARDS_PER_REQUEST, fitting))
+
+    def planned_cards_per_request(self, key: str, topic: str, num_cards: int, limit: int) -> int:
+        """
+        Return the cards per request of a request, the same every time it is repeated.
+
+        The chunk count and the prompts of a split request depend on the cards
+        per request, so a size that followed the learned estimate would change
+        every cache key between runs. The size chosen by cards_per_request the
+        first time is kept until forget_plan drops it.
+
+        Args:
+            key: Profile key from profile_key
+            topic: Topic of the request
+            num_cards: Cards requested in total
+            limit: Output token limit of the model
+
+        Returns:
+            Cards per request
+        """
+        plan_key = _plan_key(key, topic, num_cards)
+        with self._lock:
+            planned = self._plans.get(plan_key)
+        if planned is not None:
+            return planned
+
+        planned = self.cards_per_request(key, limit)
+        with self._lock:
+            self._plans.setdefault(plan_key, planned)
+            while len(self._plans) > MAX_PLANS:
+                del self._plans[next(iter(self._plans))]
+            self._save()
+            return self._plans[plan_key]
+
+    def forget_plan(self, key: str, topic: str, num_cards: int) -> None:
+        """
+        Drop the remembered cards per request of a request, so the next one is sized anew.
+
+        Args:
+            key: Profile key from profile_key
+            topic: Topic of the request
+            num_cards: Cards requested in total
+        """
+        with self._lock:
+            if self._plans.pop(_plan_key(key, topic, num_cards), None) is not None:
+                self._save()
+
+    def record(
+        self,
+        key: str,
+        requested_cards: int,
+        parsed_cards: int,
+        predicted_tokens: int,
+        actual_tokens: int,
+        truncated: bool = False
+    ) -> None:
+        """
+        Add a completed request to the history and save it.
+
+        Args:
+            key: Profile key from profile_key
+            requested_cards: Cards the prompt asked for
+            parsed_cards: Cards parsed from the response
+            predicted_tokens: Output tokens predicted before the request
+            actual_tokens: Output tokens the model reported
+            truncated: Whether the response stopped at the output limit (default: False)
+        """
+        with self._lock:
+            stats = self._profiles.setdefault(key, {
+                "samples": 0, "mean": 0.0, "m2": 0.0, "requests": 0, "requested_cards": 0,
+                "parsed_cards": 0, "predicted_tokens": 0, "actual_tokens": 0, "abs_error_tokens": 0,
+                "truncated": 0,
+            })
+            stats["requests"] += 1
+            stats["requested_cards"] += requested_cards
+            stats["parsed_cards"] += parsed_cards
+            stats["predicted_tokens"] += predicted_tokens
+            stats["actual_tokens"] += actual_tokens
+            stats["abs_error_tokens"] += abs(actual_tokens - predicted_tokens)
+            stats["truncated"] += truncated
+            stats["updated_at"] = time.time()
+
+            if parsed_cards:
+                # A truncated response includes a partial card, which overestimates slightly, the safe side
+                sample = max(actual_tokens - RESPONSE_OVERHEAD_TOKENS, 1) / parsed_cards
+                # Welford's update, with the weight of the history capped
+                weight = min(stats["samples"], MAX_HISTORY_WEIGHT - 1)
+                if weight < stats["samples"]:
+                    stats["m2"] *= weight / stats["samples"]
+                stats["samples"] = weight + 1
+                delta = sample - stats["mean"]
+                stats["mean"] += delta / stats["samples"]
+                stats["m2"] += delta * (sample - stats["mean"])
+            self._save()
+
+    def _save(self) -> None:
+        """Write the history through a temporary file; the caller holds the lock."""
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                json.dump({"profiles": self._profiles, "plans": self._plans}, file, indent=1)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"Could not save token statistics to {self.path}: {e}")
+
+    def report(self) -> List[Dict[str, Any]]:
+        """
+        Summarise the history of every profile.
+
+        Returns:
+            One dict per profile with requests, tokens_per_card, cards_per_request,
+            prediction_error (mean absolute error relative to the actual tokens) and truncated
+        """
+        with self._lock:
+            keys = sorted(self._profiles)
+        rows = []
+        for key in keys:
+            with self._lock:
+                stats = dict(self._profiles[key])
+            expected, upper = self.tokens_per_card(key)
+            rows.append({
+                "profile": key,
+                "requests": stats["requests"],
+                "tokens_per_card": round(expected, 1),
+                "tokens_per_card_upper": round(upper, 1),
+                "cards_per_request": self.cards_per_request(key, output_limit(key.split(':', 1)[0])),
+                "prediction_error": round(stats["abs_error_tokens"] / max(stats["actual_tokens"], 1), 3),
+                "truncated": stats["truncated"],
+            })
+        return rows
+
+
+def _plan_key(key: str, topic: str, num_cards: int) -> str:
+    """Return the key a request's plan is remembered under."""
+    return f"{key}:{num_cards}:{topic}"
+
+
+def get_default_budget() -> TokenBudget:
+    """
+    Return the process-wide token budget, loading its history on first use.
+
+    Returns:
+        The shared TokenBudget at DEFAULT_STATS_PATH
+    """
+    global _default_budget
+    with _default_budget_lock:
+        if _default_budget is None:
+            _default_budget = TokenBudget()
+        return _default_budget